@@ -2,6 +2,8 @@
 ASGI config for hallnav_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket connections to /ws/recognize/ go to the streaming recognition handler
+(recognition/streaming.py); everything else is served by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hallnav_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from recognition.streaming import recognition_socket  # noqa: E402
+
+WEBSOCKET_ROUTES = {
+    '/ws/recognize/': recognition_socket,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        handler = WEBSOCKET_ROUTES.get(scope['path'])
+        if handler is None:
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        await handler(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
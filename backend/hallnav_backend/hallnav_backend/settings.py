@@ -152,3 +152,51 @@ CORS_ALLOWED_ORIGINS = [
 
 # Allow client to send credentials if needed (e.g., cookies)
 CORS_ALLOW_CREDENTIALS = True
+
+# Memory-mapped schedule snapshot (built with `manage.py build_schedule_snapshot`).
+# When the file is missing the API falls back to the database.
+SCHEDULE_SNAPSHOT_PATH = BASE_DIR / 'schedule_snapshot.bin'
+
+# Seconds between checks for schedule changes made by other processes while SSE clients
+# are connected (see recognition/events.py)
+SCHEDULE_EVENTS_POLL_SECONDS = float(os.environ.get('HALLNAV_EVENTS_POLL', 2.0))
+
+# Walking distance matrix API (see recognition/navigation.py and recognition/routing/)
+NAVIGATION_MATRIX_MAX_LOCATIONS = 500  # Per list (origins / destinations) in one matrix request
+# Optional JSON campus graph (see CampusGraph.from_dict); the built-in demo campus is used otherwise
+CAMPUS_GRAPH_PATH = os.environ.get('HALLNAV_CAMPUS_GRAPH')
+# Where precomputed route tables are persisted between runs
+ROUTE_CACHE_DIR = Path(os.environ.get('HALLNAV_ROUTE_CACHE', BASE_DIR / 'route_cache'))
+# Walking speed in graph units per second (metres per second for haversine campuses)
+WALKING_SPEED = float(os.environ.get('HALLNAV_WALKING_SPEED', 1.4))
+
+# Recognition backend: 'classifier' (fixed CLASS_NAMES head) or 'gallery' (nearest reference
+# embedding; halls are added by uploading reference photos, see recognition/gallery.py)
+RECOGNITION_MODE = os.environ.get('HALLNAV_RECOGNITION_MODE', 'classifier')
+GALLERY_PATH = BASE_DIR / 'gallery.npz'
+GALLERY_MIN_SIMILARITY = 0.6  # Cosine similarity below which a gallery match is rejected
+
+# Classifier cascade (opt-in): a cheap low-resolution pass, escalated to 224px only when unsure
+# (see recognition/cascade.py). Calibrate the margin with `manage.py calibrate_cascade` before
+# enabling it; until then every scan is escalated, so it only adds the cheap pass
+CASCADE_ENABLED = os.environ.get('HALLNAV_CASCADE', '0') == '1'
+CASCADE_LOW_RES = 160
+# Written by calibrate_cascade for the deployed model; keep it next to the model artifact in production
+CASCADE_CALIBRATION_PATH = Path(os.environ.get('HALLNAV_CASCADE_CALIBRATION', BASE_DIR / 'cascade_calibration.json'))
+
+# Multi-crop recognition for wide-angle/panorama shots (opt-in; clients may also send multicrop=1):
+# images at least MULTICROP_MIN_ASPECT times wider (or taller) than square are tiled into
+# overlapping 224px crops, scored in one batch and combined by mean log-probability
+MULTICROP_ENABLED = os.environ.get('HALLNAV_MULTICROP', '0') == '1'
+MULTICROP_MAX_CROPS = int(os.environ.get('HALLNAV_MULTICROP_MAX_CROPS', '6'))
+MULTICROP_MIN_ASPECT = 1.5
+MULTICROP_OVERLAP = 0.25  # Minimum fraction shared by neighbouring crops
+
+# Streaming camera recognition over WebSocket (ws://<host>/ws/recognize/, see recognition/streaming.py)
+STREAM_RESOLUTION = 160  # Model input size for stream frames; smoothing makes up for the smaller input
+STREAM_WINDOW = 5  # Scored frames averaged for a prediction
+STREAM_MIN_FRAMES = 3  # Frames needed before a hall can be reported
+STREAM_AGREEMENT = 0.8  # Share of frames in the window whose top class must match
+STREAM_SKIP_DIFF = 4.0  # Mean 16x16 grayscale difference (0-255) below which a frame repeats the last one
+STREAM_MAX_BATCH = 16  # Frames (across all streams) per forward pass
+STREAM_BATCH_WAIT_MS = 10  # How long the batcher waits for more frames
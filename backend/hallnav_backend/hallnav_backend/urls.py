@@ -40,6 +40,12 @@ from recognition.views import HomePageView, recognize_hall
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/recognize_hall/', views.recognize_hall, name='recognize_hall'),
+    path('api/recognition/metrics/', views.recognition_metrics, name='recognition_metrics'),
+    path('api/halls/events/', views.schedule_events, name='schedule_events'),
+    path('api/halls/nearest/', views.nearest_halls, name='nearest_halls'),
+    path('api/halls/<str:hall_name>/schedule/', views.hall_schedule, name='hall_schedule'),
+    path('api/halls/<str:hall_name>/references/', views.hall_references, name='hall_references'),
+    path('api/navigation/matrix/', views.navigation_matrix, name='navigation_matrix'),
 
     # This line is crucial for serving the index.html
     re_path(r'^.*$', HomePageView.as_view(), name='home_page'),
@@ -0,0 +1,164 @@
+"""
+In-process fan-out of schedule change events to Server-Sent Events subscribers.
+
+Schedule saves/deletes (see signals.py) call `broker.publish`, possibly from a
+worker thread; each subscriber lives on the ASGI event loop and is woken with
+`call_soon_threadsafe`. An idle subscriber holds no task or queue of its own,
+only a small slotted object, so a process can keep thousands of them open.
+Pending events are coalesced per hall, which bounds memory for slow clients.
+
+Writes made in other processes (other workers, the admin, management
+commands) send their signals there, so while a process has subscribers its
+ScheduleWatcher polls DataVersion every SCHEDULE_EVENTS_POLL_SECONDS and, when
+it moved, publishes an event for every hall whose schedule ETag changed. The
+broker drops an event whose ETag it already published for that hall, so a
+local write is not announced twice.
+
+Each stream is a long-lived async response: the events endpoint refuses to
+run under WSGI, where it would tie up a worker per subscriber. Serve the API
+with an ASGI server (e.g. `uvicorn hallnav_backend.asgi:application`).
+"""
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import reverse
+
+# Subscribers registered under ALL_HALLS receive events for every hall
+ALL_HALLS = '*'
+
+
+class Subscription:
+    __slots__ = ('halls', 'loop', 'pending', 'waiter')
+
+    def __init__(self, halls, loop):
+        self.halls = halls
+        self.loop = loop
+        self.pending = {}  # hall name -> latest event, in arrival order
+        self.waiter = None
+
+    def push(self, event):
+        """Queue an event; must run on the subscriber's event loop"""
+        self.pending.pop(event['hall_id'], None)
+        self.pending[event['hall_id']] = event
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def wait(self, timeout):
+        """Return pending events, waiting up to `timeout` seconds; [] on timeout"""
+        if not self.pending:
+            self.waiter = self.loop.create_future()
+            try:
+                await asyncio.wait_for(self.waiter, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.waiter = None
+        events = list(self.pending.values())
+        self.pending.clear()
+        return events
+
+
+class ScheduleEventBroker:
+    def __init__(self):
+        self._subscribers = {}  # hall name -> set of Subscription
+        self._etags = {}  # hall name -> ETag of the last event published for it
+        self._lock = threading.Lock()
+
+    def subscribe(self, halls=None):
+        """Register a subscriber on the running event loop for the given hall names (all halls if empty)"""
+        subscription = Subscription(tuple(halls or (ALL_HALLS,)), asyncio.get_running_loop())
+        with self._lock:
+            for hall in subscription.halls:
+                self._subscribers.setdefault(hall, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for hall in subscription.halls:
+                subscribers = self._subscribers.get(hall)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[hall]
+
+    def has_subscribers(self, hall_name):
+        with self._lock:
+            return bool(self._subscribers.get(hall_name) or self._subscribers.get(ALL_HALLS))
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._subscribers.values())) if self._subscribers else 0
+
+    def publish(self, event):
+        """
+        Deliver an event (a dict with at least 'hall_id') to matching subscribers; safe from any thread.
+        An event carrying the same 'etag' as the last one published for its hall is dropped.
+        """
+        with self._lock:
+            etag = event.get('etag')
+            if etag is not None:
+                if self._etags.get(event['hall_id']) == etag:
+                    return
+                self._etags[event['hall_id']] = etag
+            targets = set(self._subscribers.get(event['hall_id'], ()))
+            targets.update(self._subscribers.get(ALL_HALLS, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # Event loop already closed; the subscriber is going away
+                self.unsubscribe(subscription)
+
+
+class ScheduleWatcher:
+    """Publishes schedule changes committed by other processes to this process's subscribers"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._version = None
+        self._etags = None  # hall name -> ETag at the last check
+        self._task = None
+
+    def ensure_running(self):
+        """Start polling on the running event loop unless already polling there; stops when no one subscribes"""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        # Changes made while nobody was listening are not replayed
+        self._version = self._etags = None
+        while self.broker.subscriber_count():
+            await sync_to_async(self.check)()
+            await asyncio.sleep(settings.SCHEDULE_EVENTS_POLL_SECONDS)
+
+    def check(self):
+        """Publish an event per hall whose ETag changed since the last check; returns the events"""
+        from .models import DataVersion
+        from .schedules import schedule_etags
+
+        version = DataVersion.current()
+        if version == self._version:
+            return []
+        etags = schedule_etags()
+        changed = []
+        if self._etags is not None:
+            changed = [(name, etag, 'updated') for name, etag in etags.items() if self._etags.get(name) != etag]
+            changed += [(name, None, 'deleted') for name in self._etags.keys() - etags.keys()]
+        self._version, self._etags = version, etags
+        events = []
+        for name, etag, action in changed:
+            if not self.broker.has_subscribers(name):
+                continue
+            event = {"hall_id": name, "action": action, "etag": etag, "schedule_url": None}
+            if etag is not None:
+                event["schedule_url"] = reverse('hall_schedule', args=[name])
+            self.broker.publish(event)
+            events.append(event)
+        return events
+
+
+broker = ScheduleEventBroker()
+watcher = ScheduleWatcher(broker)
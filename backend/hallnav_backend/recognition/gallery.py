@@ -0,0 +1,246 @@
+"""
+Reference-embedding gallery for recognition without a fixed classifier head.
+
+Each reference photo of a hall is stored as one L2-normalised embedding (the
+MobileNetV2 penultimate features) in a single contiguous float32 matrix whose
+rows are grouped by hall. A query is scored against every row with one matrix
+product and reduced to the best similarity per hall; once the gallery holds
+IVF_MIN_SIZE rows it is partitioned by spherical k-means and a query only
+scores the rows of its IVF_PROBES closest partitions. A query restricted to
+some halls only probes partitions holding one of them, and scores their rows
+exactly when fewer than IVF_MIN_SIZE remain.
+
+Adding a hall is adding rows (`EmbeddingGallery.add`); nothing is retrained.
+The gallery is persisted as one .npz file (GALLERY_PATH) and reloaded by
+`get_gallery` when another process publishes a new one. Uploads are applied
+to the newest published gallery under a lock (a lock file across processes
+where fcntl is available, see locking.py), so concurrent uploads never drop
+each other's rows.
+"""
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .locking import file_lock
+
+# Partition the gallery once it has this many rows; below that brute force is faster
+IVF_MIN_SIZE = 4096
+# Partitions scored per query
+IVF_PROBES = 8
+KMEANS_ITERATIONS = 10
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _best_per_hall(out, similarity, labels):
+    """Write the best similarity of each hall in `labels` into out[hall]"""
+    # Sort by (hall, -similarity) and keep the first row of each hall
+    order = np.lexsort((-similarity, labels))
+    labels, similarity = labels[order], similarity[order]
+    first = np.ones(len(labels), dtype=bool)
+    first[1:] = labels[1:] != labels[:-1]
+    out[labels[first]] = similarity[first]
+
+
+class EmbeddingGallery:
+    def __init__(self, halls=(), embeddings=None, labels=None):
+        """halls: hall names; embeddings: (N, D) rows; labels: (N,) index into halls for each row"""
+        self.halls = list(halls)
+        if embeddings is None:
+            self.embeddings = np.zeros((0, 0), dtype=np.float32)
+            self.labels = np.zeros(0, dtype=np.int32)
+        else:
+            labels = np.asarray(labels, dtype=np.int32)
+            order = np.argsort(labels, kind='stable')
+            self.embeddings = np.ascontiguousarray(normalize(embeddings)[order])
+            self.labels = labels[order]
+        self._build()
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def dim(self):
+        return self.embeddings.shape[1] if len(self) else 0
+
+    def reference_counts(self):
+        counts = np.bincount(self.labels, minlength=len(self.halls))
+        return dict(zip(self.halls, counts.tolist()))
+
+    def _build(self):
+        """Per-hall row ranges (rows must be grouped by hall) and, for large galleries, the IVF partitions"""
+        self.starts = np.searchsorted(self.labels, np.arange(len(self.halls)))
+        self.present = np.bincount(self.labels, minlength=len(self.halls)) > 0
+        self.centroids = None
+        if len(self) >= IVF_MIN_SIZE:
+            self._build_ivf()
+
+    def _build_ivf(self):
+        """Spherical k-means with ~sqrt(N) centroids; rows are then regrouped by partition"""
+        rng = np.random.default_rng(0)
+        n_lists = int(np.sqrt(len(self)))
+        centroids = self.embeddings[rng.choice(len(self), n_lists, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assign = np.argmax(self.embeddings @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, self.embeddings)
+            empty = np.bincount(assign, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+        assign = np.argmax(self.embeddings @ centroids.T, axis=1)
+        # Store rows partition by partition so a probe scores one contiguous slice
+        order = np.argsort(assign, kind='stable')
+        self.embeddings = np.ascontiguousarray(self.embeddings[order])
+        self.labels = self.labels[order]
+        self.centroids = centroids
+        self.lists = assign[order]
+        self.bounds = np.searchsorted(self.lists, np.arange(n_lists + 1))
+
+    def add(self, hall, embeddings):
+        """Append reference embeddings for a hall (new or existing)"""
+        embeddings = normalize(np.atleast_2d(embeddings))
+        if len(self) and embeddings.shape[1] != self.dim:
+            raise ValueError(f"Embedding size {embeddings.shape[1]} does not match gallery size {self.dim}")
+        if hall not in self.halls:
+            self.halls.append(hall)
+        label = self.halls.index(hall)
+        all_embeddings = embeddings if not len(self) else np.vstack([self.embeddings, embeddings])
+        all_labels = np.concatenate([self.labels, np.full(len(embeddings), label, dtype=np.int32)])
+        order = np.argsort(all_labels, kind='stable')
+        self.embeddings = np.ascontiguousarray(all_embeddings[order])
+        self.labels = all_labels[order]
+        self._build()
+
+    def remove(self, hall):
+        """Drop every reference of a hall; returns the number of rows removed"""
+        if hall not in self.halls:
+            return 0
+        label = self.halls.index(hall)
+        keep = self.labels != label
+        removed = int((~keep).sum())
+        labels = self.labels[keep]
+        labels = np.where(labels > label, labels - 1, labels).astype(np.int32)
+        order = np.argsort(labels, kind='stable')
+        self.halls.pop(label)
+        self.embeddings = np.ascontiguousarray(self.embeddings[keep][order])
+        self.labels = labels[order]
+        self._build()
+        return removed
+
+    def scores(self, queries, halls=None):
+        """
+        Best cosine similarity of each query to each hall's references.
+        queries: (B, D) embeddings; halls: optional iterable of hall names to restrict scoring to.
+        Returns a (B, len(self.halls)) float32 array; -inf for halls without references (or excluded).
+        """
+        queries = normalize(np.atleast_2d(queries))
+        out = np.full((len(queries), len(self.halls)), -np.inf, dtype=np.float32)
+        if not len(self):
+            return out
+        allowed = self.present.copy()
+        if halls is not None:
+            mask = np.zeros(len(self.halls), dtype=bool)
+            mask[[self.halls.index(h) for h in halls if h in self.halls]] = True
+            allowed &= mask
+        rows = None if halls is None or self.centroids is None else allowed[self.labels]
+        if self.centroids is None:
+            similarity = queries @ self.embeddings.T
+            # Rows are grouped by hall, so a segmented max gives the best match per hall
+            best = np.maximum.reduceat(similarity, self.starts[self.present], axis=1)
+            out[:, self.present] = best
+        elif rows is not None and rows.sum() < IVF_MIN_SIZE:
+            # Few rows left after the restriction: score them all rather than probe
+            labels = self.labels[rows]
+            similarity = queries @ self.embeddings[rows].T
+            for b in range(len(queries)):
+                _best_per_hall(out[b], similarity[b], labels)
+        else:
+            centroid_scores = queries @ self.centroids.T
+            n_probes = min(IVF_PROBES, len(self.centroids))
+            if rows is not None:
+                # Probe only partitions holding an allowed hall, so a restricted query still reaches its halls
+                eligible = np.bincount(self.lists, weights=rows, minlength=len(self.centroids)) > 0
+                centroid_scores[:, ~eligible] = -np.inf
+                n_probes = min(n_probes, int(eligible.sum()))
+            probes = np.argpartition(-centroid_scores, n_probes - 1, axis=1)[:, :n_probes]
+            for b in range(len(queries)):
+                spans = [(self.bounds[p], self.bounds[p + 1]) for p in probes[b]]
+                similarity = np.concatenate([self.embeddings[start:end] @ queries[b] for start, end in spans])
+                labels = np.concatenate([self.labels[start:end] for start, end in spans])
+                _best_per_hall(out[b], similarity, labels)
+        out[:, ~allowed] = -np.inf
+        return out
+
+    def search(self, query, halls=None):
+        """(hall name, similarity) of the best match for one embedding, or (None, -inf) for an empty gallery"""
+        scores = self.scores(query, halls)[0]
+        if not len(scores) or not np.isfinite(scores).any():
+            return None, float('-inf')
+        best = int(np.argmax(scores))
+        return self.halls[best], float(scores[best])
+
+    # ---------- Persistence ----------
+    def save(self, path=None):
+        """Write the gallery to an .npz file, replacing any previous one atomically"""
+        path = Path(path or settings.GALLERY_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, halls=np.array(self.halls, dtype=str), embeddings=self.embeddings, labels=self.labels)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['halls'].tolist(), data['embeddings'], data['labels'])
+
+
+# Currently loaded gallery (cached per process), keyed by the file's identity
+_gallery = None
+_gallery_key = None
+_lock = threading.Lock()
+
+
+def _file_key(path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _load_current(path):
+    """The cached gallery, reloaded first if the published file changed; call with _lock held"""
+    global _gallery, _gallery_key
+    key = _file_key(path)
+    if _gallery is None or key != _gallery_key:
+        _gallery = EmbeddingGallery.load(path) if key is not None else EmbeddingGallery()
+        _gallery_key = key
+    return _gallery
+
+
+def get_gallery():
+    """The published gallery (an empty one if none exists), reloaded when the file changes"""
+    with _lock:
+        return _load_current(Path(settings.GALLERY_PATH))
+
+
+def add_references(hall, embeddings):
+    """Add reference embeddings for a hall to the published gallery, save it and return it"""
+    global _gallery, _gallery_key
+    path = Path(settings.GALLERY_PATH)
+    with _lock, file_lock(path):
+        # Read under the lock so an upload published meanwhile (by any process) is kept
+        current = _load_current(path)
+        # Copy on write: requests already searching keep a consistent gallery
+        gallery = EmbeddingGallery(current.halls, current.embeddings, current.labels)
+        gallery.add(hall, embeddings)
+        gallery.save(path)
+        _gallery, _gallery_key = gallery, _file_key(path)
+    return gallery
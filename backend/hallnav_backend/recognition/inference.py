@@ -0,0 +1,150 @@
+"""
+Hall classifier inference shared by the upload API (views.py) and live
+streaming recognition (streaming.py): the model, its class names and
+acceptance threshold, image checks, location candidates and batched class
+probabilities.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torchvision import models, transforms
+
+from .spatial import get_hall_index
+
+# Model file colocated in the recognition app directory. HALLNAV_MODEL_PATH may point at another
+# state dict or at a TorchScript artifact (.pt, e.g. the distilled student from dataset/distill_model.py)
+MODEL_PATH = Path(os.environ.get('HALLNAV_MODEL_PATH', Path(__file__).resolve().parent / 'hall_classifier_raw.pth'))
+
+# IMPORTANT: Update CLASS_NAMES with your actual hall names in the order your model expects them
+# Model was trained with 2 classes, so we need exactly 2 class names
+CLASS_NAMES = ['LT1 & 2', 'LT3 & 4']
+
+# Configuration for edge case handling
+MIN_CONFIDENCE_THRESHOLD = 0.7  # Minimum confidence to accept a prediction
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB max file size
+MIN_IMAGE_DIMENSIONS = (50, 50)  # Minimum image size
+MAX_IMAGE_DIMENSIONS = (5000, 5000)  # Maximum image size
+
+# Largest radius (metres) accepted by location queries
+NEAREST_MAX_RADIUS_M = 5000
+
+# Location-gated recognition: with lat/lon, only halls within this radius (metres) are scored
+LOCATION_RADIUS_M = 300
+
+# Loaded model (cached for performance)
+_model = None
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = load_model(MODEL_PATH)
+    return _model
+
+def load_model(path):
+    """Classifier from a MobileNetV2 state dict (.pth) or a TorchScript artifact (.pt), in eval mode"""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Model file not found at {path}")
+    if path.suffix == '.pt':
+        return load_torchscript_model(path)
+    model = models.mobilenet_v2(pretrained=False)
+    num_classes = len(CLASS_NAMES)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+    state = torch.load(str(path), map_location=torch.device('cpu'))
+    model.load_state_dict(state)
+    # Sanity check: classifier output size must match class names
+    out_features = model.classifier[1].out_features
+    if out_features != num_classes:
+        raise ValueError(f"Model classifier out_features={out_features} does not match len(CLASS_NAMES)={num_classes}")
+    model.eval()
+    return model
+
+def load_torchscript_model(path):
+    """Load a TorchScript classifier; its embedded class names (if any) must match CLASS_NAMES"""
+    extra_files = {'class_names.json': ''}
+    model = torch.jit.load(str(path), map_location=torch.device('cpu'), _extra_files=extra_files)
+    if extra_files['class_names.json']:
+        names = json.loads(extra_files['class_names.json'])
+        if names != CLASS_NAMES:
+            raise ValueError(f"Model {path.name} was trained for classes {names}, expected {CLASS_NAMES}")
+    model.eval()
+    return model
+
+def validate_image_content(image):
+    """Validate image content and dimensions"""
+    if not image:
+        raise ValueError("Invalid image file")
+    width, height = image.size
+    # Check minimum dimensions
+    if width < MIN_IMAGE_DIMENSIONS[0] or height < MIN_IMAGE_DIMENSIONS[1]:
+        raise ValueError(f"Image too small. Minimum size: {MIN_IMAGE_DIMENSIONS[0]}x{MIN_IMAGE_DIMENSIONS[1]} pixels")
+    # Check maximum dimensions
+    if width > MAX_IMAGE_DIMENSIONS[0] or height > MAX_IMAGE_DIMENSIONS[1]:
+        raise ValueError(f"Image too large. Maximum size: {MAX_IMAGE_DIMENSIONS[0]}x{MAX_IMAGE_DIMENSIONS[1]} pixels")
+    # Check if image is mostly one color (might be corrupted or invalid)
+    image_array = np.array(image)
+    if len(image_array.shape) != 3:
+        raise ValueError("Invalid image format. Expected RGB image.")
+    mean_color = np.mean(image_array)
+    if mean_color < 10 or mean_color > 245:
+        raise ValueError("Image appears to be corrupted or invalid (too dark or too bright)")
+    return True
+
+def float_param(params, key, low, high):
+    """Numeric request parameter within [low, high]; ValueError when missing, malformed or out of range"""
+    try:
+        value = float(params[key])
+    except KeyError:
+        raise ValueError(f"Missing '{key}' parameter")
+    except (TypeError, ValueError):
+        raise ValueError(f"'{key}' must be a number")
+    if not low <= value <= high:
+        raise ValueError(f"'{key}' must be between {low} and {high}")
+    return value
+
+def location_candidates(params, class_names):
+    """
+    Names from class_names worth scoring given optional lat/lon (and radius) parameters, or None to score all.
+    Classes with no Hall location are always kept; if no located hall is nearby, all classes are scored.
+    """
+    if "lat" not in params and "lon" not in params:
+        return None
+    lat = float_param(params, "lat", -90, 90)
+    lon = float_param(params, "lon", -180, 180)
+    radius = float_param(params, "radius", 0, NEAREST_MAX_RADIUS_M) if "radius" in params else LOCATION_RADIUS_M
+    index = get_hall_index()
+    nearby = {name for name, _distance in index.within(lat, lon, radius)}
+    located = set(index.names)
+    candidates = [name for name in class_names if name in nearby or name not in located]
+    if not any(name in nearby for name in candidates):
+        return None
+    return candidates
+
+def get_preprocess(size=224):
+    """Resize/crop/normalize pipeline for a square input of `size` pixels (same 256:224 crop ratio)"""
+    return transforms.Compose([
+        transforms.Resize(size * 256 // 224),
+        transforms.CenterCrop(size),
+        transforms.ToTensor(),
+        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+    ])
+
+preprocess = get_preprocess(224)
+_preprocess_by_size = {224: preprocess}
+
+def class_probabilities(images, model, size=224):
+    """(len(images), num_classes) softmax probabilities at the given input size, one forward pass"""
+    if size not in _preprocess_by_size:
+        _preprocess_by_size[size] = get_preprocess(size)
+    batch = torch.stack([_preprocess_by_size[size](image) for image in images])
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    batch = batch.to(device)
+    model = model.to(device)
+    with torch.no_grad():
+        outputs = model(batch)
+        return F.softmax(outputs, dim=1).cpu()
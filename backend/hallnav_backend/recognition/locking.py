@@ -0,0 +1,27 @@
+"""
+Advisory lock files that serialise the writers of a published artifact (the
+schedule snapshot, the embedding gallery) across processes.
+"""
+import contextlib
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within one process
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock on `path`'s lock file (.<name>.lock next to it), held for the with block"""
+    if fcntl is None:
+        yield
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(f".{path.name}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
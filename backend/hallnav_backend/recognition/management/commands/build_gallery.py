@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import numpy as np
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from recognition.gallery import EmbeddingGallery
+from recognition.views import extract_embeddings, get_embedding_model
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+
+class Command(BaseCommand):
+    help = "Build the recognition gallery from a folder of reference photos (one sub-folder per hall)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Directory laid out as <source>/<hall name>/<image>")
+        parser.add_argument('--output', default=str(settings.GALLERY_PATH), help="Gallery file to publish")
+        parser.add_argument('--batch-size', type=int, default=32, help="Images per forward pass")
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.is_dir():
+            raise CommandError(f"{source} is not a directory")
+        model = get_embedding_model()
+        halls, embeddings, labels = [], [], []
+        for hall_dir in sorted(p for p in source.iterdir() if p.is_dir()):
+            paths = sorted(p for p in hall_dir.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+            if not paths:
+                continue
+            for start in range(0, len(paths), options['batch_size']):
+                images = [Image.open(p).convert('RGB') for p in paths[start:start + options['batch_size']]]
+                embeddings.append(extract_embeddings(images, model))
+            labels.extend([len(halls)] * len(paths))
+            halls.append(hall_dir.name)
+            self.stdout.write(f"{hall_dir.name}: {len(paths)} references")
+        if not halls:
+            raise CommandError(f"No images found under {source}")
+        # Built in one go so the IVF partitions are computed once
+        gallery = EmbeddingGallery(halls, np.vstack(embeddings), labels)
+        gallery.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {options['output']}: {len(gallery.halls)} halls, {len(gallery)} references"
+        ))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recognition.models import DataVersion
+from recognition.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Compile halls and schedules into the memory-mapped snapshot served by the API"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.SCHEDULE_SNAPSHOT_PATH),
+                            help="Snapshot file to publish")
+
+    def handle(self, *args, **options):
+        # Writes that sent no signals (queryset.update(), raw SQL) left the version alone; make
+        # every process drop the snapshot it has until this one is published
+        DataVersion.bump()
+        counts = build_snapshot(options['output'])
+        if counts is None:
+            self.stdout.write(f"A newer snapshot was published to {options['output']} meanwhile; kept it")
+            return
+        n_halls, n_rows = counts
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {options['output']}: {n_halls} halls, {n_rows} schedule entries"
+        ))
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from recognition import cascade
+from recognition.inference import CLASS_NAMES, MIN_CONFIDENCE_THRESHOLD, class_probabilities, get_model
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+DEFAULT_SPLIT = settings.BASE_DIR.parent.parent / 'dataset' / 'test'
+
+
+class Command(BaseCommand):
+    help = "Calibrate the resolution cascade margin on a labelled split (<split>/<class name>/<image>)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--split', default=str(DEFAULT_SPLIT), help="Labelled image folder, e.g. dataset/test")
+        parser.add_argument('--low-res', type=int, default=settings.CASCADE_LOW_RES, help="Cheap pass input size")
+        parser.add_argument('--batch-size', type=int, default=32, help="Images per forward pass")
+        parser.add_argument('--dry-run', action='store_true', help="Report without writing the calibration file")
+
+    def _classify(self, images, model, size, batch_size):
+        results = []
+        for start in range(0, len(images), batch_size):
+            probs = class_probabilities(images[start:start + batch_size], model, size)
+            conf, predicted = torch.max(probs, 1)
+            results.extend(zip(predicted.tolist(), conf.tolist()))
+        return results
+
+    def handle(self, *args, **options):
+        split = Path(options['split'])
+        paths = [p for name in CLASS_NAMES if (split / name).is_dir()
+                 for p in sorted((split / name).iterdir()) if p.suffix.lower() in IMAGE_EXTENSIONS]
+        if not paths:
+            raise CommandError(f"No images for {CLASS_NAMES} under {split}")
+        labels = [CLASS_NAMES.index(p.parent.name) for p in paths]
+        images = [Image.open(p).convert('RGB') for p in paths]
+        model = get_model()
+        low = self._classify(images, model, options['low_res'], options['batch_size'])
+        full = self._classify(images, model, cascade.FULL_RES, options['batch_size'])
+
+        threshold = MIN_CONFIDENCE_THRESHOLD
+        margin = cascade.calibrate_margin(low, full, threshold)
+        escalated = [conf < threshold + margin for _cls, conf in low]
+        final = [f if esc else l for l, f, esc in zip(low, full, escalated)]
+        # Accept/reject decisions and accepted classes must match the full-resolution model
+        same = all((fc >= threshold) == (c >= threshold) and (fc < threshold or fk == k)
+                   for (k, c), (fk, fc) in zip(final, full))
+        escalation_rate = sum(escalated) / len(paths)
+        compute = cascade.relative_cost(options['low_res']) + escalation_rate
+
+        def accuracy(results):
+            return sum(k == y and c >= threshold for (k, c), y in zip(results, labels)) / len(labels)
+
+        self.stdout.write(f"{len(paths)} images from {split}")
+        self.stdout.write(f"margin:            {margin:.4f} (escalate below {threshold + margin:.4f})")
+        self.stdout.write(f"escalation rate:   {escalation_rate:.2%}")
+        self.stdout.write(f"relative compute:  {compute:.3f} (saved {1 - compute:.2%})")
+        self.stdout.write(f"accepted-correct:  full {accuracy(full):.2%}, cascade {accuracy(final):.2%}")
+        self.stdout.write(f"same accept/reject as full model: {'yes' if same else 'NO'}")
+        if not options['dry_run']:
+            cascade.save_calibration({
+                "margin": margin,
+                "low_resolution": options['low_res'],
+                "threshold": threshold,
+                "images": len(paths),
+                "escalation_rate": escalation_rate,
+                "compute_saved": 1 - compute,
+            })
+            self.stdout.write(self.style.SUCCESS(f"Wrote {settings.CASCADE_CALIBRATION_PATH}"))
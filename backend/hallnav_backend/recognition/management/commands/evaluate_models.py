@@ -0,0 +1,199 @@
+import json
+import multiprocessing
+import platform
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+DEFAULT_SPLIT = settings.BASE_DIR.parent.parent / 'dataset' / 'dataset_resized' / 'test'
+BACKENDS = ('eager', 'traced', 'compiled', 'quantized')
+CALIBRATION_BINS = 15
+QUANTIZATION_CALIBRATION_IMAGES = 32
+
+
+def _expected_calibration_error(confidences, correct, bins=CALIBRATION_BINS):
+    """Mean |accuracy - confidence| over equal-width confidence bins, weighted by bin size"""
+    total = len(confidences)
+    error = 0.0
+    for i in range(bins):
+        low, high = i / bins, (i + 1) / bins
+        members = [k for k, c in enumerate(confidences) if low < c <= high or (i == 0 and c == 0)]
+        if members:
+            accuracy = sum(correct[k] for k in members) / len(members)
+            confidence = sum(confidences[k] for k in members) / len(members)
+            error += len(members) / total * abs(accuracy - confidence)
+    return error
+
+
+def _prepare(backend, path, calibration_batch):
+    """The model at `path` converted for `backend`"""
+    import torch
+    import torch.nn as nn
+    from recognition.inference import CLASS_NAMES, load_model
+
+    model = load_model(path)
+    scripted = isinstance(model, torch.jit.ScriptModule)
+    if backend == 'eager':
+        return model
+    if backend == 'traced':
+        if not scripted:
+            model = torch.jit.trace(model, calibration_batch[:1])
+        return torch.jit.optimize_for_inference(torch.jit.freeze(model.eval()))
+    if scripted:
+        raise ValueError(f"'{backend}' needs a MobileNetV2 state dict, {Path(path).name} is TorchScript")
+    if backend == 'compiled':
+        return torch.compile(model)
+    # Post-training static int8 quantization (fused conv-bn-relu, per-channel weights)
+    from torchvision.models.quantization import mobilenet_v2
+    engine = 'x86' if 'x86' in torch.backends.quantized.supported_engines else 'qnnpack'
+    torch.backends.quantized.engine = engine
+    quantized = mobilenet_v2(weights=None, quantize=False)
+    quantized.classifier[1] = nn.Linear(quantized.classifier[1].in_features, len(CLASS_NAMES))
+    quantized.load_state_dict(model.state_dict())
+    quantized.eval()
+    quantized.fuse_model()
+    quantized.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+    torch.ao.quantization.prepare(quantized, inplace=True)
+    with torch.no_grad():
+        quantized(calibration_batch)
+    return torch.ao.quantization.convert(quantized, inplace=True)
+
+
+def _timed(model, batch, warmup, runs):
+    import torch
+
+    timings = []
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(batch)
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def evaluate_backend(backend, path, samples, options):
+    """Runs in a fresh process so ru_maxrss is this backend's own peak; returns a result row"""
+    import django
+    django.setup()
+    import resource
+    import torch
+    import torch.nn.functional as F
+    from PIL import Image
+    from recognition.inference import get_preprocess
+
+    torch.set_num_threads(options['threads'])
+    preprocess = get_preprocess(224)
+    inputs = torch.stack([preprocess(Image.open(p).convert('RGB')) for p, _label in samples])
+    labels = torch.tensor([label for _p, label in samples])
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    row = {'name': f"{backend} ({Path(path).name})", 'backend': backend, 'path': str(path)}
+
+    start = time.perf_counter()
+    model = _prepare(backend, path, inputs[:QUANTIZATION_CALIBRATION_IMAGES])
+    with torch.no_grad():
+        logits = torch.cat([model(inputs[i:i + options['batch_size']])
+                            for i in range(0, len(inputs), options['batch_size'])])
+    row['setup_s'] = time.perf_counter() - start  # Loading, conversion and first (compiling) forward passes
+
+    probs = F.softmax(logits.float(), dim=1)
+    confidence, predicted = probs.max(1)
+    correct = (predicted == labels).tolist()
+    row['accuracy'] = sum(correct) / len(correct)
+    row['nll'] = F.nll_loss(torch.log(probs.clamp_min(1e-12)), labels).item()
+    row['ece'] = _expected_calibration_error(confidence.tolist(), correct)
+
+    batch = inputs[:1]
+    row['latency_ms'], row['latency_p95_ms'] = _timed(model, batch, options['warmup'], options['runs'])
+    repeats = -(-options['batch_size'] // len(inputs))
+    batch = inputs.repeat(repeats, 1, 1, 1)[:options['batch_size']]
+    row['batch_ms'], _ = _timed(model, batch, options['warmup'], max(5, options['runs'] // 5))
+    row['throughput'] = options['batch_size'] / row['batch_ms'] * 1000
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Kilobytes on Linux
+    row['peak_rss_mb'] = peak_kb / 1024
+    row['model_rss_mb'] = (peak_kb - baseline_kb) / 1024  # Growth after the test images were loaded
+    return row
+
+
+class Command(BaseCommand):
+    help = ("Compare model artifacts/backends on a labelled split: accuracy, calibration, "
+            "single-image and batched CPU latency, throughput and peak memory")
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', default=['eager', 'traced', 'quantized'],
+                            help=f"BACKEND[=PATH] with BACKEND one of {', '.join(BACKENDS)}; "
+                                 "PATH defaults to the served model (e.g. traced=../../dataset/student.pt)")
+        parser.add_argument('--split', default=str(DEFAULT_SPLIT),
+                            help="Labelled image folder (<split>/<class>/<image>)")
+        parser.add_argument('--batch-size', type=int, default=32, help="Batch size for the batched timing")
+        parser.add_argument('--runs', type=int, default=50, help="Timed single-image forward passes")
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--threads', type=int, default=None, help="Torch CPU threads (default: torch's)")
+        parser.add_argument('--json', default=None, help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        import torch
+        from recognition.inference import CLASS_NAMES, MODEL_PATH
+
+        split = Path(options['split'])
+        samples = [(str(p), index) for index, name in enumerate(CLASS_NAMES) if (split / name).is_dir()
+                   for p in sorted((split / name).iterdir()) if p.suffix.lower() in IMAGE_EXTENSIONS]
+        if not samples:
+            raise CommandError(f"No images for {CLASS_NAMES} under {split}")
+        specs = []
+        for spec in options['models']:
+            backend, _, path = spec.partition('=')
+            if backend not in BACKENDS:
+                raise CommandError(f"Unknown backend '{backend}'. Expected one of: {', '.join(BACKENDS)}")
+            specs.append((backend, Path(path) if path else MODEL_PATH))
+        settings_used = {
+            'batch_size': options['batch_size'],
+            'runs': options['runs'],
+            'warmup': options['warmup'],
+            'threads': options['threads'] or torch.get_num_threads(),
+        }
+
+        rows = []
+        # One fresh interpreter per backend: peak RSS is not shared and compiled/quantized state cannot leak
+        context = multiprocessing.get_context('spawn')
+        for backend, path in specs:
+            self.stdout.write(f"Evaluating {backend} ({path.name}) on {len(samples)} images...")
+            with context.Pool(1) as pool:
+                try:
+                    rows.append(pool.apply(evaluate_backend, (backend, str(path), samples, settings_used)))
+                except Exception as e:
+                    self.stderr.write(f"  {backend} failed: {e}")
+                    rows.append({'name': f"{backend} ({path.name})", 'backend': backend, 'path': str(path),
+                                 'error': str(e)})
+
+        self.stdout.write("")
+        self.stdout.write(f"{'model':<34}{'acc':>8}{'ECE':>7}{'NLL':>7}{'ms/img':>8}{'p95':>8}"
+                          f"{'img/s':>8}{'RSS MB':>8}{'+model':>8}")
+        for row in rows:
+            if 'error' in row:
+                self.stdout.write(f"{row['name']:<34}  failed: {row['error'][:80]}")
+                continue
+            self.stdout.write(
+                f"{row['name']:<34}{row['accuracy'] * 100:>7.2f}%{row['ece']:>7.3f}{row['nll']:>7.3f}"
+                f"{row['latency_ms']:>8.2f}{row['latency_p95_ms']:>8.2f}{row['throughput']:>8.1f}"
+                f"{row['peak_rss_mb']:>8.0f}{row['model_rss_mb']:>8.0f}")
+
+        if options['json']:
+            report = {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'split': str(split),
+                'images': len(samples),
+                'torch': torch.__version__,
+                'machine': platform.machine(),
+                'settings': settings_used,
+                'results': rows,
+            }
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['json']}"))
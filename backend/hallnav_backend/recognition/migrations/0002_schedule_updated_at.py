@@ -0,0 +1,18 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
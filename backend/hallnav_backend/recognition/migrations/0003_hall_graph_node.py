@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0002_schedule_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='graph_node',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
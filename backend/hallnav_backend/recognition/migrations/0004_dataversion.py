@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    apps.get_model('recognition', 'DataVersion').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recognition', '0003_hall_graph_node'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,8 @@ class Hall(models.Model):
     latitude = models.FloatField()
     longitude = models.FloatField()
     floor = models.IntegerField()
+    # Campus graph location this hall routes to (navigation node name); blank when it is not on the map
+    graph_node = models.CharField(max_length=100, blank=True, default='')
 
     def __str__(self):
         return self.name
@@ -15,6 +17,24 @@ class Schedule(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     course_name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.course_name} in {self.hall.name}"
\ No newline at end of file
+        return f"{self.course_name} in {self.hall.name}"
+
+class DataVersion(models.Model):
+    """
+    Single-row counter bumped in the same transaction as every Hall/Schedule write
+    (see signals.py). Caches in other processes compare it with the version they were
+    built from to notice writes they did not see.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        if not cls.objects.filter(pk=1).update(version=models.F('version') + 1):
+            cls.objects.get_or_create(pk=1, defaults={'version': 1})
@@ -0,0 +1,83 @@
+"""
+Distance-matrix payloads on top of the campus routing library (see routing/).
+The graph and route tables are loaded once per process, on first use.
+"""
+import logging
+import math
+import threading
+
+from django.conf import settings
+
+from .routing.campus_graph import CampusGraph, build_default_campus
+from .routing.floor_routing import PROFILES
+from .routing.route_table import RouteTable, to_sparse
+
+logger = logging.getLogger(__name__)
+
+_campus_graph = None
+_route_tables = {}
+_lock = threading.Lock()
+
+
+def get_campus_graph():
+    """The campus graph from CAMPUS_GRAPH_PATH (the demo campus when unset), loaded once per process"""
+    global _campus_graph
+    with _lock:
+        if _campus_graph is None:
+            path = settings.CAMPUS_GRAPH_PATH
+            _campus_graph = CampusGraph.load(path) if path else build_default_campus()
+        return _campus_graph
+
+
+def get_route_table(profile='default'):
+    """
+    The all-pairs route table of the named locations for a routing profile, loaded from
+    ROUTE_CACHE_DIR when it matches the current graph and built (and cached) otherwise.
+    """
+    graph = get_campus_graph()
+    with _lock:
+        if profile not in _route_tables:
+            path = settings.ROUTE_CACHE_DIR / f'routes-{profile}.npz'
+            table = RouteTable.load(str(path), graph, PROFILES[profile])
+            if table is None:
+                table = RouteTable(graph, list(graph.named_locations()), PROFILES[profile])
+                try:
+                    table.save(str(path))
+                except OSError as e:
+                    logger.warning("Could not cache route table %s: %s", path, e)
+            _route_tables[profile] = table
+        return _route_tables[profile]
+
+
+def _to_json(values):
+    """Floats -> JSON-safe list, rounded to 2 decimals, with None for unreachable (inf) entries"""
+    return [round(v, 2) if math.isfinite(v) else None for v in values]
+
+
+def distance_matrix_payload(origins, destinations, accessible=False, sparse=False, max_seconds=None):
+    """
+    Distances (graph units) and walking times (seconds) between every origin and destination.
+    Dense output is two len(origins) x len(destinations) lists with null when unreachable;
+    sparse output lists only reachable pairs (within max_seconds, if given) as COO triplets.
+    Raises ValueError for unknown locations.
+    """
+    distances = get_route_table('accessible' if accessible else 'default').matrix(origins, destinations)
+    durations = distances / settings.WALKING_SPEED
+    payload = {"origins": list(origins), "destinations": list(destinations), "walking_speed": settings.WALKING_SPEED}
+    if sparse or max_seconds is not None:
+        rows, cols, times = to_sparse(durations, max_seconds)
+        payload.update({
+            "format": "coo",
+            "shape": list(distances.shape),
+            "rows": rows.tolist(),
+            "cols": cols.tolist(),
+            "distances": _to_json(distances[rows, cols].tolist()),
+            "durations": _to_json(times.tolist()),
+        })
+    else:
+        payload.update({
+            "format": "dense",
+            "distances": [_to_json(row) for row in distances.tolist()],
+            "durations": [_to_json(row) for row in durations.tolist()],
+        })
+    return payload
@@ -0,0 +1,10 @@
+"""
+Campus routing library (graph, floor-aware router, route tables) used by the
+distance-matrix API.
+
+These modules are a vendored copy of frontend/streamlit/lib/{campus_graph,
+floor_routing,route_table}.py so the backend deploys without the Streamlit
+tree; the Streamlit-only glue (frontend lib/navigation.py) is not copied, its
+backend counterpart is recognition/navigation.py. Edit the frontend copy and
+copy the files over; recognition.tests.RoutingSyncTests fails while the two differ.
+"""
@@ -0,0 +1,348 @@
+import hashlib
+import heapq
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NODE_KINDS = ("hall", "junction", "entrance")
+EDGE_KINDS = ("corridor", "path", "stairs", "elevator", "ramp")
+# Edges that move between floors (or levels); routing treats them as layer transitions
+TRANSITION_KINDS = ("stairs", "elevator", "ramp")
+
+EARTH_RADIUS_M = 6371000.0
+
+# Static hall locations of the built-in demo campus (will be updated to use database later)
+HALL_LOCATIONS = {
+    "Entrance": (0, 0),
+    "Hall_A101": (1, 2),
+    "Hall_B202": (3, 5),
+    "Library": (5, 1),
+}
+
+
+def euclidean(a: Sequence[float], b: Sequence[float]) -> float:
+    return math.hypot(b[0] - a[0], b[1] - a[1])
+
+
+def haversine(a: Sequence[float], b: Sequence[float]) -> float:
+    """Great-circle distance in metres between two (lat, lon) points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+METRICS = {"euclidean": euclidean, "haversine": haversine}
+
+
+class CampusGraph:
+    """
+    Weighted, undirected campus graph of halls, junctions and entrances joined
+    by corridor/path edges, with stairs/elevator/ramp edges between floors.
+    Call `freeze()` after building it; queries use A* with a precomputed
+    landmark (ALT) heuristic.
+    """
+
+    def __init__(self, metric: str = "euclidean", num_landmarks: int = 8):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Expected one of: {', '.join(METRICS)}")
+        self.metric = metric
+        self.num_landmarks = num_landmarks
+        self.names: List[str] = []
+        self.kinds: List[str] = []
+        self.coords: List[Tuple[float, float]] = []
+        self.floors: List[int] = []
+        self.buildings: List[Optional[str]] = []
+        self.index: Dict[str, int] = {}
+        self.edges: Dict[Tuple[int, int], Tuple[float, str]] = {}  # (u, v) with u < v -> (weight, kind)
+        self._adjacency: Optional[List[List[Tuple[int, float]]]] = None
+        self._landmarks: Optional[np.ndarray] = None
+        self._landmark_dist: Optional[np.ndarray] = None
+
+    # ---------- Building ----------
+    def add_node(self, name: str, coord: Sequence[float], kind: str = "junction",
+                 floor: int = 0, building: Optional[str] = None) -> int:
+        """Adds a node; outdoor nodes have no building."""
+        if kind not in NODE_KINDS:
+            raise ValueError(f"Unknown node kind '{kind}'. Expected one of: {', '.join(NODE_KINDS)}")
+        if name in self.index:
+            raise ValueError(f"Duplicate node '{name}'")
+        self.index[name] = len(self.names)
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.coords.append((float(coord[0]), float(coord[1])))
+        self.floors.append(int(floor))
+        self.buildings.append(building)
+        self._adjacency = None
+        return self.index[name]
+
+    def add_edge(self, a: str, b: str, weight: Optional[float] = None, kind: str = "corridor") -> None:
+        """Adds an undirected edge; the weight defaults to the distance between the endpoints."""
+        if a not in self.index or b not in self.index:
+            raise ValueError(f"Unknown node in edge {a!r} - {b!r}")
+        if kind not in EDGE_KINDS:
+            raise ValueError(f"Unknown edge kind '{kind}'. Expected one of: {', '.join(EDGE_KINDS)}")
+        u, v = sorted((self.index[a], self.index[b]))
+        if u == v:
+            raise ValueError(f"Self-loop on node '{a}'")
+        if (u, v) in self.edges:
+            raise ValueError(f"Duplicate edge {a!r} - {b!r}; use separate nodes for parallel stairs/elevators")
+        if weight is None:
+            weight = METRICS[self.metric](self.coords[u], self.coords[v])
+        if weight < 0:
+            raise ValueError(f"Negative weight on edge {a!r} - {b!r}")
+        self.edges[(u, v)] = (float(weight), kind)
+        self._adjacency = None
+
+    def freeze(self) -> "CampusGraph":
+        """Builds adjacency lists and the landmark distance table."""
+        adjacency: List[List[Tuple[int, float]]] = [[] for _ in self.names]
+        for (u, v), (weight, _kind) in self.edges.items():
+            adjacency[u].append((v, weight))
+            adjacency[v].append((u, weight))
+        self._adjacency = adjacency
+        self._select_landmarks()
+        return self
+
+    def set_edge_weight(self, a: str, b: str, weight: float) -> float:
+        """
+        Changes the weight of an existing edge in place.
+        Returns:
+            float: The previous weight.
+        """
+        u, v = sorted((self.index[a], self.index[b]))
+        if (u, v) not in self.edges:
+            raise ValueError(f"No edge {a!r} - {b!r}")
+        if weight < 0:
+            raise ValueError(f"Negative weight on edge {a!r} - {b!r}")
+        old, kind = self.edges[(u, v)]
+        self.edges[(u, v)] = (float(weight), kind)
+        if self._adjacency is not None:
+            for x, y in ((u, v), (v, u)):
+                self._adjacency[x] = [(n, float(weight) if n == y else w) for n, w in self._adjacency[x]]
+            if weight < old:
+                # Shorter edges can break the landmark lower bounds; longer ones cannot
+                self._select_landmarks()
+        return old
+
+    def filtered_adjacency(self, excluded_kinds: Iterable[str]) -> List[List[Tuple[int, float]]]:
+        """Adjacency lists without edges of the given kinds."""
+        excluded = set(excluded_kinds)
+        if not excluded:
+            return self.adjacency
+        adjacency: List[List[Tuple[int, float]]] = [[] for _ in self.names]
+        for (u, v), (weight, kind) in self.edges.items():
+            if kind not in excluded:
+                adjacency[u].append((v, weight))
+                adjacency[v].append((u, weight))
+        return adjacency
+
+    def fingerprint(self) -> str:
+        """Hash of nodes and edges, used to validate cached tables."""
+        digest = hashlib.sha1()
+        digest.update(json.dumps([self.names, self.kinds, self.floors, self.buildings]).encode("utf-8"))
+        for (u, v), (weight, kind) in sorted(self.edges.items()):
+            digest.update(f"{u},{v},{weight!r},{kind};".encode("utf-8"))
+        return digest.hexdigest()
+
+    @property
+    def adjacency(self) -> List[List[Tuple[int, float]]]:
+        if self._adjacency is None:
+            self.freeze()
+        return self._adjacency
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    # ---------- Search ----------
+    def dijkstra(self, source: int,
+                 adjacency: Optional[List[List[Tuple[int, float]]]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Single-source shortest paths.
+        Args:
+            adjacency: Optional restricted adjacency (e.g. without stairs).
+        Returns:
+            (dist, pred): float64 distances (inf when unreachable) and int32 predecessors (-1 for none).
+        """
+        adjacency = self.adjacency if adjacency is None else adjacency
+        n = len(adjacency)
+        dist = [math.inf] * n
+        pred = [-1] * n
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in adjacency[u]:
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return np.array(dist, dtype=np.float64), np.array(pred, dtype=np.int32)
+
+    def _select_landmarks(self) -> None:
+        """Picks landmarks by farthest-point selection and stores their distances to every node."""
+        n = len(self.names)
+        k = min(self.num_landmarks, n)
+        if k == 0:
+            self._landmarks = np.zeros(0, dtype=np.int32)
+            self._landmark_dist = np.zeros((0, n))
+            return
+        landmarks: List[int] = []
+        rows: List[np.ndarray] = []
+        nearest = np.full(n, np.inf)  # distance from each node to its closest landmark
+        candidate = 0
+        for _ in range(k):
+            dist, _pred = self.dijkstra(candidate)
+            landmarks.append(candidate)
+            rows.append(dist)
+            nearest = np.minimum(nearest, dist)
+            unreached = np.flatnonzero(np.isinf(nearest))
+            if unreached.size:
+                # Cover disconnected components before spreading within one
+                candidate = int(unreached[0])
+            else:
+                candidate = int(np.argmax(nearest))
+                if nearest[candidate] == 0:
+                    break
+        self._landmarks = np.array(landmarks, dtype=np.int32)
+        self._landmark_dist = np.vstack(rows)
+
+    def heuristic_to(self, target: int) -> List[float]:
+        """ALT lower bound on the distance from every node to `target` (triangle inequality)."""
+        table = self._landmark_dist
+        if table is None or table.shape[0] == 0:
+            return [0.0] * len(self.names)
+        to_target = table[:, target:target + 1]
+        with np.errstate(invalid="ignore"):
+            bound = np.abs(table - to_target)
+        # Landmarks that cannot reach both nodes give no information
+        bound[~np.isfinite(bound)] = 0.0
+        return bound.max(axis=0).tolist()
+
+    def astar(self, source: int, target: int,
+              adjacency: Optional[List[List[Tuple[int, float]]]] = None) -> Tuple[List[int], float]:
+        """
+        A* search with the ALT heuristic.
+        Args:
+            adjacency: Optional restricted adjacency (a subgraph of this graph); the landmark
+                bound stays admissible because subgraph distances can only be longer.
+        Returns:
+            (path, distance): node ids from source to target, or ([], inf) when unreachable.
+        """
+        adjacency = self.adjacency if adjacency is None else adjacency
+        h = self.heuristic_to(target)
+        dist = {source: 0.0}
+        pred = {source: -1}
+        closed = set()
+        heap = [(h[source], 0.0, source)]
+        while heap:
+            _f, d, u = heapq.heappop(heap)
+            if u == target:
+                path = [u]
+                while pred[path[-1]] != -1:
+                    path.append(pred[path[-1]])
+                return path[::-1], d
+            if u in closed:
+                continue
+            closed.add(u)
+            for v, w in adjacency[u]:
+                nd = d + w
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd + h[v], nd, v))
+        return [], math.inf
+
+    def shortest_path(self, start: str, end: str) -> Tuple[List[str], float]:
+        """
+        Shortest path between two named nodes.
+        Returns:
+            (route, distance): node names from start to end and the total weight.
+        Raises:
+            ValueError: If either node is unknown or no path exists.
+        """
+        if start not in self.index or end not in self.index:
+            raise ValueError("Invalid start or end location.")
+        path, distance = self.astar(self.index[start], self.index[end])
+        if not path:
+            raise ValueError(f"No route between {start} and {end}.")
+        return [self.names[i] for i in path], distance
+
+    def edge_between(self, a: str, b: str) -> Tuple[float, str]:
+        u, v = sorted((self.index[a], self.index[b]))
+        return self.edges[(u, v)]
+
+    def layer(self, node: int) -> Tuple[Optional[str], int]:
+        """(building, floor) of a node; outdoor nodes share the (None, floor) layers."""
+        return self.buildings[node], self.floors[node]
+
+    def named_locations(self, kinds: Iterable[str] = ("hall", "entrance")) -> Dict[str, Tuple[float, float]]:
+        kinds = set(kinds)
+        return {name: coord for name, kind, coord in zip(self.names, self.kinds, self.coords) if kind in kinds}
+
+    # ---------- Serialization ----------
+    @classmethod
+    def from_dict(cls, data: dict) -> "CampusGraph":
+        """
+        Builds a graph from {"metric": ..., "nodes": [{"name", "coord", "kind", "floor", "building"}],
+        "edges": [{"from", "to", "weight", "kind"}]}.
+        """
+        graph = cls(metric=data.get("metric", "euclidean"), num_landmarks=data.get("landmarks", 8))
+        for node in data["nodes"]:
+            graph.add_node(node["name"], node["coord"], node.get("kind", "junction"),
+                           node.get("floor", 0), node.get("building"))
+        for edge in data["edges"]:
+            graph.add_edge(edge["from"], edge["to"], edge.get("weight"), edge.get("kind", "corridor"))
+        return graph.freeze()
+
+    @classmethod
+    def load(cls, path: str) -> "CampusGraph":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_default_campus() -> CampusGraph:
+    """
+    Demo campus: the HALL_LOCATIONS points joined through outdoor junctions,
+    with Hall_A101 on floor 1 of Block A and Hall_B202 on floor 2 of Block B.
+    """
+    graph = CampusGraph()
+    graph.add_node("Entrance", HALL_LOCATIONS["Entrance"], "entrance")
+    graph.add_node("Library", HALL_LOCATIONS["Library"], "hall")
+    graph.add_node("Main Junction", (1, 0.5))
+    graph.add_node("East Junction", (3, 1))
+    graph.add_node("North Junction", (3, 3))
+
+    graph.add_node("Block A Entrance", (1, 1.2), "entrance", floor=0, building="Block A")
+    graph.add_node("Block A Landing 1", (1, 1.6), floor=1, building="Block A")
+    graph.add_node("Block A Ramp Top", (1.4, 1.4), floor=1, building="Block A")
+    graph.add_node("Hall_A101", HALL_LOCATIONS["Hall_A101"], "hall", floor=1, building="Block A")
+    graph.add_node("Block B Entrance", (3, 4), "entrance", floor=0, building="Block B")
+    graph.add_node("Block B Lift Lobby", (3.4, 4), floor=0, building="Block B")
+    graph.add_node("Block B Landing 2", (3, 4.5), floor=2, building="Block B")
+    graph.add_node("Block B Lift 2", (3.4, 4.5), floor=2, building="Block B")
+    graph.add_node("Hall_B202", HALL_LOCATIONS["Hall_B202"], "hall", floor=2, building="Block B")
+
+    graph.add_edge("Entrance", "Main Junction", kind="path")
+    graph.add_edge("Main Junction", "East Junction", kind="path")
+    graph.add_edge("East Junction", "Library", kind="path")
+    graph.add_edge("East Junction", "North Junction", kind="path")
+    graph.add_edge("Main Junction", "Block A Entrance", kind="path")
+    graph.add_edge("North Junction", "Block B Entrance", kind="path")
+    graph.add_edge("Block A Entrance", "Block A Landing 1", 1.0, kind="stairs")
+    graph.add_edge("Block A Entrance", "Block A Ramp Top", 1.8, kind="ramp")
+    graph.add_edge("Block A Landing 1", "Hall_A101")
+    graph.add_edge("Block A Ramp Top", "Hall_A101")
+    graph.add_edge("Block B Entrance", "Block B Landing 2", 1.5, kind="stairs")
+    graph.add_edge("Block B Entrance", "Block B Lift Lobby")
+    graph.add_edge("Block B Lift Lobby", "Block B Lift 2", 1.0, kind="elevator")
+    graph.add_edge("Block B Landing 2", "Hall_B202")
+    graph.add_edge("Block B Lift 2", "Hall_B202")
+    return graph.freeze()
@@ -0,0 +1,79 @@
+"""
+Schedule lookups shared by the API views.
+
+Schedule reads and ETags come from the memory-mapped snapshot when a current
+one is published (see snapshot.py) and fall back to the ORM otherwise. Both
+sources compute the ETag the same way (compute_etag), so it does not change
+when a request is answered from the other one.
+"""
+from django.db.models import Count, Max
+
+from .models import Hall, Schedule
+from .snapshot import compute_etag, get_snapshot
+
+
+def lookup_hall_schedule(hall_name):
+    """
+    (entries, ETag) for a hall, both from the same source (the current snapshot, else the ORM),
+    or None if the hall is unknown. Entries are [(start_time, end_time, course_name), ...].
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        entries = snapshot.schedule(hall_name)
+        if entries is not None:
+            return entries, snapshot.etag(hall_name)
+    # Hall missing from (or added after) the snapshot, or no current snapshot: ask the database
+    hall = Hall.objects.filter(name=hall_name).order_by('id').first()
+    if hall is None:
+        return None
+    rows = list(Schedule.objects.filter(hall=hall).order_by('start_time').values_list(
+        'start_time', 'end_time', 'course_name', 'updated_at'))
+    latest = max((updated_at for *_entry, updated_at in rows), default=None)
+    return [tuple(entry) for *entry, _updated_at in rows], compute_etag(hall_name, len(rows), latest)
+
+
+def get_hall_schedule(hall_name):
+    """Return [(start_time, end_time, course_name), ...] for a hall, or None if the hall is unknown"""
+    found = lookup_hall_schedule(hall_name)
+    return None if found is None else found[0]
+
+
+def format_schedule(entries):
+    """Join schedule entries into the "HH:MM-HH:MM name; ..." string used by the recognition response"""
+    return "; ".join([
+        f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')} {course_name}"
+        for start, end, course_name in entries or []
+    ]) or "No schedule found"
+
+
+def schedule_etag(hall_name):
+    """ETag for a hall's schedule (None if the hall is unknown); changes whenever an entry is added, edited or removed"""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        etag = snapshot.etag(hall_name)
+        if etag is not None:
+            return etag
+    hall = Hall.objects.filter(name=hall_name).order_by('id').first()
+    if hall is None:
+        return None
+    stats = Schedule.objects.filter(hall=hall).aggregate(count=Count('id'), latest=Max('updated_at'))
+    return compute_etag(hall_name, stats['count'], stats['latest'])
+
+
+def schedule_etags():
+    """{hall name: ETag} for every hall, from one query; agrees with schedule_etag"""
+    rows = Hall.objects.order_by('-id').annotate(count=Count('schedule'), latest=Max('schedule__updated_at'))
+    # Ordered by descending id so that, for duplicate names, the first hall (as in schedule_etag) wins
+    return {name: compute_etag(name, count, latest) for name, count, latest in rows.values_list('name', 'count', 'latest')}
+
+
+def serialize_schedule(entries):
+    """Structured form of schedule entries for JSON responses"""
+    return [
+        {
+            "course_name": course_name,
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat(),
+        }
+        for start, end, course_name in entries or []
+    ]
@@ -0,0 +1,88 @@
+"""
+Publish schedule change events (see events.py) when Schedule rows are saved or deleted,
+republish the schedule snapshot (see snapshot.py) after Hall/Schedule writes, and drop
+the hall location index (see spatial.py) when Hall rows change.
+
+Every Hall/Schedule write bumps DataVersion in its own transaction, so other processes
+can tell their cached snapshot is behind. The snapshot is rebuilt once per transaction:
+wrap bulk imports in transaction.atomic() instead of saving row by row in autocommit.
+
+Queryset .update()/bulk writes and raw SQL send no signals; rerun
+`manage.py build_schedule_snapshot` after those.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from .events import broker
+from .models import DataVersion, Hall, Schedule
+from .schedules import schedule_etag
+from .snapshot import recheck_snapshot, refresh_snapshot
+from .spatial import invalidate_hall_index
+
+
+def _hall_name(hall_id):
+    return Hall.objects.filter(pk=hall_id).values_list('name', flat=True).first()
+
+
+def _changed():
+    """Record a Hall/Schedule write: bump the data version and stop serving the current snapshot here"""
+    DataVersion.bump()
+    recheck_snapshot()
+
+
+def _notify(*changes):
+    """
+    Once the surrounding transaction commits, republish the snapshot and then publish one event
+    per (hall name, action), so subscribers that refetch right away get the new schedule
+    """
+    def send():
+        refresh_snapshot()
+        for hall_name, action in changes:
+            if hall_name is None or not broker.has_subscribers(hall_name):
+                continue
+            broker.publish({
+                "hall_id": hall_name,
+                "action": action,
+                "etag": schedule_etag(hall_name),
+                "schedule_url": reverse('hall_schedule', args=[hall_name]),
+            })
+
+    transaction.on_commit(send)
+
+
+@receiver(pre_save, sender=Schedule)
+def remember_previous_hall(sender, instance, raw=False, **kwargs):
+    # A schedule moved to another hall is also a change for the hall it left
+    instance._previous_hall_id = None
+    if instance.pk and not raw:
+        instance._previous_hall_id = Schedule.objects.filter(pk=instance.pk).values_list('hall_id', flat=True).first()
+
+
+@receiver(post_save, sender=Schedule)
+def schedule_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    _changed()
+    changes = [(_hall_name(instance.hall_id), "created" if created else "updated")]
+    previous_hall_id = getattr(instance, '_previous_hall_id', None)
+    if previous_hall_id is not None and previous_hall_id != instance.hall_id:
+        changes.insert(0, (_hall_name(previous_hall_id), "deleted"))
+    _notify(*changes)
+
+
+@receiver(post_delete, sender=Schedule)
+def schedule_deleted(sender, instance, **kwargs):
+    _changed()
+    _notify((_hall_name(instance.hall_id), "deleted"))
+
+
+@receiver(post_save, sender=Hall)
+@receiver(post_delete, sender=Hall)
+def hall_changed(sender, **kwargs):
+    _changed()
+    # Rebuilt lazily on the next lookup; also drop it right away so this process sees the change
+    invalidate_hall_index()
+    transaction.on_commit(invalidate_hall_index)
+    transaction.on_commit(refresh_snapshot)
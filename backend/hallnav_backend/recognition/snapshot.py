@@ -0,0 +1,304 @@
+"""
+Precompiled, memory-mapped schedule snapshot.
+
+`build_snapshot` compiles every Hall and Schedule row into one binary file
+(the same rows the ORM fallback returns, so responses never depend on which
+source answered), together with each hall's schedule ETag. `get_snapshot`
+memory-maps the latest published file so request handlers can answer
+hall/schedule lookups and revalidations without touching the ORM.
+
+Every snapshot records the DataVersion (see models.py) it was built from.
+Hall and Schedule writes bump that version and republish the snapshot through
+`refresh_snapshot` once their transaction commits (see signals.py); the
+rebuild is skipped when the published file is already that new, so a
+transaction touching many rows costs one rebuild, and an older build never
+replaces a newer one. Each process re-checks the file and the database
+version every CHECK_INTERVAL seconds and ignores a snapshot that is behind the
+database, so lookups then fall back to the ORM until it is republished.
+
+File layout (little endian):
+    header   64 bytes (magic, version, build time, record counts, data version)
+    halls    HALL_DTYPE records, one per hall; `first`/`count` index the rows
+    rows     ROW_DTYPE records, grouped by hall and sorted by start time
+    strings  UTF-8 blob referenced by (offset, length) pairs
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .locking import file_lock
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'HNSS'
+VERSION = 4
+HEADER = struct.Struct('<4sIqIIIQ')
+HEADER_SIZE = 64
+
+HALL_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('capacity', '<i4'),
+    ('floor', '<i4'),
+    ('name_off', '<u4'),
+    ('name_len', '<u4'),
+    ('first', '<u4'),
+    ('count', '<u4'),
+    ('etag', 'S16'),  # schedule_etag of the hall's rows, hex
+])
+
+ROW_DTYPE = np.dtype([
+    ('start', '<i8'),  # epoch microseconds, UTC
+    ('end', '<i8'),
+    ('name_off', '<u4'),
+    ('name_len', '<u4'),
+])
+
+# Seconds between stat() calls looking for a newly published snapshot
+CHECK_INTERVAL = getattr(settings, 'SCHEDULE_SNAPSHOT_CHECK_INTERVAL', 1.0)
+
+
+def compute_etag(hall_name, count, latest):
+    """ETag of a hall's schedule from its entry count and latest updated_at (None when empty)"""
+    key = f"{hall_name}|{count}|{latest.timestamp() if latest else 0}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _to_micros(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def _from_micros(value):
+    return datetime.fromtimestamp(int(value) / 1_000_000, tz=dt_timezone.utc)
+
+
+class ScheduleSnapshot:
+    """Read-only view over a memory-mapped snapshot file"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        generated_at, n_halls, n_rows, n_strings, self.data_version = _read_header(self._mmap, self.path)
+        self.generated_at = _from_micros(generated_at)
+
+        offset = HEADER_SIZE
+        self._halls = np.frombuffer(self._mmap, dtype=HALL_DTYPE, count=n_halls, offset=offset)
+        offset += self._halls.nbytes
+        self._rows = np.frombuffer(self._mmap, dtype=ROW_DTYPE, count=n_rows, offset=offset)
+        offset += self._rows.nbytes
+        self._strings = memoryview(self._mmap)[offset:offset + n_strings]
+
+        # Hall names are the lookup key; keep the first hall for duplicate names
+        self._index = {}
+        for i, hall in enumerate(self._halls):
+            self._index.setdefault(self._string(hall['name_off'], hall['name_len']), i)
+
+    def _string(self, off, length):
+        return bytes(self._strings[int(off):int(off) + int(length)]).decode('utf-8')
+
+    def __contains__(self, hall_name):
+        return hall_name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def hall_names(self):
+        return list(self._index)
+
+    def hall(self, hall_name):
+        """Return the hall's fields as a dict, or None if it is not in the snapshot"""
+        i = self._index.get(hall_name)
+        if i is None:
+            return None
+        hall = self._halls[i]
+        return {
+            'id': int(hall['id']),
+            'name': hall_name,
+            'capacity': int(hall['capacity']),
+            'latitude': float(hall['latitude']),
+            'longitude': float(hall['longitude']),
+            'floor': int(hall['floor']),
+        }
+
+    def etag(self, hall_name):
+        """The hall's schedule ETag, or None if it is not in the snapshot"""
+        i = self._index.get(hall_name)
+        return None if i is None else self._halls[i]['etag'].decode('ascii')
+
+    def schedule(self, hall_name):
+        """Return [(start_time, end_time, course_name), ...] for a hall, or None if it is not in the snapshot"""
+        i = self._index.get(hall_name)
+        if i is None:
+            return None
+        first = int(self._halls[i]['first'])
+        rows = self._rows[first:first + int(self._halls[i]['count'])]
+        return [
+            (_from_micros(row['start']), _from_micros(row['end']), self._string(row['name_off'], row['name_len']))
+            for row in rows
+        ]
+
+
+def _read_header(buffer, path):
+    """(generated_at, n_halls, n_rows, n_strings, data_version) from a snapshot's first bytes"""
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"{path} is not a schedule snapshot")
+    magic, version, generated_at, n_halls, n_rows, n_strings, data_version = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a schedule snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported schedule snapshot version {version}")
+    return generated_at, n_halls, n_rows, n_strings, data_version
+
+
+def published_version(path=None):
+    """DataVersion of the published snapshot, or None when there is no (readable) snapshot"""
+    path = Path(path or settings.SCHEDULE_SNAPSHOT_PATH)
+    try:
+        with open(path, 'rb') as f:
+            return _read_header(f.read(HEADER.size), path)[4]
+    except (OSError, ValueError):
+        return None
+
+
+def build_snapshot(path=None):
+    """Compile all halls and schedules into a snapshot and publish it atomically.
+
+    Returns the number of (halls, schedule rows) written, or None when a snapshot built
+    from a newer DataVersion was published meanwhile (it is kept).
+    """
+    from .models import DataVersion, Hall, Schedule
+
+    path = Path(path or settings.SCHEDULE_SNAPSHOT_PATH)
+    # Read the version first: rows committed after it only make the snapshot newer than it claims
+    data_version = DataVersion.current()
+    halls = list(Hall.objects.order_by('id'))
+    schedules = Schedule.objects.order_by('hall_id', 'start_time').values_list(
+        'hall_id', 'start_time', 'end_time', 'course_name', 'updated_at')
+
+    strings = bytearray()
+
+    def add_string(value):
+        data = value.encode('utf-8')
+        off = len(strings)
+        strings.extend(data)
+        return off, len(data)
+
+    rows_by_hall = {}
+    latest_by_hall = {}
+    for hall_id, start, end, course_name, updated_at in schedules:
+        rows_by_hall.setdefault(hall_id, []).append((_to_micros(start), _to_micros(end), *add_string(course_name)))
+        if latest_by_hall.get(hall_id) is None or updated_at > latest_by_hall[hall_id]:
+            latest_by_hall[hall_id] = updated_at
+
+    hall_records = np.zeros(len(halls), dtype=HALL_DTYPE)
+    row_records = []
+    for i, hall in enumerate(halls):
+        rows = rows_by_hall.get(hall.id, [])
+        name_off, name_len = add_string(hall.name)
+        etag = compute_etag(hall.name, len(rows), latest_by_hall.get(hall.id))
+        hall_records[i] = (hall.id, hall.latitude, hall.longitude, hall.capacity, hall.floor,
+                           name_off, name_len, len(row_records), len(rows), etag.encode('ascii'))
+        row_records.extend(rows)
+    row_records = np.array(row_records, dtype=ROW_DTYPE)
+
+    header = HEADER.pack(MAGIC, VERSION, _to_micros(timezone.now()),
+                         len(hall_records), len(row_records), len(strings), data_version)
+
+    # Write next to the target and rename over it so readers never see a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(hall_records.tobytes())
+        f.write(row_records.tobytes())
+        f.write(strings)
+        f.flush()
+        os.fsync(f.fileno())
+    with file_lock(path):
+        published = published_version(path)
+        if published is not None and published > data_version:
+            # A concurrent rebuild that saw later writes finished first
+            os.unlink(tmp_path)
+            return None
+        os.replace(tmp_path, path)
+    recheck_snapshot()
+    return len(hall_records), len(row_records)
+
+
+# Currently mapped snapshot (cached per process) and whether it was current at the last check
+_snapshot = None
+_snapshot_key = None
+_current = False
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    """
+    Return the latest published ScheduleSnapshot, or None when no snapshot exists or it is
+    behind the database (as of the last check, at most CHECK_INTERVAL seconds ago)
+    """
+    global _snapshot, _snapshot_key, _current, _last_check
+    now = time.monotonic()
+    if now - _last_check < CHECK_INTERVAL:
+        return _snapshot if _current else None
+    from .models import DataVersion
+
+    with _lock:
+        _last_check = now
+        path = getattr(settings, 'SCHEDULE_SNAPSHOT_PATH', None)
+        try:
+            stat = os.stat(path) if path else None
+        except FileNotFoundError:
+            stat = None
+        if stat is None:
+            _snapshot, _snapshot_key, _current = None, None, False
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != _snapshot_key:
+            try:
+                _snapshot = ScheduleSnapshot(path)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not load schedule snapshot %s: %s", path, e)
+                _snapshot = None
+            _snapshot_key = key
+        # One small query per interval; a snapshot that missed a write is not served
+        _current = _snapshot is not None and _snapshot.data_version >= DataVersion.current()
+        return _snapshot if _current else None
+
+
+def recheck_snapshot():
+    """Make this process re-stat the snapshot on its next lookup instead of after CHECK_INTERVAL"""
+    global _last_check
+    with _lock:
+        _last_check = 0.0
+
+
+def refresh_snapshot():
+    """
+    Republish the snapshot after a Hall/Schedule change. A no-op when none is published or the
+    published one already covers the current DataVersion (e.g. rebuilt by an earlier write of
+    the same transaction); returns whether a snapshot was rebuilt.
+    """
+    from .models import DataVersion
+
+    path = getattr(settings, 'SCHEDULE_SNAPSHOT_PATH', None)
+    if not path or not os.path.exists(path):
+        return False
+    published = published_version(path)
+    if published is not None and published >= DataVersion.current():
+        recheck_snapshot()
+        return False
+    return build_snapshot(path) is not None
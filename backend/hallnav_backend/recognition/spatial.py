@@ -0,0 +1,149 @@
+"""
+In-memory spatial index over Hall.latitude/longitude for "nearest hall" lookups.
+
+Halls are projected onto a local plane (equirectangular around their mean
+position, metres) and bucketed into a uniform grid whose cell size adapts to
+the spread of the halls, so a k-nearest or radius query only looks at a few
+cells. The index is built from one query on first use and dropped whenever a
+Hall is saved or deleted in this process (see signals.py). Writes made by other
+processes are picked up through DataVersion, re-checked at most every
+CHECK_INTERVAL seconds; the next lookup after either rebuilds it.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import DataVersion, Hall
+
+EARTH_RADIUS_M = 6371000.0
+MIN_CELL_M = 25.0  # Grid cells are never smaller than this
+
+# Seconds between DataVersion checks for Hall writes made by other processes
+CHECK_INTERVAL = getattr(settings, 'HALL_INDEX_CHECK_INTERVAL', 1.0)
+
+_index = None
+_index_version = None  # DataVersion the index was built at
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+class HallIndex:
+    def __init__(self, halls):
+        """halls: iterable of (name, latitude, longitude, floor[, graph node])"""
+        halls = list(halls)
+        self.names = [h[0] for h in halls]
+        self.graph_nodes = {}
+        for h in halls:
+            if len(h) > 4 and h[4]:
+                self.graph_nodes.setdefault(h[0], h[4])
+        self.lat = np.array([h[1] for h in halls], dtype=np.float64)
+        self.lon = np.array([h[2] for h in halls], dtype=np.float64)
+        self.floors = [h[3] for h in halls]
+        self.lat0 = float(self.lat.mean()) if halls else 0.0
+        self.lon0 = float(self.lon.mean()) if halls else 0.0
+        self.x, self.y = self._project(self.lat, self.lon)
+
+        extent = max(np.ptp(self.x), np.ptp(self.y)) if halls else 0.0
+        # About one hall per cell on average
+        self.cell = max(MIN_CELL_M, extent / max(1.0, math.sqrt(len(halls))))
+        self.cells = {}
+        for i, key in enumerate(zip(np.floor(self.x / self.cell).astype(int).tolist(),
+                                    np.floor(self.y / self.cell).astype(int).tolist())):
+            self.cells.setdefault(key, []).append(i)
+        self.cells = {key: np.array(ids) for key, ids in self.cells.items()}
+        keys = np.array(list(self.cells)) if self.cells else np.zeros((0, 2), dtype=int)
+        self.bounds = (tuple(keys.min(axis=0).tolist()), tuple(keys.max(axis=0).tolist())) if len(keys) else None
+
+    def __len__(self):
+        return len(self.names)
+
+    def graph_node(self, name):
+        """Campus graph node of hall `name`, or None when the hall is not mapped to one"""
+        return self.graph_nodes.get(name)
+
+    def _project(self, lat, lon):
+        scale = math.radians(1.0) * EARTH_RADIUS_M
+        x = (np.asarray(lon, dtype=np.float64) - self.lon0) * scale * math.cos(math.radians(self.lat0))
+        y = (np.asarray(lat, dtype=np.float64) - self.lat0) * scale
+        return x, y
+
+    def _cell_of(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def _gather(self, cx0, cx1, cy0, cy1):
+        """Hall ids in the cell rectangle, clipped to the occupied part of the grid"""
+        (bx0, by0), (bx1, by1) = self.bounds
+        cx0, cx1, cy0, cy1 = max(cx0, bx0), min(cx1, bx1), max(cy0, by0), min(cy1, by1)
+        ids = [self.cells[(cx, cy)] for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+               if (cx, cy) in self.cells]
+        return np.concatenate(ids) if ids else np.zeros(0, dtype=int)
+
+    def _results(self, ids, x, y):
+        dist = np.hypot(self.x[ids] - x, self.y[ids] - y)
+        order = np.argsort(dist, kind='stable')
+        return [(self.names[i], float(d)) for i, d in zip(ids[order].tolist(), dist[order].tolist())]
+
+    def within(self, latitude, longitude, radius_m):
+        """[(hall name, distance in metres), ...] within radius_m, nearest first"""
+        if not self.cells:
+            return []
+        x, y = (float(v) for v in self._project(latitude, longitude))
+        cx0, cy0 = self._cell_of(x - radius_m, y - radius_m)
+        cx1, cy1 = self._cell_of(x + radius_m, y + radius_m)
+        ids = self._gather(cx0, cx1, cy0, cy1)
+        return [hit for hit in self._results(ids, x, y) if hit[1] <= radius_m]
+
+    def nearest(self, latitude, longitude, k=1):
+        """The k nearest halls as [(hall name, distance in metres), ...], nearest first"""
+        if not self.cells or k <= 0:
+            return []
+        x, y = (float(v) for v in self._project(latitude, longitude))
+        cx, cy = self._cell_of(x, y)
+        (bx0, by0), (bx1, by1) = self.bounds
+        # Rings of cells around the query cell; those before `ring` cannot touch the grid
+        ring = max(0, bx0 - cx, cx - bx1, by0 - cy, cy - by1)
+        max_ring = max(cx - bx0, bx1 - cx, cy - by0, by1 - cy)
+        found = []
+        while ring <= max_ring:
+            x0, x1, y0, y1 = cx - ring, cx + ring, cy - ring, cy + ring
+            if ring == 0:
+                found.append(self._gather(x0, x1, y0, y1))
+            else:
+                found.append(self._gather(x0, x1, y0, y0))
+                found.append(self._gather(x0, x1, y1, y1))
+                found.append(self._gather(x0, x0, y0 + 1, y1 - 1))
+                found.append(self._gather(x1, x1, y0 + 1, y1 - 1))
+            ids = np.concatenate(found)
+            if len(ids) >= k:
+                hits = self._results(ids, x, y)
+                # Halls outside the searched square are at least `ring` cells away
+                if hits[k - 1][1] <= ring * self.cell:
+                    return hits[:k]
+            ring += 1
+        return self._results(np.concatenate(found), x, y)[:k]
+
+def get_hall_index():
+    """The shared HallIndex, built from the database on first use and rebuilt once DataVersion moves"""
+    global _index, _index_version, _last_check
+    now = time.monotonic()
+    index = _index
+    if index is not None and now - _last_check < CHECK_INTERVAL:
+        return index
+    with _lock:
+        if _index is None or now - _last_check >= CHECK_INTERVAL:
+            # Read the version first: a write committed meanwhile only triggers one more rebuild
+            version = DataVersion.current()
+            if _index is None or version != _index_version:
+                _index = HallIndex(Hall.objects.order_by('id').values_list(
+                    'name', 'latitude', 'longitude', 'floor', 'graph_node'))
+                _index_version = version
+            _last_check = now
+        return _index
+
+
+def invalidate_hall_index():
+    global _index
+    _index = None
@@ -0,0 +1,278 @@
+"""
+Live camera recognition over WebSocket (ws://<host>/ws/recognize/?lat=&lon=).
+
+The client sends frames as binary messages (JPEG/PNG bytes). Each connection
+keeps only the newest unprocessed frame: frames arriving while the previous
+one is being decoded or scored replace it and are counted as dropped, so a
+slow server never builds a backlog. Once the window holds STREAM_MIN_FRAMES
+scored frames, a frame whose 16x16 grayscale thumbnail is nearly identical to
+the last scored one is not run through the model; it is counted as skipped
+and leaves the window unchanged, so every window entry is a real inference.
+Probabilities are averaged over a sliding window and a hall is reported only
+once the window agrees on it. Location candidates only limit which hall may
+be reported; its confidence is its share of the full class distribution.
+
+Frames from all connections are scored together: a single process-wide batcher
+collects whatever frames are waiting (up to STREAM_MAX_BATCH, for at most
+STREAM_BATCH_WAIT_MS) and runs one forward pass on one inference thread, so
+many concurrent streams share a CPU worker without oversubscribing it.
+
+Server messages are JSON text: {"status": "success", "hall_id", "confidence",
+"schedule_url", "frames"} when a hall becomes stable, {"status": "searching",
+"frames"} when it stops being stable, and {"error", "status"} for bad frames.
+Requires an ASGI server (see hallnav_backend/asgi.py).
+"""
+import asyncio
+import io
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import QueryDict
+from django.urls import reverse
+from PIL import Image
+
+from . import inference
+
+THUMBNAIL_SIZE = 16
+
+
+class StreamStats:
+    """Process-wide counters of streaming recognition"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.open_streams = 0
+        self.counts = {"received": 0, "dropped": 0, "skipped": 0, "scored": 0}
+        self.batches = 0
+
+    def opened(self, delta):
+        with self._lock:
+            self.streams += max(delta, 0)
+            self.open_streams += delta
+
+    def add(self, key, count=1):
+        with self._lock:
+            self.counts[key] += count
+
+    def batch(self):
+        with self._lock:
+            self.batches += 1
+
+    def snapshot(self):
+        with self._lock:
+            scored, batches = self.counts["scored"], self.batches
+            return {
+                "streams": self.streams,
+                "open_streams": self.open_streams,
+                **self.counts,
+                "batches": batches,
+                "mean_batch_size": round(scored / batches, 2) if batches else 0.0,
+            }
+
+
+stats = StreamStats()
+
+
+def decode_frame(data, size):
+    """(RGB image reduced for a `size` px model input, uint8 thumbnail) from encoded frame bytes"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', (size * 2, size * 2))  # JPEG: decode at a reduced scale
+        image = image.convert('RGB')
+    except Exception as e:
+        raise ValueError(f"Invalid frame: {str(e)}")
+    inference.validate_image_content(image)
+    thumbnail = np.asarray(image.convert('L').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BILINEAR))
+    return image, thumbnail
+
+
+class MicroBatcher:
+    """Scores frames from all streams in shared batches on a single inference thread"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream-inference')
+        self._loop = None
+        self._queue = None
+
+    def _infer(self, images):
+        model = inference.get_model()
+        return inference.class_probabilities(images, model, settings.STREAM_RESOLUTION)
+
+    async def classify(self, image):
+        """Class probabilities (over all classes) for one frame"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._queue = loop, asyncio.Queue()
+            loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((image, future))
+        return await future
+
+    async def _run(self):
+        loop, queue = self._loop, self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + settings.STREAM_BATCH_WAIT_MS / 1000
+            while len(batch) < settings.STREAM_MAX_BATCH:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+            try:
+                probs = await loop.run_in_executor(self._executor, self._infer, [item[0] for item in batch])
+            except Exception as e:
+                for _image, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            stats.batch()
+            for (_image, future), p in zip(batch, probs.numpy()):
+                if not future.done():
+                    future.set_result(p)
+
+
+batcher = MicroBatcher()
+
+
+class StreamSession:
+    """Latest-frame slot, repeat detection and sliding-window smoothing for one connection"""
+
+    def __init__(self, send, candidates=None):
+        self.send = send
+        self.candidates = candidates
+        self.frame = None
+        self.ready = asyncio.Event()
+        self.window = deque(maxlen=settings.STREAM_WINDOW)
+        self.last_thumbnail = None
+        self.stable_hall = None
+        self.counts = {"received": 0, "dropped": 0, "skipped": 0, "scored": 0}
+
+    def _count(self, key):
+        self.counts[key] += 1
+        stats.add(key)
+
+    def offer(self, data):
+        """Keep only the newest frame; an unprocessed older one is dropped"""
+        self._count("received")
+        if self.frame is not None:
+            self._count("dropped")
+        self.frame = data
+        self.ready.set()
+
+    async def send_json(self, payload):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    def _stable(self):
+        """(class index, confidence) when the window agrees on one hall, else None"""
+        if len(self.window) < settings.STREAM_MIN_FRAMES:
+            return None
+        frames = np.stack(self.window)
+        if self.candidates is not None:
+            # Pick among the candidates, but keep each class's probability over all classes
+            allowed = np.full(frames.shape[1], -np.inf)
+            allowed[self.candidates] = 0
+            frames_top = (frames + allowed).argmax(axis=1)
+        else:
+            allowed, frames_top = 0, frames.argmax(axis=1)
+        mean = frames.mean(axis=0)
+        best = int((mean + allowed).argmax())
+        agreement = float((frames_top == best).mean())
+        if agreement < settings.STREAM_AGREEMENT or mean[best] < inference.MIN_CONFIDENCE_THRESHOLD:
+            return None
+        return best, float(mean[best])
+
+    async def process(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            data, self.frame = self.frame, None
+            await self.handle(data)
+
+    async def handle(self, data):
+        """Score one frame (unless it repeats the last one) and report a change of stable hall"""
+        try:
+            image, thumbnail = await asyncio.to_thread(decode_frame, data, settings.STREAM_RESOLUTION)
+        except ValueError as e:
+            await self.send_json({"error": str(e), "status": "validation_error"})
+            return
+        repeat = (self.last_thumbnail is not None and len(self.window) >= settings.STREAM_MIN_FRAMES and
+                  np.abs(thumbnail.astype(np.int16) - self.last_thumbnail).mean() < settings.STREAM_SKIP_DIFF)
+        if repeat:
+            self._count("skipped")
+            return
+        try:
+            probs = await batcher.classify(image)
+        except Exception as e:
+            await self.send_json({"error": f"Recognition processing failed: {str(e)}", "status": "system_error"})
+            return
+        self._count("scored")
+        self.last_thumbnail = thumbnail.astype(np.int16)
+        self.window.append(probs)
+
+        result = self._stable()
+        hall = None if result is None else inference.CLASS_NAMES[result[0]]
+        if hall == self.stable_hall:
+            return
+        self.stable_hall = hall
+        if hall is None:
+            await self.send_json({"status": "searching", "frames": dict(self.counts)})
+        else:
+            await self.send_json({
+                "hall_id": hall,
+                "confidence": round(result[1], 4),
+                "schedule_url": reverse('hall_schedule', args=[hall]),
+                "frames": dict(self.counts),
+                "status": "success"
+            })
+
+
+async def recognition_socket(scope, receive, send):
+    """ASGI WebSocket handler for /ws/recognize/"""
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+    if settings.RECOGNITION_MODE != 'classifier':
+        await send({'type': 'websocket.send', 'text': json.dumps(
+            {"error": "Streaming recognition needs the classifier recognition mode", "status": "invalid_request"})})
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    try:
+        params = QueryDict(scope.get('query_string', b'').decode('latin-1'))
+        names = await sync_to_async(inference.location_candidates)(params, inference.CLASS_NAMES)
+    except ValueError as e:
+        await send({'type': 'websocket.send', 'text': json.dumps({"error": str(e), "status": "validation_error"})})
+        await send({'type': 'websocket.close', 'code': 1008})
+        return
+    candidates = None if names is None else [inference.CLASS_NAMES.index(name) for name in names]
+
+    session = StreamSession(send, candidates)
+    worker = asyncio.create_task(session.process())
+    stats.opened(1)
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            data = message.get('bytes')
+            if data is None:
+                await session.send_json({"error": "Send frames as binary messages", "status": "invalid_request"})
+            elif len(data) > inference.MAX_FILE_SIZE:
+                await session.send_json({"error": "Frame too large", "status": "validation_error"})
+            else:
+                session.offer(data)
+    finally:
+        stats.opened(-1)
+        worker.cancel()
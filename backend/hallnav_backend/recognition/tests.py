@@ -1,3 +1,653 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import torch
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import cascade, gallery, inference, snapshot, spatial, streaming, views
+from .events import ScheduleEventBroker, ScheduleWatcher, broker
+from .models import DataVersion, Hall, Schedule
+from . import navigation
+from .schedules import get_hall_schedule, schedule_etag
+from .spatial import EARTH_RADIUS_M, HallIndex, get_hall_index, invalidate_hall_index
+
+
+class SnapshotTestCase(TestCase):
+    """Runs each test against its own snapshot path"""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(SCHEDULE_SNAPSHOT_PATH=self.tmp / 'schedule_snapshot.bin')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        snapshot._last_check = 0.0
+        self.addCleanup(setattr, snapshot, '_last_check', 0.0)
+
+        self.start = timezone.now().replace(microsecond=0) + timedelta(hours=1)
+        self.hall = Hall.objects.create(name='LT1', capacity=100, latitude=6.0, longitude=-0.2, floor=0)
+        self.lecture = Schedule.objects.create(hall=self.hall, start_time=self.start,
+                                               end_time=self.start + timedelta(hours=2), course_name='CS101')
+
+    def course_names(self, hall_name='LT1'):
+        return [name for _start, _end, name in get_hall_schedule(hall_name)]
+
+
+class ScheduleSnapshotTests(SnapshotTestCase):
+    def test_snapshot_round_trip(self):
+        self.assertEqual(snapshot.build_snapshot(), (1, 1))
+        published = snapshot.get_snapshot()
+        self.assertIn('LT1', published)
+        self.assertEqual(published.schedule('LT1'), [(self.start, self.start + timedelta(hours=2), 'CS101')])
+        self.assertEqual(published.hall('LT1')['capacity'], 100)
+        self.assertIsNone(published.schedule('LT9'))
+
+    def test_unknown_hall_falls_back_to_database(self):
+        snapshot.build_snapshot()
+        self.assertIsNone(get_hall_schedule('LT9'))
+        Hall.objects.create(name='LT2', capacity=50, latitude=6.0, longitude=-0.2, floor=1)
+        self.assertEqual(get_hall_schedule('LT2'), [])
+
+    def test_schedule_save_republishes_snapshot(self):
+        snapshot.build_snapshot()
+        self.assertEqual(self.course_names(), ['CS101'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lecture.course_name = 'CS102'
+            self.lecture.save()
+        self.assertEqual(self.course_names(), ['CS102'])
+
+    def test_schedule_delete_republishes_snapshot(self):
+        snapshot.build_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lecture.delete()
+        self.assertEqual(self.course_names(), [])
+
+    def test_snapshot_behind_database_is_not_served(self):
+        snapshot.build_snapshot()
+        self.assertIsNotNone(snapshot.get_snapshot())
+        DataVersion.bump()  # A write made by another process
+        snapshot._last_check = 0.0
+        self.assertIsNone(snapshot.get_snapshot())
+        self.assertEqual(self.course_names(), ['CS101'])
+
+    def test_transaction_rebuilds_snapshot_once(self):
+        snapshot.build_snapshot()
+        with mock.patch.object(snapshot, 'build_snapshot', wraps=snapshot.build_snapshot) as build:
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                for i in range(5):
+                    Schedule.objects.create(hall=self.hall, start_time=self.start + timedelta(days=i + 1),
+                                            end_time=self.start + timedelta(days=i + 1, hours=1),
+                                            course_name=f'CS2{i}')
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(len(self.course_names()), 6)
+
+    def test_older_build_does_not_replace_newer_snapshot(self):
+        snapshot.build_snapshot()
+        published = snapshot.published_version()
+        with mock.patch.object(DataVersion, 'current', return_value=published - 1):
+            self.assertIsNone(snapshot.build_snapshot())
+        self.assertEqual(snapshot.published_version(), published)
+        self.assertEqual([p.name for p in self.tmp.iterdir() if p.suffix == '.tmp'], [])
+
+    def test_refresh_without_published_snapshot_is_a_no_op(self):
+        self.assertFalse(snapshot.refresh_snapshot())
+        self.assertFalse((self.tmp / 'schedule_snapshot.bin').exists())
+
+
+class ScheduleETagTests(SnapshotTestCase):
+    def fetch(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/halls/LT1/schedule/', **headers)
+
+    def test_unchanged_schedule_revalidates_with_304(self):
+        snapshot.build_snapshot()
+        etag = self.fetch()['ETag']
+        self.assertEqual(self.fetch(etag).status_code, 304)
+
+    def test_write_changes_etag_even_before_snapshot_is_rebuilt(self):
+        snapshot.build_snapshot()
+        etag = self.fetch()['ETag']
+        self.lecture.course_name = 'CS102'
+        self.lecture.save()  # on_commit callbacks do not run here: the snapshot is still the old one
+        self.assertNotEqual(schedule_etag('LT1'), etag.strip('"'))
+        self.assertEqual(self.fetch(etag).status_code, 200)
+
+    def test_snapshot_and_database_return_the_same_rows(self):
+        past = self.start - timedelta(days=30)
+        Schedule.objects.create(hall=self.hall, start_time=past, end_time=past + timedelta(hours=1),
+                                course_name='Old lecture')
+        from_database = self.fetch().json()['schedule']
+        snapshot.build_snapshot()
+        self.assertIsNotNone(snapshot.get_snapshot())
+        self.assertEqual(self.fetch().json()['schedule'], from_database)
+        self.assertEqual(len(from_database), 2)
+
+    def test_etag_and_body_come_from_one_lookup(self):
+        snapshot.build_snapshot()
+        cached = self.fetch()
+        self.lecture.course_name = 'CS102'
+        self.lecture.save()  # Snapshot not republished yet: it is behind the database now
+        with mock.patch.object(views, 'lookup_hall_schedule', wraps=views.lookup_hall_schedule) as lookup:
+            response = self.fetch(cached['ETag'])
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['course_name'] for e in response.json()['schedule']], ['CS102'])
+        self.assertEqual(response['ETag'].strip('"'), schedule_etag('LT1'))
+
+    def test_revalidation_is_answered_from_the_snapshot(self):
+        snapshot.build_snapshot()
+        etag = self.fetch()['ETag']
+        with mock.patch.object(snapshot, 'CHECK_INTERVAL', 60), self.assertNumQueries(0):
+            self.assertEqual(self.fetch(etag).status_code, 304)
+
+    def test_snapshot_and_database_compute_the_same_etag(self):
+        from_database = schedule_etag('LT1')
+        snapshot.build_snapshot()
+        self.assertIsNotNone(snapshot.get_snapshot())
+        self.assertEqual(schedule_etag('LT1'), from_database)
+
+    def test_unknown_hall(self):
+        self.assertIsNone(schedule_etag('LT9'))
+        self.assertEqual(self.client.get('/api/halls/LT9/schedule/').status_code, 404)
+
+
+class ScheduleEventTests(SnapshotTestCase):
+    def capture_events(self, change):
+        """Events published by `change`, each with the schedule served at publish time"""
+        events = []
+
+        def publish(event):
+            events.append((event, self.course_names(event['hall_id'])))
+
+        with mock.patch.object(broker, 'has_subscribers', return_value=True), \
+                mock.patch.object(broker, 'publish', side_effect=publish):
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+        return events
+
+    def test_subscribers_refetch_the_new_schedule(self):
+        snapshot.build_snapshot()
+
+        def rename():
+            self.lecture.course_name = 'CS102'
+            self.lecture.save()
+
+        [(event, served)] = self.capture_events(rename)
+        self.assertEqual(event['action'], 'updated')
+        self.assertEqual(event['etag'], schedule_etag('LT1'))
+        self.assertEqual(served, ['CS102'])
+
+    def test_moved_schedule_notifies_both_halls(self):
+        snapshot.build_snapshot()
+        other = Hall.objects.create(name='LT2', capacity=50, latitude=6.0, longitude=-0.2, floor=1)
+
+        def move():
+            self.lecture.hall = other
+            self.lecture.save()
+
+        events = self.capture_events(move)
+        self.assertEqual([(e['hall_id'], e['action'], served) for e, served in events],
+                         [('LT1', 'deleted', []), ('LT2', 'updated', ['CS101'])])
+
+    def test_broker_coalesces_pending_events_per_hall(self):
+        async def receive():
+            subscription = broker.subscribe(['LT1'])
+            try:
+                for event in ({'hall_id': 'LT1', 'etag': 'a'}, {'hall_id': 'LT2', 'etag': 'x'},
+                              {'hall_id': 'LT1', 'etag': 'b'}):
+                    broker.publish(event)
+                await asyncio.sleep(0)
+                return await subscription.wait(1)
+            finally:
+                broker.unsubscribe(subscription)
+
+        self.assertEqual(asyncio.run(receive()), [{'hall_id': 'LT1', 'etag': 'b'}])
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    def test_broker_drops_an_already_published_etag(self):
+        local = ScheduleEventBroker()
+
+        async def receive():
+            subscription = local.subscribe(['LT1'])
+            local.publish({'hall_id': 'LT1', 'etag': 'a'})
+            await asyncio.sleep(0)
+            first = await subscription.wait(1)
+            local.publish({'hall_id': 'LT1', 'etag': 'a', 'action': 'updated'})
+            await asyncio.sleep(0)
+            return first, await subscription.wait(0.01)
+
+        self.assertEqual(asyncio.run(receive()), ([{'hall_id': 'LT1', 'etag': 'a'}], []))
+
+    def test_watcher_publishes_changes_from_other_processes(self):
+        local = ScheduleEventBroker()
+        watcher = ScheduleWatcher(local)
+        with mock.patch.object(local, 'has_subscribers', return_value=True), \
+                mock.patch.object(local, 'publish') as publish:
+            self.assertEqual(watcher.check(), [])  # First check only records the current ETags
+            with self.assertNumQueries(1):
+                self.assertEqual(watcher.check(), [])  # Version unchanged: nothing else is read
+            # Written "elsewhere": queryset updates send no signals, the other process bumps the version
+            Schedule.objects.filter(pk=self.lecture.pk).update(course_name='CS102', updated_at=timezone.now())
+            DataVersion.bump()
+            [event] = watcher.check()
+        publish.assert_called_once_with(event)
+        self.assertEqual((event['hall_id'], event['action'], event['etag']), ('LT1', 'updated', schedule_etag('LT1')))
+
+    def test_events_are_refused_under_wsgi(self):
+        response = self.client.get('/api/halls/events/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['status'], 'system_error')
+
+
+class HallIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # 200 halls scattered over roughly 2 km around (6.67, -1.57)
+        self.halls = [(f'H{i}', 6.67 + lat, -1.57 + lon, i % 3)
+                      for i, (lat, lon) in enumerate(rng.uniform(-0.01, 0.01, (200, 2)).tolist())]
+        self.index = HallIndex(self.halls)
+        self.queries = rng.uniform(-0.015, 0.015, (25, 2)) + (6.67, -1.57)
+
+    def brute_force(self, lat, lon):
+        """Every hall with its equirectangular distance, as the index measures it"""
+        scale = math.radians(1.0) * EARTH_RADIUS_M
+        distances = [(name, math.hypot((h_lon - lon) * scale * math.cos(math.radians(self.index.lat0)),
+                                       (h_lat - lat) * scale))
+                     for name, h_lat, h_lon, _floor in self.halls]
+        return sorted(distances, key=lambda hit: hit[1])
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in self.queries.tolist():
+            expected = self.brute_force(lat, lon)
+            for k in (1, 5, 200, 250):
+                hits = self.index.nearest(lat, lon, k)
+                self.assertEqual(len(hits), min(k, 200))
+                for (_name, distance), (_expected_name, expected_distance) in zip(hits, expected):
+                    self.assertAlmostEqual(distance, expected_distance, places=6)
+
+    def test_within_matches_brute_force(self):
+        for lat, lon in self.queries.tolist():
+            for radius in (0, 150, 800):
+                expected = [name for name, distance in self.brute_force(lat, lon) if distance <= radius]
+                self.assertEqual(sorted(name for name, _d in self.index.within(lat, lon, radius)), sorted(expected))
+
+    def test_empty_index(self):
+        index = HallIndex([])
+        self.assertEqual(index.nearest(6.67, -1.57, 3), [])
+        self.assertEqual(index.within(6.67, -1.57, 100), [])
+
+
+class NearestHallsTests(TestCase):
+    def setUp(self):
+        invalidate_hall_index()
+        self.addCleanup(invalidate_hall_index)
+        Hall.objects.create(name='LT1', capacity=100, latitude=6.6700, longitude=-1.5700, floor=0,
+                            graph_node='Hall_A101')
+        Hall.objects.create(name='LT2', capacity=80, latitude=6.6710, longitude=-1.5700, floor=0)
+
+    def fetch(self, **params):
+        return self.client.get('/api/halls/nearest/', params)
+
+    def test_hits_carry_graph_node(self):
+        halls = self.fetch(lat=6.6701, lon=-1.57, k=2).json()['halls']
+        self.assertEqual([(h['hall_id'], h['node']) for h in halls], [('LT1', 'Hall_A101'), ('LT2', None)])
+
+    def test_hall_save_rebuilds_index(self):
+        self.assertEqual(len(get_hall_index()), 2)
+        Hall.objects.create(name='LT3', capacity=60, latitude=6.6702, longitude=-1.5700, floor=1,
+                            graph_node='Library')
+        self.assertEqual(self.fetch(lat=6.6702, lon=-1.57).json()['halls'][0]['node'], 'Library')
+
+    def test_write_from_another_process_rebuilds_index_after_check_interval(self):
+        self.assertEqual(len(get_hall_index()), 2)
+        # bulk_create sends no signals here; the writing process bumps the version
+        Hall.objects.bulk_create([Hall(name='LT3', capacity=60, latitude=6.6702, longitude=-1.5700, floor=1)])
+        DataVersion.bump()
+        with mock.patch.object(spatial, 'CHECK_INTERVAL', 60):
+            self.assertEqual(len(get_hall_index()), 2)
+        with mock.patch.object(spatial, 'CHECK_INTERVAL', 0):
+            self.assertEqual(len(get_hall_index()), 3)
+
+    def test_invalid_coordinates(self):
+        response = self.fetch(lat=95, lon=0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'validation_error')
+
+
+class FixedLogits(torch.nn.Module):
+    """Scores every image with the same logits"""
+
+    def __init__(self, logits):
+        super().__init__()
+        self.register_buffer('logits', torch.tensor(logits))
+
+    def forward(self, batch):
+        return self.logits.expand(len(batch), -1)
+
+
+def noise_image(width=320, height=240, seed=0):
+    pixels = np.random.default_rng(seed).integers(40, 216, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+class CandidateConfidenceTests(SimpleTestCase):
+    """Location candidates choose the class; the confidence still comes from every class"""
+
+    def setUp(self):
+        # Class 1 dominates: p = [0.047, 0.953]
+        self.model = FixedLogits([0.0, 3.0])
+        self.expected = float(torch.softmax(torch.tensor([0.0, 3.0]), 0)[0])
+
+    def test_single_candidate_keeps_its_full_distribution_probability(self):
+        image = noise_image()
+        self.assertEqual(views.predict_image(image, self.model)[0], 1)
+        predicted, confidence = views.predict_image(image, self.model, [0])
+        self.assertEqual(predicted, 0)
+        self.assertAlmostEqual(confidence, self.expected, places=5)
+
+    def test_cascade_and_multicrop_do_not_inflate_confidence(self):
+        predicted, confidence, _resolution = views.predict_cascade(noise_image(), self.model, [0])
+        self.assertEqual(predicted, 0)
+        self.assertAlmostEqual(confidence, self.expected, places=5)
+        predicted, confidence, crops = views.predict_multicrop(noise_image(800, 240), self.model, [0])
+        self.assertEqual(predicted, 0)
+        self.assertGreater(crops, 1)
+        self.assertAlmostEqual(confidence, self.expected, places=5)
+
+
+class CascadeCalibrationTests(SimpleTestCase):
+    def setUp(self):
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.path = tmp / 'models' / 'cascade_calibration.json'
+        settings_override = override_settings(CASCADE_CALIBRATION_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cascade._calibration = None
+        self.addCleanup(setattr, cascade, '_calibration', None)
+
+    def test_margin_covers_every_disagreement(self):
+        low = [(0, 0.95), (1, 0.80), (0, 0.72), (1, 0.60)]
+        full = [(0, 0.97), (0, 0.90), (0, 0.65), (1, 0.90)]
+        margin = cascade.calibrate_margin(low, full, 0.7)
+        self.assertAlmostEqual(margin, 0.1, places=4)
+        # Only the first (agreeing) cheap answer is trusted at this margin
+        self.assertEqual([conf >= 0.7 + margin for _cls, conf in low], [True, False, False, False])
+
+    def test_uncalibrated_and_mismatched_resolution_have_no_margin(self):
+        with self.assertLogs('recognition.cascade', 'WARNING'):
+            self.assertIsNone(cascade.get_margin())
+        cascade.save_calibration({'margin': 0.05, 'low_resolution': settings.CASCADE_LOW_RES + 32})
+        self.assertIsNone(cascade.get_margin())
+
+    def test_uncalibrated_cascade_escalates_every_scan(self):
+        model = FixedLogits([0.0, 6.0])
+        with self.assertLogs('recognition.cascade', 'WARNING'):
+            predicted, confidence, resolution = views.predict_cascade(noise_image(), model)
+        self.assertEqual((predicted, resolution), (1, cascade.FULL_RES))
+        cascade.save_calibration({'margin': 0.05, 'low_resolution': settings.CASCADE_LOW_RES})
+        self.assertEqual(views.predict_cascade(noise_image(), model)[2], settings.CASCADE_LOW_RES)
+
+    def test_saved_calibration_is_read_back(self):
+        cascade.save_calibration({'margin': 0.05, 'low_resolution': settings.CASCADE_LOW_RES})
+        cascade._calibration = None
+        self.assertEqual(cascade.get_margin(), 0.05)
+        self.assertTrue(self.path.exists())
+
+    def test_stats_report_compute_saved(self):
+        stats = cascade.CascadeStats()
+        for escalated in (False, False, True, False):
+            stats.record(escalated)
+        report = stats.snapshot()
+        low_cost = cascade.relative_cost(settings.CASCADE_LOW_RES)
+        self.assertEqual((report['scans'], report['escalations']), (4, 1))
+        self.assertAlmostEqual(report['relative_compute'], round(low_cost + 0.25, 4))
+
+
+class RecognizeNearbyHallTests(TestCase):
+    def setUp(self):
+        invalidate_hall_index()
+        self.addCleanup(invalidate_hall_index)
+        Hall.objects.create(name='LT1 & 2', capacity=150, latitude=6.6700, longitude=-1.5700, floor=1)
+        Hall.objects.create(name='LT3 & 4', capacity=200, latitude=6.6800, longitude=-1.5700, floor=2)
+
+    def recognize(self, logits):
+        upload = io.BytesIO()
+        noise_image().save(upload, format='PNG')
+        with mock.patch.object(views, 'get_model', return_value=FixedLogits(logits)):
+            return self.client.post('/api/recognize_hall/', {
+                'file': SimpleUploadedFile('hall.png', upload.getvalue(), content_type='image/png'),
+                'lat': 6.6701, 'lon': -1.5700,
+            })
+
+    def test_only_nearby_hall_is_still_thresholded(self):
+        response = self.recognize([0.0, 3.0])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'validation_error')
+        self.assertIn('Low confidence', response.json()['error'])
+
+    def test_confident_nearby_hall_is_recognized(self):
+        response = self.recognize([3.0, 0.0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['hall_id'], 'LT1 & 2')
+        self.assertEqual(response.json()['candidates'], 1)
+
+
+class StreamSessionTests(SimpleTestCase):
+    def frame(self):
+        data = io.BytesIO()
+        noise_image().save(data, format='PNG')
+        return data.getvalue()
+
+    def run_frames(self, frames, probs, candidates=None):
+        """Messages sent after handling `frames` in order, with every frame scored as `probs`"""
+        messages = []
+
+        async def send(message):
+            messages.append(json.loads(message['text']))
+
+        session = streaming.StreamSession(send, candidates)
+        with mock.patch.object(streaming.batcher, 'classify',
+                               mock.AsyncMock(return_value=np.array(probs, dtype=np.float32))):
+            async def handle_all():
+                for data in frames:
+                    session.offer(data)
+                    session.frame = None
+                    await session.handle(data)
+            asyncio.run(handle_all())
+        return session, messages
+
+    def test_still_camera_needs_min_frames_of_inference(self):
+        frames = [self.frame()] * (settings.STREAM_MIN_FRAMES + 4)
+        session, messages = self.run_frames(frames, [0.9, 0.1])
+        self.assertEqual(session.counts['scored'], settings.STREAM_MIN_FRAMES)
+        self.assertEqual(session.counts['skipped'], 4)
+        self.assertEqual(len(session.window), settings.STREAM_MIN_FRAMES)
+        self.assertEqual([m['hall_id'] for m in messages], [inference.CLASS_NAMES[0]])
+
+    def test_streaming_imports_without_views(self):
+        # asgi.py imports the WebSocket handler on its own; it must not need (or cycle back into) views
+        code = ("import sys, django; django.setup(); import recognition.streaming; "
+                "sys.exit('recognition.views' in sys.modules)")
+        subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, check=True,
+                       env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'hallnav_backend.settings'})
+
+    def test_single_candidate_is_still_thresholded(self):
+        frames = [self.frame()] * settings.STREAM_MIN_FRAMES
+        session, messages = self.run_frames(frames, [0.2, 0.8], candidates=[0])
+        self.assertEqual(session.counts['scored'], settings.STREAM_MIN_FRAMES)
+        self.assertEqual(messages, [])
+        self.assertIsNone(session._stable())
+
+
+class EmbeddingGalleryTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def brute_force(self, built, queries):
+        similarity = gallery.normalize(queries) @ built.embeddings.T
+        out = np.full((len(queries), len(built.halls)), -np.inf, dtype=np.float32)
+        for label in range(len(built.halls)):
+            rows = built.labels == label
+            if rows.any():
+                out[:, label] = similarity[:, rows].max(axis=1)
+        return out
+
+    def test_scores_match_brute_force(self):
+        built = gallery.EmbeddingGallery(['A', 'B', 'C'], self.rng.normal(size=(30, 8)), [0, 2, 1] * 10)
+        built.add('D', self.rng.normal(size=(4, 8)))
+        queries = self.rng.normal(size=(5, 8))
+        np.testing.assert_allclose(built.scores(queries), self.brute_force(built, queries), rtol=1e-5)
+        self.assertEqual(built.reference_counts(), {'A': 10, 'B': 10, 'C': 10, 'D': 4})
+
+    def test_remove_and_restricted_search(self):
+        built = gallery.EmbeddingGallery(['A', 'B'], self.rng.normal(size=(6, 8)), [0, 1] * 3)
+        query = built.embeddings[built.labels == 1][0]
+        self.assertEqual(built.search(query)[0], 'B')
+        self.assertEqual(built.search(query, ['A'])[0], 'A')
+        self.assertEqual(built.remove('B'), 3)
+        self.assertEqual(built.search(query)[0], 'A')
+        self.assertEqual(gallery.EmbeddingGallery().search(query), (None, float('-inf')))
+
+    def test_ivf_finds_reference_rows(self):
+        centres = self.rng.normal(size=(40, 16))
+        labels = np.arange(gallery.IVF_MIN_SIZE) % 40
+        built = gallery.EmbeddingGallery([f'H{i}' for i in range(40)],
+                                         centres[labels] + 0.1 * self.rng.normal(size=(len(labels), 16)), labels)
+        self.assertIsNotNone(built.centroids)
+        for row in self.rng.choice(len(built), 20, replace=False):
+            hall, similarity = built.search(built.embeddings[row])
+            self.assertEqual(hall, built.halls[built.labels[row]])
+            self.assertAlmostEqual(similarity, 1.0, places=5)
+
+    def test_restricted_ivf_search_reaches_halls_outside_the_nearest_partitions(self):
+        centres = gallery.normalize(self.rng.normal(size=(40, 16)))
+        labels = np.arange(gallery.IVF_MIN_SIZE) % 40
+        built = gallery.EmbeddingGallery([f'H{i}' for i in range(40)],
+                                         centres[labels] + 0.05 * self.rng.normal(size=(len(labels), 16)), labels)
+        # The hall least similar to the query, far outside its IVF_PROBES closest partitions
+        query = centres[0]
+        far = int(np.argmin(centres @ query))
+        expected = self.brute_force(built, query[None])[0, far]
+        # Small subset: scored exactly
+        self.assertEqual(built.search(query, [f'H{far}']), (f'H{far}', expected))
+        # Large subset: probes are chosen among the partitions holding allowed halls
+        allowed = [f'H{i}' for i in range(40) if i != 0 and np.dot(centres[i], query) < 0]
+        with mock.patch.object(gallery, 'IVF_MIN_SIZE', 64):
+            hall, similarity = built.search(query, allowed)
+        best = self.brute_force(built, query[None])[0, [built.halls.index(h) for h in allowed]]
+        self.assertIn(hall, allowed)
+        self.assertAlmostEqual(similarity, float(best.max()), places=5)
+
+
+class GalleryPublishTests(SimpleTestCase):
+    def setUp(self):
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.path = tmp / 'gallery.npz'
+        settings_override = override_settings(GALLERY_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for name in ('_gallery', '_gallery_key'):
+            self.addCleanup(setattr, gallery, name, None)
+            setattr(gallery, name, None)
+        self.rng = np.random.default_rng(0)
+
+    def test_reloads_gallery_published_by_another_process(self):
+        gallery.add_references('A', self.rng.normal(size=(2, 8)))
+        published = gallery.EmbeddingGallery(['A', 'B'], self.rng.normal(size=(5, 8)), [0, 1, 1, 1, 1])
+        published.save(self.path)
+        self.assertEqual(gallery.get_gallery().reference_counts(), {'A': 1, 'B': 4})
+        self.assertEqual(gallery.add_references('C', self.rng.normal(size=8)).reference_counts(),
+                         {'A': 1, 'B': 4, 'C': 1})
+        self.assertEqual(gallery.EmbeddingGallery.load(self.path).reference_counts(), {'A': 1, 'B': 4, 'C': 1})
+
+    def test_concurrent_uploads_keep_every_batch(self):
+        batches = [(f'H{i % 3}', self.rng.normal(size=(2, 8))) for i in range(12)]
+        threads = [threading.Thread(target=gallery.add_references, args=batch) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(gallery.get_gallery()), 24)
+        self.assertEqual(len(gallery.EmbeddingGallery.load(self.path)), 24)
+        self.assertEqual(sorted(p.name for p in self.path.parent.iterdir() if p.suffix == '.npz'), ['gallery.npz'])
+
+
+class RoutingSyncTests(SimpleTestCase):
+    """recognition/routing is a vendored copy of the Streamlit routing library"""
+    FRONTEND_LIB = settings.BASE_DIR.parent.parent / 'frontend' / 'streamlit' / 'lib'
+    MODULES = ['campus_graph.py', 'floor_routing.py', 'route_table.py']
+
+    def test_streamlit_glue_is_not_vendored(self):
+        self.assertFalse((Path(navigation.__file__).parent / 'routing' / 'navigation.py').exists())
+
+    def test_vendored_modules_match_frontend(self):
+        if not self.FRONTEND_LIB.is_dir():
+            self.skipTest("frontend tree not deployed alongside the backend")
+        vendored = Path(navigation.__file__).parent / 'routing'
+        for name in self.MODULES:
+            with self.subTest(module=name):
+                self.assertEqual((vendored / name).read_bytes(), (self.FRONTEND_LIB / name).read_bytes(),
+                                 f"copy frontend/streamlit/lib/{name} to recognition/routing/")
+
+
+class NavigationMatrixTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        override = self.settings(ROUTE_CACHE_DIR=Path(tmp))
+        override.enable()
+        self.addCleanup(override.disable)
+        navigation._route_tables.clear()
+        self.addCleanup(navigation._route_tables.clear)
+
+    def post(self, body):
+        return self.client.post('/api/navigation/matrix/', json.dumps(body), content_type='application/json')
+
+    def test_dense_matrix_matches_routes(self):
+        halls = ['Entrance', 'Library', 'Hall_B202']
+        payload = self.post({'origins': halls, 'destinations': halls}).json()
+        self.assertEqual(payload['format'], 'dense')
+        graph = navigation.get_campus_graph()
+        for i, origin in enumerate(halls):
+            self.assertEqual(payload['distances'][i][i], 0)
+            for j, destination in enumerate(halls):
+                _path, distance = graph.shortest_path(origin, destination)
+                self.assertAlmostEqual(payload['distances'][i][j], distance, places=2)
+
+    def test_accessible_routes_avoid_stairs(self):
+        body = {'origins': ['Entrance'], 'destinations': ['Hall_A101']}
+        default = self.post(body).json()['distances'][0][0]
+        accessible = self.post({**body, 'accessible': True}).json()['distances'][0][0]
+        self.assertGreater(accessible, default)
+
+    def test_sparse_matrix_drops_pairs_over_max_seconds(self):
+        halls = ['Entrance', 'Library', 'Hall_B202']
+        dense = self.post({'origins': halls, 'destinations': halls}).json()
+        sparse = self.post({'origins': halls, 'destinations': halls, 'max_seconds': 3}).json()
+        self.assertEqual(sparse['format'], 'coo')
+        expected = [(i, j) for i in range(3) for j in range(3) if dense['durations'][i][j] <= 3]
+        self.assertEqual(list(zip(sparse['rows'], sparse['cols'])), expected)
+
+    def test_unknown_location(self):
+        response = self.post({'origins': ['Nowhere'], 'destinations': ['Library']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Nowhere', response.json()['error'])
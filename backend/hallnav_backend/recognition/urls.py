@@ -1,6 +1,12 @@
 from django.urls import path
-from .views import recognize_hall
+from .views import recognize_hall, hall_schedule, schedule_events, navigation_matrix, nearest_halls, hall_references, recognition_metrics
 
 urlpatterns = [
     path('api/recognize_hall/', recognize_hall, name='recognize_hall'),
+    path('api/recognition/metrics/', recognition_metrics, name='recognition_metrics'),
+    path('api/halls/events/', schedule_events, name='schedule_events'),
+    path('api/halls/nearest/', nearest_halls, name='nearest_halls'),
+    path('api/halls/<str:hall_name>/schedule/', hall_schedule, name='hall_schedule'),
+    path('api/halls/<str:hall_name>/references/', hall_references, name='hall_references'),
+    path('api/navigation/matrix/', navigation_matrix, name='navigation_matrix'),
 ]
\ No newline at end of file
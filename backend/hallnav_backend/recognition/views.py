@@ -1,51 +1,61 @@
-from django.http import JsonResponse
+import json
+import math
+import time
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-import numpy as np
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from PIL import Image
 import torch
 from torchvision import models, transforms
-import torch.nn as nn
 import torch.nn.functional as F
-from pathlib import Path
 from django.shortcuts import render # You may need to add this import
 from django.views.generic import TemplateView
-from .models import Hall, Schedule
-
-# --- PyTorch Model Integration ---
-# Model file colocated in the recognition app directory
-MODEL_PATH = Path(__file__).resolve().parent / 'hall_classifier_raw.pth'
-
-# IMPORTANT: Update CLASS_NAMES with your actual hall names in the order your model expects them
-# Model was trained with 2 classes, so we need exactly 2 class names
-CLASS_NAMES = ['LT1 & 2', 'LT3 & 4']
+from . import cascade
+from .cascade import get_margin, stats as cascade_stats
+from .events import broker, watcher
+from .gallery import add_references, get_gallery
+from .navigation import distance_matrix_payload
+from .models import Hall
+from .spatial import get_hall_index
+from . import streaming
+from .inference import (CLASS_NAMES, MAX_FILE_SIZE, MIN_CONFIDENCE_THRESHOLD, MODEL_PATH, NEAREST_MAX_RADIUS_M,
+                        class_probabilities, float_param, get_model, location_candidates, preprocess,
+                        validate_image_content)
+from .schedules import get_hall_schedule, format_schedule, lookup_hall_schedule, serialize_schedule
 
 # Configuration for edge case handling
-MIN_CONFIDENCE_THRESHOLD = 0.7  # Minimum confidence to accept a prediction
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB max file size
 ALLOWED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'bmp', 'tiff']
-MIN_IMAGE_DIMENSIONS = (50, 50)  # Minimum image size
-MAX_IMAGE_DIMENSIONS = (5000, 5000)  # Maximum image size
-
-# Load model (cached for performance)
-_model = None
-
-def get_model():
-    global _model
-    if _model is None:
-        if not MODEL_PATH.exists():
-            raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-        model = models.mobilenet_v2(pretrained=False)
-        num_classes = len(CLASS_NAMES)
-        model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
-        state = torch.load(str(MODEL_PATH), map_location=torch.device('cpu'))
-        model.load_state_dict(state)
-        # Sanity check: classifier output size must match class names
-        out_features = model.classifier[1].out_features
-        if out_features != num_classes:
-            raise ValueError(f"Model classifier out_features={out_features} does not match len(CLASS_NAMES)={num_classes}")
-        model.eval()
-        _model = model
-    return _model
+
+# Schedule change stream (Server-Sent Events)
+EVENTS_HEARTBEAT_SECONDS = 20  # Comment line sent on idle streams so proxies keep them open
+EVENTS_RETRY_MS = 5000  # Client reconnect delay advertised to EventSource
+
+# Nearest-hall lookups
+NEAREST_DEFAULT_K = 1
+NEAREST_MAX_K = 50
+
+# Embedding-gallery recognition (settings.RECOGNITION_MODE == 'gallery')
+MAX_REFERENCE_FILES = 20  # Reference photos accepted per upload request
+
+# Gallery embedding model (cached for performance)
+_embedding_model = None
+
+def get_embedding_model():
+    """MobileNetV2 whose penultimate features serve as gallery embeddings.
+    Uses the trained hall classifier when present, ImageNet weights otherwise."""
+    global _embedding_model
+    if _embedding_model is None:
+        if MODEL_PATH.exists():
+            _embedding_model = get_model()
+        else:
+            model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.IMAGENET1K_V1)
+            model.eval()
+            _embedding_model = model
+    return _embedding_model
 
 # Validation functions for edge cases
 
@@ -86,26 +96,6 @@ def validate_file_content_type(image_file):
     except Exception as e:
         raise ValueError(f"Invalid image file: {str(e)}")
 
-def validate_image_content(image):
-    """Validate image content and dimensions"""
-    if not image:
-        raise ValueError("Invalid image file")
-    width, height = image.size
-    # Check minimum dimensions
-    if width < MIN_IMAGE_DIMENSIONS[0] or height < MIN_IMAGE_DIMENSIONS[1]:
-        raise ValueError(f"Image too small. Minimum size: {MIN_IMAGE_DIMENSIONS[0]}x{MIN_IMAGE_DIMENSIONS[1]} pixels")
-    # Check maximum dimensions
-    if width > MAX_IMAGE_DIMENSIONS[0] or height > MAX_IMAGE_DIMENSIONS[1]:
-        raise ValueError(f"Image too large. Maximum size: {MAX_IMAGE_DIMENSIONS[0]}x{MAX_IMAGE_DIMENSIONS[1]} pixels")
-    # Check if image is mostly one color (might be corrupted or invalid)
-    image_array = np.array(image)
-    if len(image_array.shape) != 3:
-        raise ValueError("Invalid image format. Expected RGB image.")
-    mean_color = np.mean(image_array)
-    if mean_color < 10 or mean_color > 245:
-        raise ValueError("Image appears to be corrupted or invalid (too dark or too bright)")
-    return True
-
 def validate_confidence(confidence, predicted_class):
     """Validate prediction confidence meets threshold"""
     if confidence < MIN_CONFIDENCE_THRESHOLD:
@@ -114,33 +104,118 @@ def validate_confidence(confidence, predicted_class):
 
 # Preprocess and predict returns (index, confidence)
 
-def predict_image(image, model):
-    transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ])
-    image = transform(image).unsqueeze(0)  # Add batch dimension
+_crop_tensor = transforms.Compose([
+    transforms.ToTensor(),
+    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+])
+
+def best_candidate(probs, candidates=None):
+    """(index, confidence) of the most probable class in a 1-D distribution, among `candidates`
+    (class indices) when given. The confidence is that class's share of the full distribution:
+    ruling classes out never makes the remaining ones more certain."""
+    if candidates is None:
+        conf, predicted = torch.max(probs, 0)
+        return predicted.item(), float(conf.item())
+    candidates = list(candidates)
+    best = candidates[int(torch.argmax(probs[candidates]))]
+    return best, float(probs[best])
+
+def predict_image(image, model, candidates=None, size=224):
+    """Returns (index, confidence); `candidates` (class indices) limits which classes may be predicted"""
+    probs = class_probabilities([image], model, size)
+    return best_candidate(probs[0], candidates)
+
+def predict_cascade(image, model, candidates=None):
+    """Returns (index, confidence, resolution used): a cheap low-resolution pass, escalated to
+    full resolution when its confidence is within the calibrated margin, or always when the
+    cascade is not calibrated (see cascade.py)"""
+    predicted, confidence = predict_image(image, model, candidates, size=settings.CASCADE_LOW_RES)
+    margin = get_margin()
+    escalate = margin is None or confidence < MIN_CONFIDENCE_THRESHOLD + margin
+    cascade_stats.record(escalate)
+    if not escalate:
+        return predicted, confidence, settings.CASCADE_LOW_RES
+    predicted, confidence = predict_image(image, model, candidates)
+    return predicted, confidence, cascade.FULL_RES
+
+def crop_boxes(width, height, size=224, max_crops=6, overlap=0.25):
+    """(left, top, right, bottom) size x size tiles along the long side of a width x height image,
+    inset from every edge like CenterCrop; neighbours share at least `overlap` of a crop and are
+    spread evenly instead when capped at max_crops"""
+    long_side, short_side = max(width, height), min(width, height)
+    across = (short_side - size) // 2
+    span = long_side - 2 * across - size  # The ends lose the same margin as the short side
+    count = 1 if span <= 0 else math.ceil(span / (size * (1 - overlap))) + 1
+    count = max(1, min(count, max_crops))
+    if count == 1:
+        starts = [(long_side - size) // 2]
+    else:
+        starts = [across + round(span * i / (count - 1)) for i in range(count)]
+    if width >= height:
+        return [(start, across, start + size, across + size) for start in starts]
+    return [(across, start, across + size, start + size) for start in starts]
+
+def predict_multicrop(image, model, candidates=None, max_crops=None):
+    """Returns (index, confidence, crops scored): overlapping 224px tiles in one forward pass,
+    combined as the mean of their log-probabilities (renormalised over all classes)"""
+    max_crops = max_crops or settings.MULTICROP_MAX_CROPS
+    scale = 256 / min(image.size)  # Same scale as get_preprocess(224): short side 256
+    resized = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                           Image.Resampling.BILINEAR)
+    boxes = crop_boxes(resized.width, resized.height, 224, max_crops, settings.MULTICROP_OVERLAP)
+    batch = torch.stack([_crop_tensor(resized.crop(box)) for box in boxes])
     device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-    image = image.to(device)
     model = model.to(device)
     with torch.no_grad():
-        outputs = model(image)
-        probs = F.softmax(outputs, dim=1)
-        conf, predicted = torch.max(probs, 1)
-    return predicted.item(), float(conf.item())
+        outputs = model(batch.to(device))
+        log_probs = F.log_softmax(outputs, dim=1).mean(dim=0)
+        probs = F.softmax(log_probs, dim=0).cpu()
+    predicted, confidence = best_candidate(probs, candidates)
+    return predicted, confidence, len(boxes)
+
+def use_multicrop(request, image):
+    """Multi-crop for images far from square, when enabled in settings or requested with multicrop=1"""
+    requested = request.POST.get("multicrop")
+    enabled = settings.MULTICROP_ENABLED if requested is None else requested == "1"
+    return enabled and max(image.size) / min(image.size) >= settings.MULTICROP_MIN_ASPECT
+
+def extract_embeddings(images, model):
+    """(len(images), D) float32 array of pooled penultimate features (D=1280 for MobileNetV2), one forward pass"""
+    device = next(model.parameters()).device  # get_model() may already have moved it to the GPU
+    batch = torch.stack([preprocess(image) for image in images]).to(device)
+    with torch.no_grad():
+        features = F.adaptive_avg_pool2d(model.features(batch), 1).flatten(1)
+    return features.cpu().numpy()
+
+def recognize_with_gallery(image, candidates=None):
+    """Returns (hall name, cosine similarity) of the closest gallery reference"""
+    gallery = get_gallery()
+    if not len(gallery):
+        raise ValueError("No reference photos uploaded yet. Add some via /api/halls/<hall>/references/.")
+    embedding = extract_embeddings([image], get_embedding_model())
+    hall_id, similarity = gallery.search(embedding, candidates)
+    if hall_id is None:
+        raise ValueError("No reference photos for the halls near your location.")
+    return hall_id, similarity
 
 class HomePageView(TemplateView):
     template_name = 'index.html'
 
 
+def with_server_timing(response, timing):
+    """Adds a Server-Timing header (milliseconds per stage) so clients can see where latency goes"""
+    if timing:
+        response['Server-Timing'] = ", ".join(f"{name};dur={ms:.1f}" for name, ms in timing.items())
+    return response
+
+
 @csrf_exempt
 def recognize_hall(request):
     # Require POST with a file
     if request.method != "POST" or not request.FILES.get("file"):
         return JsonResponse({"error": "Invalid request. Please upload an image file.", "status": "invalid_request"}, status=400)
 
+    timing = {}
     try:
         image_file = request.FILES["file"]
         # Edge case validations
@@ -154,39 +229,228 @@ def recognize_hall(request):
             else:
                 raise e
         # Try to open and validate image
+        decode_start = time.perf_counter()
         try:
             pil_image = Image.open(image_file).convert('RGB')
         except Exception as e:
             raise ValueError(f"Invalid image file: {str(e)}")
         validate_image_content(pil_image)
-        # Get model and make prediction
-        model = get_model()
-        predicted_class_idx, confidence = predict_image(pil_image, model)
-        # Validate prediction index
-        if predicted_class_idx < 0 or predicted_class_idx >= len(CLASS_NAMES):
-            raise ValueError(f"Predicted class index {predicted_class_idx} out of range for CLASS_NAMES of length {len(CLASS_NAMES)}")
-        hall_id = CLASS_NAMES[predicted_class_idx]
-        # Validate confidence threshold
-        validate_confidence(confidence, hall_id)
-        # Get schedule data
-        try:
-            hall = Hall.objects.get(name=hall_id)
-            schedules = Schedule.objects.filter(hall=hall).order_by('start_time')
-            schedule_str = "; ".join([
-                f"{s.start_time.strftime('%H:%M')}-{s.end_time.strftime('%H:%M')} {s.course_name}"
-                for s in schedules
-            ]) or "No schedule found"
-        except Hall.DoesNotExist:
-            schedule_str = "No schedule found"
-        return JsonResponse({
+        timing["decode"] = (time.perf_counter() - decode_start) * 1000
+        inference_start = time.perf_counter()
+        resolution = None
+        crops = 1
+        if settings.RECOGNITION_MODE == 'gallery':
+            # Halls far from the reported position are ruled out before the search
+            class_names = get_gallery().halls
+            candidates = location_candidates(request.POST, class_names)
+            hall_id, confidence = recognize_with_gallery(pil_image, candidates)
+            if confidence < settings.GALLERY_MIN_SIMILARITY:
+                raise ValueError(f"No close match ({confidence:.2f} similarity). This doesn't appear to be a known lecture hall. Please upload a clear image of a lecture hall.")
+        else:
+            # Halls far from the reported position are ruled out before scoring
+            class_names = CLASS_NAMES
+            candidates = location_candidates(request.POST, class_names)
+            # Get model and make prediction
+            model = get_model()
+            candidate_idx = None if candidates is None else [CLASS_NAMES.index(name) for name in candidates]
+            if use_multicrop(request, pil_image):
+                predicted_class_idx, confidence, crops = predict_multicrop(pil_image, model, candidate_idx)
+                resolution = cascade.FULL_RES
+            elif settings.CASCADE_ENABLED:
+                predicted_class_idx, confidence, resolution = predict_cascade(pil_image, model, candidate_idx)
+            else:
+                predicted_class_idx, confidence = predict_image(pil_image, model, candidate_idx)
+                resolution = cascade.FULL_RES
+            # Validate prediction index
+            if predicted_class_idx < 0 or predicted_class_idx >= len(CLASS_NAMES):
+                raise ValueError(f"Predicted class index {predicted_class_idx} out of range for CLASS_NAMES of length {len(CLASS_NAMES)}")
+            hall_id = CLASS_NAMES[predicted_class_idx]
+            # Validate confidence threshold
+            validate_confidence(confidence, hall_id)
+        timing["inference"] = (time.perf_counter() - inference_start) * 1000
+        # Get schedule data (snapshot when published, ORM otherwise)
+        schedule_str = format_schedule(get_hall_schedule(hall_id))
+        return with_server_timing(JsonResponse({
             "hall_id": hall_id,
             "confidence": round(confidence, 4),
             "schedule": schedule_str,
+            "schedule_url": request.build_absolute_uri(reverse('hall_schedule', args=[hall_id])),
+            "candidates": len(class_names) if candidates is None else len(candidates),
+            "mode": settings.RECOGNITION_MODE,
+            "resolution": resolution,
+            "crops": crops,
             "status": "success"
-        })
+        }), timing)
     except ValueError as e:
         # User-friendly validation errors
-        return JsonResponse({"error": str(e), "status": "validation_error"}, status=400)
+        return with_server_timing(JsonResponse({"error": str(e), "status": "validation_error"}, status=400), timing)
     except Exception as e:
         # System errors
-        return JsonResponse({"error": f"Recognition processing failed: {str(e)}", "status": "system_error"}, status=500)
+        return with_server_timing(JsonResponse({"error": f"Recognition processing failed: {str(e)}", "status": "system_error"}, status=500), timing)
+
+
+def _load_image(image_file):
+    """Validated RGB image from an uploaded file (same checks as recognize_hall)"""
+    validate_file_size(image_file.size)
+    try:
+        validate_file_extension(image_file.name)
+    except ValueError as e:
+        if "No file extension found" in str(e) or "Empty filename" in str(e):
+            validate_file_content_type(image_file)
+        else:
+            raise e
+    try:
+        image = Image.open(image_file).convert('RGB')
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {str(e)}")
+    validate_image_content(image)
+    return image
+
+
+@csrf_exempt
+@require_POST
+def hall_references(request, hall_name):
+    """Add reference photos (one or more 'file' fields) of a hall to the embedding gallery"""
+    if not Hall.objects.filter(name=hall_name).exists():
+        return JsonResponse({"error": f"Hall '{hall_name}' not found", "status": "not_found"}, status=404)
+    files = request.FILES.getlist("file")
+    if not files:
+        return JsonResponse({"error": "Invalid request. Please upload one or more image files.", "status": "invalid_request"}, status=400)
+    try:
+        if len(files) > MAX_REFERENCE_FILES:
+            raise ValueError(f"Too many files. Maximum allowed per request: {MAX_REFERENCE_FILES}")
+        images = [_load_image(f) for f in files]
+        gallery = add_references(hall_name, extract_embeddings(images, get_embedding_model()))
+        return JsonResponse({
+            "hall_id": hall_name,
+            "added": len(images),
+            "references": gallery.reference_counts()[hall_name],
+            "status": "success"
+        }, status=201)
+    except ValueError as e:
+        return JsonResponse({"error": str(e), "status": "validation_error"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": f"Reference upload failed: {str(e)}", "status": "system_error"}, status=500)
+
+
+@require_GET
+def recognition_metrics(request):
+    """Counters for this process: cascade escalation rate and compute saved, streaming frame counts"""
+    return JsonResponse({
+        "cascade": cascade_stats.snapshot(),
+        "stream": streaming.stats.snapshot(),
+        "status": "success"
+    })
+
+
+def _hall_schedule_etag(request, hall_name):
+    # One lookup per request: the body must come from the source the ETag was taken from
+    request.hall_schedule = lookup_hall_schedule(hall_name)
+    return None if request.hall_schedule is None else request.hall_schedule[1]
+
+
+@require_GET
+@condition(etag_func=_hall_schedule_etag)
+def hall_schedule(request, hall_name):
+    """Structured schedule for one hall; supports If-None-Match so unchanged schedules return 304"""
+    if request.hall_schedule is None:
+        return JsonResponse({"error": f"Hall '{hall_name}' not found", "status": "not_found"}, status=404)
+    entries, _etag = request.hall_schedule
+    response = JsonResponse({
+        "hall_id": hall_name,
+        "schedule": serialize_schedule(entries),
+        "status": "success"
+    })
+    # Clients may keep the payload but must revalidate it with the ETag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_GET
+def nearest_halls(request):
+    """
+    Halls nearest to ?lat=&lon=, either the k nearest (&k=) or all within &radius= metres.
+    Each hit carries the hall's campus graph node ("node", null when unmapped) for routing.
+    """
+    try:
+        lat = float_param(request.GET, "lat", -90, 90)
+        lon = float_param(request.GET, "lon", -180, 180)
+        index = get_hall_index()
+        if "radius" in request.GET:
+            hits = index.within(lat, lon, float_param(request.GET, "radius", 0, NEAREST_MAX_RADIUS_M))
+        else:
+            k = int(float_param(request.GET, "k", 1, NEAREST_MAX_K)) if "k" in request.GET else NEAREST_DEFAULT_K
+            hits = index.nearest(lat, lon, k)
+    except ValueError as e:
+        return JsonResponse({"error": str(e), "status": "validation_error"}, status=400)
+    return JsonResponse({
+        "halls": [{"hall_id": name, "node": index.graph_node(name), "distance_m": round(distance, 1)}
+                  for name, distance in hits],
+        "status": "success"
+    })
+
+
+@require_GET
+async def schedule_events(request):
+    """Server-Sent Events stream of schedule changes for the halls given as ?hall=...&hall=... (all when omitted)"""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI every open stream would hold a worker thread for as long as the client stays connected
+        return JsonResponse({"error": "Schedule events require the ASGI server (hallnav_backend.asgi)",
+                             "status": "system_error"}, status=503)
+    subscription = broker.subscribe(request.GET.getlist("hall"))
+    watcher.ensure_running()
+
+    async def stream():
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+            while True:
+                events = await subscription.wait(EVENTS_HEARTBEAT_SECONDS)
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event in events:
+                    yield f"event: schedule\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Disable proxy buffering (nginx)
+    return response
+
+
+def _location_list(data, key):
+    names = data.get(key)
+    if not isinstance(names, list) or not names or not all(isinstance(n, str) for n in names):
+        raise ValueError(f"'{key}' must be a non-empty list of location names")
+    if len(names) > settings.NAVIGATION_MATRIX_MAX_LOCATIONS:
+        raise ValueError(f"Too many {key}. Maximum allowed: {settings.NAVIGATION_MATRIX_MAX_LOCATIONS}")
+    return names
+
+
+@csrf_exempt
+@require_POST
+def navigation_matrix(request):
+    """
+    Many-to-many walking distances/times.
+    Body: {"origins": [...], "destinations": [...], "accessible": false, "sparse": false, "max_seconds": null}
+    """
+    try:
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ValueError("Request body must be JSON")
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        origins = _location_list(data, "origins")
+        destinations = _location_list(data, "destinations")
+        max_seconds = data.get("max_seconds")
+        if max_seconds is not None and (isinstance(max_seconds, bool) or not isinstance(max_seconds, (int, float)) or max_seconds < 0):
+            raise ValueError("'max_seconds' must be a non-negative number")
+        payload = distance_matrix_payload(origins, destinations, accessible=bool(data.get("accessible", False)),
+                                          sparse=bool(data.get("sparse", False)), max_seconds=max_seconds)
+        payload["status"] = "success"
+        return JsonResponse(payload)
+    except ValueError as e:
+        return JsonResponse({"error": str(e), "status": "validation_error"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": f"Distance matrix failed: {str(e)}", "status": "system_error"}, status=500)
@@ -0,0 +1,49 @@
+"""
+Measure DataLoader throughput (images/sec) for several worker counts, reading
+either the image folders or the tar shards written by `python data_loading.py shard`.
+
+Usage: python benchmark_loader.py --data-dir dataset_resized --shards shards --workers 0 2 4 8
+"""
+import argparse
+import os
+import time
+
+from data_loading import build_dataloaders, build_datasets, get_transforms
+
+
+def images_per_second(dataset, batch_size, workers, epochs, prefetch):
+    """Throughput over `epochs` passes after one warm-up pass (worker start-up excluded)"""
+    loader = build_dataloaders({'train': dataset}, batch_size, workers, prefetch_factor=prefetch)['train']
+    for _ in loader:
+        pass
+    start = time.perf_counter()
+    seen = 0
+    for _ in range(epochs):
+        for inputs, _labels in loader:
+            seen += inputs.size(0)
+    return seen / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val/test splits")
+    parser.add_argument('--shards', default=None, help="Also benchmark the tar shards in this directory")
+    parser.add_argument('--split', default='train')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4, min(8, os.cpu_count() or 1)])
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--prefetch', type=int, default=2)
+    parser.add_argument('--epochs', type=int, default=3, help="Timed passes per configuration")
+    args = parser.parse_args()
+
+    data_transforms = get_transforms()
+    sources = [('folders', None)] + ([('shards', args.shards)] if args.shards else [])
+    print(f"{'source':<10}{'workers':>8}{'images/s':>12}")
+    for name, shard_dir in sources:
+        dataset = build_datasets(args.data_dir, data_transforms, shard_dir, splits=[args.split])[args.split]
+        for workers in sorted(set(args.workers)):
+            rate = images_per_second(dataset, args.batch_size, workers, args.epochs, args.prefetch)
+            print(f'{name:<10}{workers:>8}{rate:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Checkpoints, early stopping and per-epoch metric logs for the training scripts.
+
+A checkpoint holds everything needed to continue a run where it stopped:
+model and optimizer state, the number of finished epochs, the early-stopping
+counters, the best weights so far, the metric history and the CPU and CUDA RNG states.
+Files are written to a temporary name and renamed, so an interrupted save
+never leaves a corrupt `last.pt` behind.
+"""
+import csv
+import json
+import math
+import os
+
+import torch
+
+LAST = 'last.pt'
+BEST = 'best.pth'
+LOG_FIELDS = ['epoch', 'train_loss', 'train_acc', 'val_loss', 'val_acc', 'data_time', 'compute_time', 'epoch_time',
+              'lr']
+
+
+def _atomic_save(obj, path):
+    tmp = f'{path}.tmp'
+    torch.save(obj, tmp)
+    os.replace(tmp, path)
+
+
+class EarlyStopping:
+    """Stops after `patience` epochs without the validation loss improving by more than `min_delta`"""
+
+    def __init__(self, patience=None, min_delta=0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_loss = math.inf
+        self.bad_epochs = 0
+
+    def step(self, val_loss):
+        """Record an epoch; returns True when val_loss is a new best"""
+        if val_loss < self.best_loss - self.min_delta:
+            self.best_loss = val_loss
+            self.bad_epochs = 0
+            return True
+        self.bad_epochs += 1
+        return False
+
+    @property
+    def should_stop(self):
+        return self.patience is not None and self.bad_epochs >= self.patience
+
+    def state_dict(self):
+        return {'best_loss': self.best_loss, 'bad_epochs': self.bad_epochs}
+
+    def load_state_dict(self, state):
+        self.best_loss = state['best_loss']
+        self.bad_epochs = state['bad_epochs']
+
+
+def save_checkpoint(checkpoint_dir, model, optimizer, epoch, stopper, best_state, history):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    _atomic_save({
+        'epoch': epoch,
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'early_stopping': stopper.state_dict(),
+        'best_state': best_state,
+        'history': history,
+        'rng': torch.get_rng_state(),
+        'cuda_rng': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+    }, os.path.join(checkpoint_dir, LAST))
+
+
+def save_best(checkpoint_dir, best_state):
+    """Best weights as a plain state dict, loadable like hall_classifier.pth"""
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    _atomic_save(best_state, os.path.join(checkpoint_dir, BEST))
+
+
+def load_checkpoint(checkpoint_dir, model, optimizer, stopper, device):
+    """Restore the latest checkpoint into model/optimizer/stopper; returns (epoch, best_state, history) or None"""
+    path = os.path.join(checkpoint_dir, LAST)
+    if not os.path.exists(path):
+        return None
+    checkpoint = torch.load(path, map_location=device, weights_only=False)
+    model.load_state_dict(checkpoint['model'])
+    optimizer.load_state_dict(checkpoint['optimizer'])
+    stopper.load_state_dict(checkpoint['early_stopping'])
+    # RNG states are CPU ByteTensors, whatever map_location moved them to
+    torch.set_rng_state(checkpoint['rng'].cpu())
+    if checkpoint.get('cuda_rng') is not None and torch.cuda.is_available():
+        states = checkpoint['cuda_rng'][:torch.cuda.device_count()]
+        torch.cuda.set_rng_state_all([state.cpu() for state in states])
+    return checkpoint['epoch'], checkpoint['best_state'], checkpoint['history']
+
+
+def write_metrics(log_dir, history):
+    """Rewrite metrics.json and metrics.csv with one row per finished epoch"""
+    os.makedirs(log_dir, exist_ok=True)
+    json_path = os.path.join(log_dir, 'metrics.json')
+    with open(f'{json_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(f'{json_path}.tmp', json_path)
+    csv_path = os.path.join(log_dir, 'metrics.csv')
+    with open(f'{csv_path}.tmp', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=LOG_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(history)
+    os.replace(f'{csv_path}.tmp', csv_path)
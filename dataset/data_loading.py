@@ -0,0 +1,164 @@
+"""
+Data loading shared by train_model.py and train_model_raw.py.
+
+Images come either from the usual ImageFolder tree (<data_dir>/<split>/<hall>/<image>)
+or from tar shards written by `python data_loading.py shard`, which replace
+thousands of small files with a few large sequentially-read ones. DataLoaders
+decode and augment in parallel worker processes that stay alive between
+epochs, prefetch batches ahead of the training loop and pin memory for fast
+host-to-GPU copies.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import tarfile
+
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from torchvision import datasets, transforms
+
+SPLITS = ['train', 'val', 'test']
+NORMALIZE = transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])  # ImageNet normalization
+
+
+def get_transforms(crop_scale=(0.8, 1.0), saturation=0.2):
+    """Augmentation for training, resize + center crop for val/test"""
+    evaluation = transforms.Compose([
+        transforms.Resize(256),  # Resize to 256, then crop to 224
+        transforms.CenterCrop(224),
+        transforms.ToTensor(),
+        NORMALIZE
+    ])
+    return {
+        'train': transforms.Compose([
+            transforms.RandomResizedCrop(224, scale=crop_scale),  # Random crop and resize to 224x224
+            transforms.RandomHorizontalFlip(p=0.5),  # 50% chance of horizontal flip
+            transforms.RandomRotation(10),  # Rotate up to ±10 degrees
+            transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=saturation),  # Adjust color
+            transforms.ToTensor(),  # Convert to tensor
+            NORMALIZE
+        ]),
+        'val': evaluation,
+        'test': evaluation,
+    }
+
+
+class TarShardDataset(Dataset):
+    """
+    Map-style dataset over the tar shards of one split. Member offsets are indexed once,
+    then each worker keeps its own open file per shard and reads an image with one seek.
+    """
+
+    def __init__(self, shard_dir, split, transform=None):
+        self.root = os.path.join(shard_dir, split)
+        with open(os.path.join(self.root, 'index.json'), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.classes = index['classes']
+        self.transform = transform
+        self.shards = [os.path.join(self.root, shard['file']) for shard in index['shards']]
+        self.samples = []  # (shard number, data offset, size, label)
+        for number, shard in enumerate(index['shards']):
+            labels = dict(map(tuple, shard['samples']))
+            with tarfile.open(self.shards[number]) as tar:
+                for member in tar.getmembers():
+                    self.samples.append((number, member.offset_data, member.size, labels[member.name]))
+        self.targets = [sample[3] for sample in self.samples]
+        self._files = {}
+
+    def __getstate__(self):
+        # Open file handles stay with the process that opened them
+        state = self.__dict__.copy()
+        state['_files'] = {}
+        return state
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        number, offset, size, label = self.samples[i]
+        f = self._files.get(number)
+        if f is None:
+            f = self._files[number] = open(self.shards[number], 'rb')
+        f.seek(offset)
+        image = Image.open(io.BytesIO(f.read(size))).convert('RGB')
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, label
+
+
+def write_shards(data_dir, shard_dir, split, shard_size=1000, seed=0):
+    """Pack one ImageFolder split into shuffled tar shards of `shard_size` images; returns the shard count"""
+    folder = datasets.ImageFolder(os.path.join(data_dir, split))
+    samples = list(folder.samples)
+    random.Random(seed).shuffle(samples)
+    out = os.path.join(shard_dir, split)
+    os.makedirs(out, exist_ok=True)
+    shards = []
+    for start in range(0, len(samples), shard_size):
+        name = f'{split}-{len(shards):05d}.tar'
+        members = []
+        with tarfile.open(os.path.join(out, name), 'w') as tar:
+            for i, (path, label) in enumerate(samples[start:start + shard_size], start):
+                member = f'{i:08d}{os.path.splitext(path)[1].lower()}'
+                tar.add(path, arcname=member)
+                members.append([member, label])
+        shards.append({'file': name, 'samples': members})
+    with open(os.path.join(out, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'classes': folder.classes, 'shards': shards}, f)
+    return len(shards)
+
+
+def build_datasets(data_dir, data_transforms, shard_dir=None, splits=SPLITS):
+    if shard_dir:
+        return {x: TarShardDataset(shard_dir, x, data_transforms[x]) for x in splits}
+    return {x: datasets.ImageFolder(os.path.join(data_dir, x), data_transforms[x]) for x in splits}
+
+
+def build_dataloaders(image_datasets, batch_size=8, num_workers=0, pin_memory=None,
+                      persistent_workers=True, prefetch_factor=2):
+    """DataLoaders per split; training batches are shuffled"""
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    options = {'batch_size': batch_size, 'num_workers': num_workers, 'pin_memory': pin_memory}
+    if num_workers > 0:
+        # Keep workers (and their open shards) across epochs and load batches ahead of the model
+        options.update(persistent_workers=persistent_workers, prefetch_factor=prefetch_factor)
+    return {x: DataLoader(ds, shuffle=(x == 'train'), **options) for x, ds in image_datasets.items()}
+
+
+def add_loader_arguments(parser):
+    group = parser.add_argument_group('data loading')
+    group.add_argument('--batch-size', type=int, default=8)
+    group.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                       help="Worker processes decoding and augmenting images (0 = main process)")
+    group.add_argument('--prefetch', type=int, default=2, help="Batches each worker loads ahead")
+    group.add_argument('--no-pin-memory', action='store_true', help="Disable pinned host memory")
+    group.add_argument('--no-persistent-workers', action='store_true', help="Restart workers every epoch")
+    group.add_argument('--shards', default=None, help="Read tar shards from this directory instead of image folders")
+    return parser
+
+
+def dataloaders_from_args(args, data_dir, data_transforms, splits=SPLITS):
+    """(image_datasets, dataloaders) for `splits`, configured from add_loader_arguments options"""
+    image_datasets = build_datasets(data_dir, data_transforms, args.shards, splits)
+    dataloaders = build_dataloaders(image_datasets, args.batch_size, args.workers,
+                                    pin_memory=False if args.no_pin_memory else None,
+                                    persistent_workers=not args.no_persistent_workers,
+                                    prefetch_factor=args.prefetch)
+    return image_datasets, dataloaders
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pack ImageFolder splits into tar shards")
+    parser.add_argument('command', choices=['shard'])
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val/test splits")
+    parser.add_argument('--out', default='shards', help="Output directory")
+    parser.add_argument('--shard-size', type=int, default=1000, help="Images per shard")
+    args = parser.parse_args()
+    for split in SPLITS:
+        if os.path.isdir(os.path.join(args.data_dir, split)):
+            n = write_shards(args.data_dir, args.out, split, args.shard_size)
+            print(f'{split}: {n} shard(s) in {os.path.join(args.out, split)}')
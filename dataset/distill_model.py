@@ -0,0 +1,135 @@
+"""
+Distil the MobileNetV2 hall classifier into a much smaller student network.
+
+The student is trained on the teacher's temperature-softened predictions
+(plus the true labels) and exported as a TorchScript artifact that the backend
+can serve directly (set HALLNAV_MODEL_PATH to the .pt file). Teacher and student
+accuracy, size, FLOPs and CPU latency are printed side by side.
+
+Usage: python distill_model.py --teacher ../backend/hallnav_backend/recognition/hall_classifier_raw.pth
+"""
+import argparse
+import copy
+import json
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from torchvision import models
+
+from data_loading import add_loader_arguments, dataloaders_from_args, get_transforms
+from model_stats import count_flops, count_parameters, evaluate, measure_latency, print_comparison
+
+# Same augmentation and evaluation transforms as train_model.py
+data_transforms = get_transforms()
+
+class_names = ['LT1 & 2', 'LT3 & 4']  # Your hall names
+
+STUDENTS = ('mobilenet_v3_small', 'mobilenet_v2_050')
+
+
+def load_teacher(path, num_classes):
+    model = models.mobilenet_v2(weights=None)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    return model.eval()
+
+
+def build_student(name, num_classes, pretrained=True):
+    """MobileNetV3-Small (ImageNet weights) or MobileNetV2 at half width (no pretrained weights exist)"""
+    if name == 'mobilenet_v3_small':
+        weights = models.MobileNet_V3_Small_Weights.IMAGENET1K_V1 if pretrained else None
+        model = models.mobilenet_v3_small(weights=weights)
+        model.classifier[3] = nn.Linear(model.classifier[3].in_features, num_classes)
+    elif name == 'mobilenet_v2_050':
+        model = models.mobilenet_v2(weights=None, width_mult=0.5)
+        model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+    else:
+        raise ValueError(f"Unknown student '{name}'. Expected one of: {', '.join(STUDENTS)}")
+    return model
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    """alpha * T^2 * KL(teacher || student) on softened logits + (1 - alpha) * cross-entropy on labels"""
+    soft = F.kl_div(F.log_softmax(student_logits / temperature, dim=1),
+                    F.softmax(teacher_logits / temperature, dim=1),
+                    reduction='batchmean') * temperature ** 2
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+
+def distill(student, teacher, dataloaders, device, num_epochs, lr, temperature, alpha):
+    """Train the student against the teacher; returns the student with the best validation accuracy"""
+    optimizer = optim.Adam(student.parameters(), lr=lr)
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=num_epochs)
+    best_acc, best_state = -1.0, copy.deepcopy(student.state_dict())
+    for epoch in range(num_epochs):
+        student.train()
+        running_loss = 0.0
+        seen = 0
+        for inputs, labels in dataloaders['train']:
+            inputs, labels = inputs.to(device), labels.to(device)
+            with torch.no_grad():
+                teacher_logits = teacher(inputs)
+            optimizer.zero_grad()
+            loss = distillation_loss(student(inputs), teacher_logits, labels, temperature, alpha)
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item() * inputs.size(0)
+            seen += inputs.size(0)
+        scheduler.step()
+        val_acc = evaluate(student, dataloaders['val'], device)
+        print(f'Epoch {epoch+1}/{num_epochs} train Loss: {running_loss / max(seen, 1):.4f} val Acc: {val_acc:.4f}')
+        if val_acc > best_acc:
+            best_acc, best_state = val_acc, copy.deepcopy(student.state_dict())
+    student.load_state_dict(best_state)
+    return student.eval()
+
+
+def export_torchscript(model, path, names):
+    """Trace on CPU and save with the class names embedded (read back by the backend)"""
+    model = model.to('cpu').eval()
+    traced = torch.jit.trace(model, torch.zeros(1, 3, 224, 224))
+    traced.save(path, _extra_files={'class_names.json': json.dumps(names)})
+    return traced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val/test splits")
+    parser.add_argument('--teacher', default='hall_classifier_raw.pth', help="Teacher state dict (MobileNetV2)")
+    parser.add_argument('--student', choices=STUDENTS, default='mobilenet_v3_small')
+    parser.add_argument('--no-pretrained', action='store_true', help="Start the student from random weights")
+    parser.add_argument('--epochs', type=int, default=15)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--temperature', type=float, default=4.0, help="Softening temperature for the soft targets")
+    parser.add_argument('--alpha', type=float, default=0.7, help="Weight of the soft-target loss")
+    parser.add_argument('--output', default='hall_classifier_student.pt', help="TorchScript artifact to write")
+    add_loader_arguments(parser)
+    parser.set_defaults(batch_size=16)
+    args = parser.parse_args()
+
+    image_datasets, dataloaders = dataloaders_from_args(args, args.data_dir, data_transforms)
+    if image_datasets['train'].classes != class_names:
+        raise SystemExit(f"Dataset classes {image_datasets['train'].classes} do not match {class_names}")
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+
+    teacher = load_teacher(args.teacher, len(class_names)).to(device)
+    student = build_student(args.student, len(class_names), pretrained=not args.no_pretrained).to(device)
+    student = distill(student, teacher, dataloaders, device, args.epochs, args.lr, args.temperature, args.alpha)
+
+    rows = []
+    for name, model in (('teacher (mobilenet_v2)', teacher), (f'student ({args.student})', student)):
+        accuracy = evaluate(model.to(device), dataloaders['test'], device)
+        rows.append((name, accuracy, count_parameters(model), count_flops(model), measure_latency(model)))
+    print()
+    print_comparison(rows)
+    print(f"FLOPs reduction: {rows[0][3] / rows[1][3]:.1f}x, speed-up: {rows[0][4] / rows[1][4]:.1f}x")
+
+    export_torchscript(student, args.output, class_names)
+    print(f'Exported {args.output}')
+
+
+if __name__ == '__main__':
+    main()
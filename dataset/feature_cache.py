@@ -0,0 +1,119 @@
+"""
+Memory-mapped store of frozen-backbone features for fast classifier-head training.
+
+With the MobileNetV2 backbone frozen, only the final Linear layer learns, so
+the backbone output for an image never changes between epochs. The store runs
+the backbone once over `views` augmented copies of every training image (one
+deterministic view for val/test) and writes the pooled 1280-d features to a
+float16 memmap. Head epochs then read features instead of decoding JPEGs.
+
+A cache is reused while its signature (image files, sizes, mtimes, number of
+views, transforms) is unchanged; adding images or halls rebuilds it.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+
+def dataset_signature(dataset, views, transform):
+    """Hash of the image or shard files (path, size, mtime), classes, view count and transform"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([dataset.classes, views, repr(transform)]).encode('utf-8'))
+    # Tar-shard datasets (data_loading.TarShardDataset) are identified by their shard files
+    files = [(path, None) for path in dataset.shards] if hasattr(dataset, 'shards') else dataset.samples
+    for path, label in files:
+        stat = os.stat(path)
+        digest.update(f'{path}|{label}|{stat.st_size}|{stat.st_mtime_ns};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def backbone_features(model, inputs):
+    """Pooled penultimate features of a torchvision MobileNetV2 (the input of classifier[1])"""
+    return F.adaptive_avg_pool2d(model.features(inputs), 1).flatten(1)
+
+
+def build_features(model, dataset, path, views, batch_size, device, num_workers=0):
+    """Extract `views` passes over the dataset into a float16 memmap; returns (features, labels)"""
+    n = len(dataset)
+    dim = model.classifier[1].in_features
+    tmp_path = f'{path}.tmp'
+    features = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16, shape=(n * views, dim))
+    labels = np.empty(n * views, dtype=np.int64)
+    model.eval()
+    row = 0
+    with torch.no_grad():
+        for view in range(views):
+            # Augmentations are random, so each pass over the dataset yields new views
+            loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+            for inputs, targets in loader:
+                batch = backbone_features(model, inputs.to(device)).cpu().numpy()
+                features[row:row + len(batch)] = batch
+                labels[row:row + len(batch)] = targets.numpy()
+                row += len(batch)
+            print(f'  cached view {view + 1}/{views} ({n} images)')
+    features.flush()
+    del features
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r'), labels
+
+
+def load_or_build(model, dataset, cache_dir, split, views, batch_size, device, num_workers=0):
+    """Cached (features, labels) for a split, rebuilt when the images or settings changed"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{split}_features.npy')
+    labels_path = os.path.join(cache_dir, f'{split}_labels.npy')
+    meta_path = os.path.join(cache_dir, f'{split}_meta.json')
+    signature = dataset_signature(dataset, views, dataset.transform)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('signature') == signature:
+                print(f'Using cached {split} features from {path}')
+                return np.load(path, mmap_mode='r'), np.load(labels_path)
+    except (OSError, ValueError):
+        pass
+    print(f'Caching {split} features ({views} view(s) per image) in {path}')
+    features, labels = build_features(model, dataset, path, views, batch_size, device, num_workers)
+    np.save(labels_path, labels)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'signature': signature, 'views': views, 'rows': len(labels)}, f)
+    return features, labels
+
+
+def train_head(model, train_cache, val_cache, num_epochs=30, lr=1e-3, batch_size=256, device='cpu'):
+    """Train model.classifier (dropout + linear) on cached features; the backbone is untouched"""
+    head = model.classifier.to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(head.parameters(), lr=lr)
+    # The cache is small enough to sit in memory once read (N x 1280 float16)
+    train_x = torch.from_numpy(np.asarray(train_cache[0], dtype=np.float32)).to(device)
+    train_y = torch.from_numpy(np.asarray(train_cache[1])).to(device)
+    val_x = torch.from_numpy(np.asarray(val_cache[0], dtype=np.float32)).to(device)
+    val_y = torch.from_numpy(np.asarray(val_cache[1])).to(device)
+    for epoch in range(num_epochs):
+        head.train()
+        order = torch.randperm(len(train_x), device=device)
+        running_loss = 0.0
+        running_corrects = 0
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            optimizer.zero_grad()
+            outputs = head(train_x[idx])
+            loss = criterion(outputs, train_y[idx])
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item() * len(idx)
+            running_corrects += (outputs.argmax(1) == train_y[idx]).sum().item()
+        head.eval()
+        with torch.no_grad():
+            val_outputs = head(val_x)
+            val_loss = criterion(val_outputs, val_y).item()
+            val_acc = (val_outputs.argmax(1) == val_y).float().mean().item()
+        print(f'Epoch {epoch+1}/{num_epochs} train Loss: {running_loss / len(train_x):.4f} '
+              f'Acc: {running_corrects / len(train_x):.4f} val Loss: {val_loss:.4f} Acc: {val_acc:.4f}')
+    return model
@@ -0,0 +1,230 @@
+"""
+Find near-duplicate images across the train/val/test splits with perceptual hashes.
+
+Every image gets a 64-bit DCT perceptual hash (computed in a process pool),
+stored as one uint64 per image. Pairs within `--threshold` bits are found with
+multi-index hashing: the hash is cut into m chunks of about log2(N) bits, and
+by the pigeonhole principle two hashes that close are within threshold // m
+bits of each other on at least one chunk. Only images landing in the probed
+buckets are compared, with XOR + popcount over NumPy arrays, which keeps the
+search near-linear for hundreds of thousands of images. Small datasets (or
+loose thresholds) use a blockwise all-pairs scan instead.
+
+Near-duplicates are grouped and reported, cross-split leaks (the same photo
+in train and val/test) first. With --dedupe, all but one image of each group
+are moved into a quarantine folder (same relative paths, so they can be put
+back); the kept image is the one in test, then val, then train, largest first.
+
+Usage: python find_duplicates.py --data-dir dataset_resized --threshold 6 --report duplicates.json [--dedupe]
+"""
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from math import comb
+
+import numpy as np
+from PIL import Image
+
+SPLITS = ['train', 'val', 'test']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff')
+HASH_SIZE = 8  # 8 x 8 low-frequency DCT coefficients -> 64 bits
+DCT_SIZE = 32
+BLOCK_ELEMENTS = 1 << 22  # Hash pairs compared at once by the all-pairs scan
+SEARCH_COST = 40  # Rough cost of one probe per image relative to one pairwise comparison
+KEEP_PRIORITY = {'test': 0, 'val': 1, 'train': 2}
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT = _dct_matrix(DCT_SIZE)
+
+
+def phash(path):
+    """(64-bit perceptual hash, pixel count): sign of the low DCT frequencies against their median"""
+    with Image.open(path) as img:
+        pixels = img.size[0] * img.size[1]
+        img.draft('L', (DCT_SIZE * 4, DCT_SIZE * 4))  # JPEG only: decode at a reduced scale
+        small = np.asarray(img.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.Resampling.LANCZOS),
+                           dtype=np.float64)
+    low = (DCT @ small @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    bits = low > np.median(low[1:])  # The DC term only carries overall brightness
+    return int(np.packbits(bits).view('>u8')[0]), pixels
+
+
+def find_images(data_dir):
+    """[(split, relative path)] of every image under <split>/<class>/"""
+    found = []
+    for split in SPLITS:
+        split_dir = os.path.join(data_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        for hall in sorted(os.listdir(split_dir)):
+            hall_dir = os.path.join(split_dir, hall)
+            if os.path.isdir(hall_dir):
+                found.extend((split, os.path.join(split, hall, f)) for f in sorted(os.listdir(hall_dir))
+                             if f.lower().endswith(IMAGE_EXTENSIONS))
+    return found
+
+
+def hash_images(paths, workers=None):
+    """(uint64 hashes, int64 pixel counts) for the given files, hashed in parallel"""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(phash, paths, chunksize=64))
+    hashes = np.array([h for h, _ in results], dtype=np.uint64)
+    pixels = np.array([p for _, p in results], dtype=np.int64)
+    return hashes, pixels
+
+
+def _plan(n, threshold):
+    """
+    Multi-index hashing layout: m chunks of about log2(n) bits each, so a lookup bucket holds
+    O(1) images. Two hashes within `threshold` bits are within threshold // m bits on at least one
+    chunk, so each chunk is probed with every flip pattern of up to that many bits.
+    Returns ([(shift, bits)], radius, probes per chunk).
+    """
+    m = max(1, min(threshold + 1, round(64 / max(np.log2(max(n, 2)), 1))))
+    edges = [round(k * 64 / m) for k in range(m + 1)]
+    chunks = [(edges[k], edges[k + 1] - edges[k]) for k in range(m)]
+    radius = threshold // m
+    probes = sum(comb(max(bits for _, bits in chunks), r) for r in range(radius + 1))
+    return chunks, radius, probes
+
+
+def _flip_masks(bits, radius):
+    return np.array([sum(1 << b for b in flipped) for r in range(radius + 1)
+                     for flipped in combinations(range(bits), r)], dtype=np.uint64)
+
+
+def _verify(hashes, i, j, threshold):
+    distance = np.bitwise_count(hashes[i] ^ hashes[j])
+    keep = distance <= threshold
+    return i[keep], j[keep], distance[keep]
+
+
+def _all_pairs(hashes, threshold):
+    """Blockwise XOR + popcount over every pair"""
+    n = len(hashes)
+    found = ([], [], [])
+    block = max(1, BLOCK_ELEMENTS // max(n, 1))
+    for start in range(0, n, block):
+        rows = np.arange(start, min(n, start + block))
+        i, j = np.nonzero(np.bitwise_count(hashes[rows, None] ^ hashes[None, start:]) <= threshold)
+        i, j = rows[i], j + start
+        for out, values in zip(found, _verify(hashes, i[i < j], j[i < j], threshold)):
+            out.append(values)
+    return tuple(np.concatenate(values) for values in found)
+
+
+def near_duplicate_pairs(hashes, threshold):
+    """(i, j, distance) arrays of all pairs i < j whose hashes differ in at most `threshold` bits"""
+    n = len(hashes)
+    chunks, radius, probes = _plan(n, threshold)
+    if len(chunks) * probes * SEARCH_COST > n:
+        return _all_pairs(hashes, threshold)  # Few images or a loose threshold: scanning everything is cheaper
+
+    found = ([], [], [])
+    for shift, bits in chunks:
+        keys = (hashes >> np.uint64(shift)) & np.uint64((1 << bits) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        for mask in _flip_masks(bits, radius):
+            lo = np.searchsorted(sorted_keys, keys ^ mask, 'left')
+            counts = np.searchsorted(sorted_keys, keys ^ mask, 'right') - lo
+            # Expand every query into (query, bucket member) pairs
+            queries = np.repeat(np.arange(n), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            members = order[np.repeat(lo, counts) + offsets]
+            keep = queries < members
+            for out, values in zip(found, _verify(hashes, queries[keep], members[keep], threshold)):
+                out.append(values)
+    i, j, distance = (np.concatenate(values) for values in found)
+    # A pair found through several chunks is reported once
+    _, first = np.unique(i * n + j, return_index=True)
+    return i[first], j[first], distance[first]
+
+
+def group_pairs(n, i, j):
+    """Connected components (lists of indices, size > 1) of the duplicate graph"""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(i.tolist(), j.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+    groups = {}
+    for x in range(n):
+        groups.setdefault(find(x), []).append(x)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val/test/<hall> images")
+    parser.add_argument('--threshold', type=int, default=6, help="Maximum differing hash bits (0-63)")
+    parser.add_argument('--workers', type=int, default=None, help="Hashing processes (default: all cores)")
+    parser.add_argument('--report', default=None, help="Write pairs, groups and leaks to this JSON file")
+    parser.add_argument('--dedupe', action='store_true', help="Move all but one image per group to --quarantine")
+    parser.add_argument('--quarantine', default='duplicates', help="Where --dedupe moves images")
+    args = parser.parse_args()
+    if not 0 <= args.threshold < 64:
+        parser.error('--threshold must be between 0 and 63')
+
+    images = find_images(args.data_dir)
+    if not images:
+        raise SystemExit(f'No images under {args.data_dir}/<split>/<class>/')
+    splits = [split for split, _ in images]
+    relative = [path for _, path in images]
+    hashes, pixels = hash_images([os.path.join(args.data_dir, p) for p in relative], args.workers)
+    i, j, distance = near_duplicate_pairs(hashes, args.threshold)
+    groups = group_pairs(len(images), i, j)
+
+    leaks = [(a, b, d) for a, b, d in zip(i.tolist(), j.tolist(), distance.tolist()) if splits[a] != splits[b]]
+    print(f'{len(images)} images, {len(i)} near-duplicate pairs (<= {args.threshold} bits) in {len(groups)} groups')
+    print(f'{len(leaks)} cross-split pairs')
+    for a, b, d in sorted(leaks, key=lambda leak: leak[2])[:20]:
+        print(f'  {d:>2} bits  {relative[a]}  <->  {relative[b]}')
+
+    # Keep the copy in the most protected split (test > val > train), then the largest image
+    keep = {min(members, key=lambda x: (KEEP_PRIORITY[splits[x]], -pixels[x], relative[x])) for members in groups}
+    redundant = sorted(x for members in groups for x in members if x not in keep)
+    print(f'{len(redundant)} redundant images '
+          f'({sum(splits[x] == "train" for x in redundant)} in train)')
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({
+                'data_dir': args.data_dir,
+                'threshold': args.threshold,
+                'images': len(images),
+                'pairs': [{'a': relative[a], 'b': relative[b], 'distance': d}
+                          for a, b, d in zip(i.tolist(), j.tolist(), distance.tolist())],
+                'cross_split': [{'a': relative[a], 'b': relative[b], 'distance': d} for a, b, d in leaks],
+                'groups': [{'keep': relative[next(x for x in members if x in keep)],
+                            'remove': [relative[x] for x in members if x not in keep]} for members in groups],
+            }, f, indent=2)
+        print(f'Wrote {args.report}')
+
+    if args.dedupe:
+        for x in redundant:
+            target = os.path.join(args.quarantine, relative[x])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(os.path.join(args.data_dir, relative[x]), target)
+        print(f'Moved {len(redundant)} images to {args.quarantine}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Size, compute, speed and accuracy measurements shared by the training scripts.
+"""
+import time
+
+import torch
+import torch.nn as nn
+
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def count_flops(model, input_size=(1, 3, 224, 224)):
+    """Multiply-accumulates of one forward pass, counted over Conv2d and Linear layers"""
+    total = 0
+
+    def conv_hook(module, inputs, output):
+        nonlocal total
+        kernel_ops = module.kernel_size[0] * module.kernel_size[1] * (module.in_channels // module.groups)
+        total += output.numel() * kernel_ops
+
+    def linear_hook(module, inputs, output):
+        nonlocal total
+        total += output.numel() * module.in_features
+
+    hooks = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            hooks.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            hooks.append(module.register_forward_hook(linear_hook))
+    device = next(model.parameters()).device
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        model(torch.zeros(input_size, device=device))
+    model.train(was_training)
+    for hook in hooks:
+        hook.remove()
+    return total
+
+
+def measure_latency(model, input_size=(1, 3, 224, 224), warmup=5, runs=30):
+    """Median CPU latency of one forward pass in milliseconds"""
+    model = model.to('cpu').eval()
+    x = torch.randn(input_size)
+    timings = []
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(x)
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(x)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def evaluate(model, dataloader, device):
+    """Top-1 accuracy of a model over a dataloader"""
+    model.eval()
+    correct = 0
+    total = 0
+    with torch.no_grad():
+        for inputs, labels in dataloader:
+            inputs, labels = inputs.to(device), labels.to(device)
+            outputs = model(inputs)
+            _, predicted = torch.max(outputs, 1)
+            total += labels.size(0)
+            correct += (predicted == labels).sum().item()
+    return correct / total if total else 0.0
+
+
+def print_comparison(rows):
+    """rows: [(name, accuracy, params, flops, latency_ms), ...]"""
+    print(f"{'model':<30}{'accuracy':>10}{'params (M)':>12}{'MFLOPs':>10}{'CPU ms/img':>12}")
+    for name, accuracy, params, flops, latency in rows:
+        print(f"{name:<30}{accuracy * 100:>9.2f}%{params / 1e6:>12.2f}{flops / 1e6:>10.1f}{latency:>12.2f}")
@@ -0,0 +1,251 @@
+"""
+Decoded-pixel store with batched tensor augmentation for full fine-tuning.
+
+When the backbone is unfrozen, decoding JPEGs and running the PIL transforms
+(RandomResizedCrop, RandomRotation, ColorJitter) one image at a time starves
+the model. `build` decodes every image once, resizes its short side to 256,
+center-crops it square and writes the uint8 pixels of a split into a single
+memory-mapped array (N x 256 x 256 x 3) next to a label vector. Training then
+slices whole batches out of the memmap and augments them as tensor ops on the
+training device: one affine grid per sample covers the random resized crop,
+rotation and flip, and color jitter is a few broadcast multiplies.
+
+Evaluation batches are center-cropped to 224, the same view as the
+Resize(256) + CenterCrop(224) transform of the ImageFolder pipeline.
+Training crops are taken from the central square rather than the full frame.
+
+Usage:
+  python pixel_store.py build --data-dir dataset_resized --out pixel_store
+  python pixel_store.py compare --data-dir dataset_resized --store pixel_store --epochs 5
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from PIL import Image
+from torchvision import datasets, models
+
+from data_loading import SPLITS, add_loader_arguments, dataloaders_from_args, get_transforms
+from feature_cache import dataset_signature
+from model_stats import evaluate
+
+STORE_SIZE = 256  # Side of the stored square images
+CROP_SIZE = 224
+MEAN = (0.485, 0.456, 0.406)  # ImageNet normalization
+STD = (0.229, 0.224, 0.225)
+
+
+def _decode(path, size=STORE_SIZE):
+    """Short side resized to `size` (bilinear, as transforms.Resize), then center-cropped to a square"""
+    with Image.open(path) as img:
+        img = img.convert('RGB')
+        w, h = img.size
+        # Same output size and crop offsets as transforms.Resize(size) + CenterCrop(size)
+        if w <= h:
+            w, h = size, int(size * h / w)
+        else:
+            w, h = int(size * w / h), size
+        img = img.resize((w, h), Image.Resampling.BILINEAR)
+        left = int(round((w - size) / 2.0))
+        top = int(round((h - size) / 2.0))
+        return np.asarray(img.crop((left, top, left + size, top + size)), dtype=np.uint8)
+
+
+def build_store(data_dir, out_dir, split, size=STORE_SIZE):
+    """Decode one ImageFolder split into <out_dir>/<split>_pixels.npy + _labels.npy; reused while unchanged"""
+    folder = datasets.ImageFolder(os.path.join(data_dir, split))
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f'{split}_pixels.npy')
+    meta_path = os.path.join(out_dir, f'{split}_meta.json')
+    signature = dataset_signature(folder, size, None)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('signature') == signature:
+                print(f'{split}: {path} is up to date')
+                return
+    except (OSError, ValueError):
+        pass
+    tmp_path = f'{path}.tmp'
+    pixels = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                       shape=(len(folder.samples), size, size, 3))
+    for i, (image_path, _label) in enumerate(folder.samples):
+        pixels[i] = _decode(image_path, size)
+    pixels.flush()
+    del pixels
+    os.replace(tmp_path, path)
+    np.save(os.path.join(out_dir, f'{split}_labels.npy'), np.asarray(folder.targets, dtype=np.int64))
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'signature': signature, 'classes': folder.classes, 'size': size, 'rows': len(folder.samples)}, f)
+    print(f'{split}: {len(folder.samples)} images -> {path}')
+
+
+class BatchAugment(nn.Module):
+    """
+    The train transform of get_transforms() applied to a whole uint8 NHWC batch at once:
+    random resized crop (scale, ratio 3/4-4/3), flip, rotation, brightness/contrast/saturation
+    jitter and ImageNet normalization, producing N x 3 x 224 x 224 floats.
+    """
+
+    def __init__(self, crop_scale=(0.8, 1.0), rotation=10, brightness=0.2, contrast=0.2, saturation=0.2,
+                 size=CROP_SIZE):
+        super().__init__()
+        self.crop_scale = crop_scale
+        self.rotation = math.radians(rotation)
+        self.jitter = (brightness, contrast, saturation)
+        self.size = size
+        self.register_buffer('mean', torch.tensor(MEAN).view(1, 3, 1, 1))
+        self.register_buffer('std', torch.tensor(STD).view(1, 3, 1, 1))
+        self.register_buffer('gray', torch.tensor([0.299, 0.587, 0.114]).view(1, 3, 1, 1))
+
+    def _uniform(self, n, low, high, device):
+        return torch.empty(n, device=device).uniform_(low, high)
+
+    def _factor(self, n, amount, device):
+        return self._uniform(n, 1 - amount, 1 + amount, device).view(n, 1, 1, 1)
+
+    def forward(self, pixels):
+        x = pixels.permute(0, 3, 1, 2).float().div_(255)
+        n, device = x.shape[0], x.device
+        # Crop width/height as fractions of the (square) stored image
+        area = self._uniform(n, *self.crop_scale, device)
+        log_ratio = self._uniform(n, math.log(3 / 4), math.log(4 / 3), device)
+        w = torch.sqrt(area * torch.exp(log_ratio)).clamp(max=1)
+        h = torch.sqrt(area / torch.exp(log_ratio)).clamp(max=1)
+        cx = (torch.rand(n, device=device) * 2 - 1) * (1 - w)
+        cy = (torch.rand(n, device=device) * 2 - 1) * (1 - h)
+        angle = self._uniform(n, -self.rotation, self.rotation, device)
+        flip = torch.where(torch.rand(n, device=device) < 0.5, -1.0, 1.0)
+        cos, sin = torch.cos(angle), torch.sin(angle)
+        theta = torch.stack([
+            torch.stack([cos * w * flip, -sin * h, cx], dim=1),
+            torch.stack([sin * w * flip, cos * h, cy], dim=1),
+        ], dim=1)
+        grid = F.affine_grid(theta, (n, 3, self.size, self.size), align_corners=False)
+        x = F.grid_sample(x, grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+        brightness, contrast, saturation = self.jitter
+        if brightness:
+            x = (x * self._factor(n, brightness, device)).clamp_(0, 1)
+        if contrast:
+            mean = (x * self.gray).sum(1, keepdim=True).mean((2, 3), keepdim=True)
+            x = ((x - mean) * self._factor(n, contrast, device) + mean).clamp_(0, 1)
+        if saturation:
+            gray = (x * self.gray).sum(1, keepdim=True)
+            x = ((x - gray) * self._factor(n, saturation, device) + gray).clamp_(0, 1)
+        return (x - self.mean) / self.std
+
+
+class PixelLoader:
+    """
+    Iterates (inputs, labels) batches from a pixel store, already on `device`.
+    Training batches are shuffled and go through BatchAugment; others are center-cropped.
+    """
+
+    def __init__(self, store_dir, split, batch_size=32, device='cpu', augment=None):
+        self.pixels = np.load(os.path.join(store_dir, f'{split}_pixels.npy'), mmap_mode='r')
+        self.labels = torch.from_numpy(np.load(os.path.join(store_dir, f'{split}_labels.npy')))
+        with open(os.path.join(store_dir, f'{split}_meta.json'), 'r', encoding='utf-8') as f:
+            self.classes = json.load(f)['classes']
+        self.batch_size = batch_size
+        self.device = torch.device(device)
+        self.augment = augment.to(self.device) if augment is not None else None
+        self.mean = torch.tensor(MEAN, device=self.device).view(1, 3, 1, 1)
+        self.std = torch.tensor(STD, device=self.device).view(1, 3, 1, 1)
+
+    def __len__(self):
+        return -(-len(self.labels) // self.batch_size)
+
+    def _center(self, pixels):
+        offset = (pixels.shape[1] - CROP_SIZE) // 2
+        x = pixels[:, offset:offset + CROP_SIZE, offset:offset + CROP_SIZE].permute(0, 3, 1, 2).float().div_(255)
+        return (x - self.mean) / self.std
+
+    def __iter__(self):
+        n = len(self.labels)
+        order = torch.randperm(n).numpy() if self.augment is not None else np.arange(n)
+        for start in range(0, n, self.batch_size):
+            # Sorted indices turn the memmap gather into mostly forward reads
+            idx = np.sort(order[start:start + self.batch_size])
+            pixels = torch.from_numpy(self.pixels[idx]).to(self.device, non_blocking=True)
+            inputs = self.augment(pixels) if self.augment is not None else self._center(pixels)
+            yield inputs, self.labels[idx].to(self.device)
+
+
+def fine_tune(model, dataloaders, device, num_epochs, lr):
+    """Full fine-tuning (backbone unfrozen); returns (best-val model, training images/sec)"""
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    best_acc, best_state = -1.0, copy.deepcopy(model.state_dict())
+    seen, train_time = 0, 0.0
+    for epoch in range(num_epochs):
+        model.train()
+        start = time.perf_counter()
+        for inputs, labels in dataloaders['train']:
+            inputs, labels = inputs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+            optimizer.zero_grad()
+            loss = criterion(model(inputs), labels)
+            loss.backward()
+            optimizer.step()
+            seen += inputs.size(0)
+        train_time += time.perf_counter() - start
+        val_acc = evaluate(model, dataloaders['val'], device)
+        print(f'  epoch {epoch+1}/{num_epochs} val Acc: {val_acc:.4f}')
+        if val_acc > best_acc:
+            best_acc, best_state = val_acc, copy.deepcopy(model.state_dict())
+    model.load_state_dict(best_state)
+    return model, seen / train_time
+
+
+def compare(args):
+    """Fine-tune the same initial model with both pipelines and print throughput and test accuracy"""
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    torch.manual_seed(args.seed)
+    weights = None if args.no_pretrained else models.MobileNet_V2_Weights.IMAGENET1K_V1
+    initial = models.mobilenet_v2(weights=weights)
+    _, folder_loaders = dataloaders_from_args(args, args.data_dir, get_transforms())
+    store_loaders = {x: PixelLoader(args.store, x, args.batch_size, device,
+                                    BatchAugment() if x == 'train' else None) for x in SPLITS}
+    initial.classifier[1] = nn.Linear(initial.classifier[1].in_features, len(store_loaders['train'].classes))
+
+    rows = []
+    for name, dataloaders in (('ImageFolder + PIL', folder_loaders), ('pixel store + batched', store_loaders)):
+        print(name)
+        torch.manual_seed(args.seed)
+        model, rate = fine_tune(copy.deepcopy(initial).to(device), dataloaders, device, args.epochs, args.lr)
+        rows.append((name, rate, evaluate(model, dataloaders['test'], device)))
+    print()
+    print(f"{'pipeline':<26}{'train img/s':>12}{'test acc':>10}")
+    for name, rate, accuracy in rows:
+        print(f'{name:<26}{rate:>12.1f}{accuracy * 100:>9.2f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'compare'])
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val/test splits")
+    parser.add_argument('--out', '--store', dest='store', default='pixel_store', help="Pixel store directory")
+    parser.add_argument('--size', type=int, default=STORE_SIZE, help="Side of the stored square images")
+    parser.add_argument('--epochs', type=int, default=5, help="Fine-tuning epochs per pipeline (compare)")
+    parser.add_argument('--lr', type=float, default=1e-4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-pretrained', action='store_true', help="Start from random weights (compare)")
+    add_loader_arguments(parser)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for split in SPLITS:
+            if os.path.isdir(os.path.join(args.data_dir, split)):
+                build_store(args.data_dir, args.store, split, args.size)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Structured channel pruning for the MobileNetV2 hall classifier.
+
+For every inverted-residual block with an expansion layer, the expanded
+(hidden) channels are ranked by |depthwise BN gamma| x L1 norm of the
+projection weights that read them, and the lowest-ranked ones are removed from
+the expansion conv, the depthwise conv and the projection conv together, so
+block inputs/outputs and residual connections keep their shape. The final
+1x1 conv (320 -> 1280) is pruned the same way against the classifier weights.
+The layers are rebuilt with fewer channels, so the result is physically
+smaller, not masked. Each pruned model is fine-tuned briefly, evaluated and
+exported as TorchScript (servable via HALLNAV_MODEL_PATH).
+
+Usage: python prune_model.py --model ../backend/hallnav_backend/recognition/hall_classifier_raw.pth --ratios 0.25 0.5 0.75
+"""
+import argparse
+import copy
+import os
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torchvision import models
+
+from data_loading import add_loader_arguments, dataloaders_from_args
+from distill_model import class_names, data_transforms, export_torchscript
+from model_stats import count_flops, count_parameters, evaluate, measure_latency, print_comparison
+
+CHANNEL_MULTIPLE = 8  # Kept channel counts are rounded up to this for efficient kernels
+
+
+def load_model(path, num_classes):
+    model = models.mobilenet_v2(weights=None)
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, num_classes)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    return model.eval()
+
+
+def _keep_count(channels, ratio):
+    keep = int(round(channels * (1 - ratio)))
+    keep = -(-keep // CHANNEL_MULTIPLE) * CHANNEL_MULTIPLE
+    return max(CHANNEL_MULTIPLE, min(channels, keep))
+
+
+def _slice_conv(conv, out_idx=None, in_idx=None):
+    """New Conv2d with only the given output/input channels (depthwise convs keep groups == channels)"""
+    weight = conv.weight.data
+    if out_idx is not None:
+        weight = weight[out_idx]
+    depthwise = conv.groups == conv.in_channels and conv.groups > 1
+    if in_idx is not None and not depthwise:
+        weight = weight[:, in_idx]
+    out_channels = weight.shape[0]
+    in_channels = out_channels if depthwise else weight.shape[1]
+    new = nn.Conv2d(in_channels, out_channels, conv.kernel_size, conv.stride, conv.padding,
+                    conv.dilation, groups=out_channels if depthwise else conv.groups, bias=conv.bias is not None)
+    new.weight.data = weight.clone()
+    if conv.bias is not None:
+        new.bias.data = conv.bias.data[out_idx if out_idx is not None else slice(None)].clone()
+    return new
+
+
+def _slice_bn(bn, idx):
+    new = nn.BatchNorm2d(len(idx), eps=bn.eps, momentum=bn.momentum)
+    for name in ('weight', 'bias', 'running_mean', 'running_var'):
+        getattr(new, name).data = getattr(bn, name).data[idx].clone()
+    return new
+
+
+def prune_block(block, ratio):
+    """Prune the hidden channels of one InvertedResidual (expand -> depthwise -> project) in place"""
+    layers = block.conv
+    if len(layers) != 4:
+        return  # expand_ratio == 1: no expansion layer to prune
+    expand, depthwise, project, _project_bn = layers
+    hidden = expand[0].out_channels
+    keep = _keep_count(hidden, ratio)
+    if keep >= hidden:
+        return
+    importance = depthwise[1].weight.data.abs() * project.weight.data.abs().sum(dim=(0, 2, 3))
+    idx = torch.sort(torch.topk(importance, keep).indices).values
+    expand[0] = _slice_conv(expand[0], out_idx=idx)
+    expand[1] = _slice_bn(expand[1], idx)
+    depthwise[0] = _slice_conv(depthwise[0], out_idx=idx)
+    depthwise[1] = _slice_bn(depthwise[1], idx)
+    layers[2] = _slice_conv(project, in_idx=idx)
+
+
+def prune_head(model, ratio):
+    """Prune the last 1x1 conv's output channels together with the classifier inputs"""
+    last = model.features[-1]
+    classifier = model.classifier[1]
+    channels = last[0].out_channels
+    keep = _keep_count(channels, ratio)
+    if keep >= channels:
+        return
+    importance = last[1].weight.data.abs() * classifier.weight.data.abs().sum(dim=0)
+    idx = torch.sort(torch.topk(importance, keep).indices).values
+    last[0] = _slice_conv(last[0], out_idx=idx)
+    last[1] = _slice_bn(last[1], idx)
+    new = nn.Linear(keep, classifier.out_features)
+    new.weight.data = classifier.weight.data[:, idx].clone()
+    new.bias.data = classifier.bias.data.clone()
+    model.classifier[1] = new
+
+
+def prune_model(model, ratio):
+    """Physically pruned copy of a MobileNetV2 with about `ratio` of the prunable channels removed"""
+    pruned = copy.deepcopy(model).cpu()
+    for block in pruned.features:
+        if isinstance(block, models.mobilenetv2.InvertedResidual):
+            prune_block(block, ratio)
+    prune_head(pruned, ratio)
+    return pruned.eval()
+
+
+def fine_tune(model, dataloader, device, num_epochs, lr):
+    model = model.to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    for epoch in range(num_epochs):
+        model.train()
+        running_loss = 0.0
+        seen = 0
+        for inputs, labels in dataloader:
+            inputs, labels = inputs.to(device), labels.to(device)
+            optimizer.zero_grad()
+            loss = criterion(model(inputs), labels)
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item() * inputs.size(0)
+            seen += inputs.size(0)
+        print(f'  fine-tune epoch {epoch+1}/{num_epochs} Loss: {running_loss / max(seen, 1):.4f}')
+    return model.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val/test splits")
+    parser.add_argument('--model', default='hall_classifier_raw.pth', help="Trained MobileNetV2 state dict")
+    parser.add_argument('--ratios', type=float, nargs='+', default=[0.25, 0.5, 0.75],
+                        help="Fractions of prunable channels to remove")
+    parser.add_argument('--epochs', type=int, default=3, help="Fine-tuning epochs per ratio")
+    parser.add_argument('--lr', type=float, default=1e-4)
+    parser.add_argument('--output-dir', default='pruned', help="Where the TorchScript models are written")
+    add_loader_arguments(parser)
+    parser.set_defaults(batch_size=16)
+    args = parser.parse_args()
+
+    _image_datasets, dataloaders = dataloaders_from_args(args, args.data_dir, data_transforms, ['train', 'test'])
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    base = load_model(args.model, len(class_names))
+    rows = [('baseline', evaluate(base.to(device), dataloaders['test'], device),
+             count_parameters(base), count_flops(base), measure_latency(base))]
+    for ratio in args.ratios:
+        print(f'Pruning {ratio:.0%} of channels')
+        pruned = prune_model(base, ratio)
+        before = evaluate(pruned.to(device), dataloaders['test'], device)
+        pruned = fine_tune(pruned, dataloaders['train'], device, args.epochs, args.lr)
+        accuracy = evaluate(pruned, dataloaders['test'], device)
+        print(f'  test Acc: {before:.4f} before fine-tuning, {accuracy:.4f} after')
+        path = os.path.join(args.output_dir, f'hall_classifier_pruned_{int(ratio * 100)}.pt')
+        export_torchscript(pruned, path, class_names)
+        rows.append((f'pruned {ratio:.0%}', accuracy, count_parameters(pruned), count_flops(pruned),
+                     measure_latency(pruned)))
+        print(f'  exported {path}')
+    print()
+    print_comparison(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,20 @@
+"""
+Resize the train/val/test image folders in parallel, skipping unchanged files.
 
+Class folders are discovered under each split. JPEG sources are decoded in
+draft mode (the decoder downsamples by a power of two on the fly) before the
+final LANCZOS resize, and images are spread over a process pool. A manifest
+in the output folder records each source's size, mtime and hash plus the
+output settings, so re-runs only process new or modified photos and remove
+outputs whose source is gone.
+
+Usage: python resize_images.py --input . --output dataset_resized --format webp --quality 85
+"""
 from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
 import os
 
 # Define paths and target size
@@ -7,37 +22,126 @@ dataset_dir = ''  # Your dataset folder
 target_size = (224, 224)  # Resize to 224x224
 output_dir = 'dataset_resized'  # New folder for resized images
 
-# Create output directory structure
-def create_output_dirs(input_dir, output_dir):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    for split in ['train', 'val', 'test']:
-        for hall in ['LT1 & 2', 'LT3 & 4']:  # Update with your hall names
-            input_path = os.path.join(input_dir, split, hall)
-            output_path = os.path.join(output_dir, split, hall)
-            if os.path.exists(input_path):
-                if not os.path.exists(output_path):
-                    os.makedirs(output_path)
-
-# Resize images
-def resize_images(input_dir, output_dir, target_size):
-    create_output_dirs(input_dir, output_dir)
-    for split in ['train', 'val', 'test']:
-        for hall in ['LT1 & 2', 'LT3 & 4']:
-            input_path = os.path.join(input_dir, split, hall)
-            output_path = os.path.join(output_dir, split, hall)
-            if os.path.exists(input_path):
-                for filename in os.listdir(input_path):
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                        # Open image
-                        img_path = os.path.join(input_path, filename)
-                        img = Image.open(img_path)
-                        # Resize (use LANCZOS for high-quality resizing)
-                        img_resized = img.resize(target_size, Image.Resampling.LANCZOS)
-                        # Save to output directory
-                        output_file = os.path.join(output_path, filename)
-                        img_resized.save(output_file, quality=95)
-                        print(f'Resized: {img_path} -> {output_file}')
-
-# Run resizing
-resize_images(dataset_dir, output_dir, target_size)
+SPLITS = ['train', 'val', 'test']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+FORMATS = {'same': None, 'jpeg': '.jpg', 'webp': '.webp', 'png': '.png'}
+MANIFEST = '.resize_manifest.json'
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_images(input_dir):
+    """Relative paths of every image under <split>/<class>/"""
+    found = []
+    for split in SPLITS:
+        split_dir = os.path.join(input_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        for hall in sorted(os.listdir(split_dir)):
+            hall_dir = os.path.join(split_dir, hall)
+            if not os.path.isdir(hall_dir):
+                continue
+            for filename in sorted(os.listdir(hall_dir)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    found.append(os.path.join(split, hall, filename))
+    return found
+
+
+def output_name(relative, image_format):
+    extension = FORMATS[image_format]
+    return relative if extension is None else os.path.splitext(relative)[0] + extension
+
+
+# Resize one image (runs in a worker process)
+def resize_image(job):
+    src, dst, size, quality = job
+    with Image.open(src) as img:
+        img.draft('RGB', size)  # JPEG only: decode at the smallest scale still >= size
+        img = img.convert('RGB')
+        # Resize (use LANCZOS for high-quality resizing)
+        img_resized = img.resize(size, Image.Resampling.LANCZOS)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f'{dst}.tmp'
+    ext = os.path.splitext(dst)[1].lower()
+    options = {'quality': quality} if ext in ('.jpg', '.jpeg', '.webp') else {}
+    img_resized.save(tmp, format=Image.registered_extensions()[ext], **options)
+    os.replace(tmp, dst)
+    return dst
+
+
+def load_manifest(path):
+    """(settings, files) of the previous run"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None, {}
+    return manifest.get('settings'), manifest.get('files', {})
+
+
+def resize_images(input_dir, output_dir, target_size, image_format='same', quality=95, workers=None):
+    """Resize new or changed images; returns (resized, unchanged, removed) counts"""
+    settings = {'size': list(target_size), 'format': image_format, 'quality': quality}
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    old_settings, old = load_manifest(manifest_path)
+    reuse = old_settings == settings  # Different size/format/quality invalidates every output
+    files = {}
+    jobs = []
+    for relative in find_images(input_dir):
+        src = os.path.join(input_dir, relative)
+        stat = os.stat(src)
+        entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'output': output_name(relative, image_format)}
+        previous = old.get(relative)
+        output_exists = (reuse and previous is not None
+                         and os.path.exists(os.path.join(output_dir, previous['output'])))
+        if output_exists and previous['size'] == entry['size'] and previous['mtime'] == entry['mtime']:
+            files[relative] = previous
+            continue
+        entry['sha1'] = file_hash(src)
+        files[relative] = entry
+        if output_exists and previous.get('sha1') == entry['sha1']:
+            continue  # Touched but identical (e.g. copied again)
+        jobs.append((src, os.path.join(output_dir, entry['output']), tuple(target_size), quality))
+
+    removed = 0
+    for relative, entry in old.items():
+        if relative not in files or files[relative]['output'] != entry['output']:
+            stale = os.path.join(output_dir, entry['output'])
+            if os.path.exists(stale):
+                os.remove(stale)
+                removed += 1
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for done, _dst in enumerate(pool.map(resize_image, jobs, chunksize=16), 1):
+                if done % 500 == 0:
+                    print(f'Resized {done}/{len(jobs)}')
+
+    os.makedirs(output_dir, exist_ok=True)
+    tmp = f'{manifest_path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'files': files}, f)
+    os.replace(tmp, manifest_path)
+    return len(jobs), len(files) - len(jobs), removed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=dataset_dir, help="Folder with train/val/test/<hall> images")
+    parser.add_argument('--output', default=output_dir)
+    parser.add_argument('--size', type=int, nargs=2, default=list(target_size), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--format', choices=list(FORMATS), default='same', help="Output format (same = keep source's)")
+    parser.add_argument('--quality', type=int, default=95, help="JPEG/WebP quality")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    # Run resizing
+    resized, unchanged, removed = resize_images(args.input, args.output, args.size, args.format, args.quality,
+                                                args.workers)
+    print(f'Resized {resized}, unchanged {unchanged}, removed {removed} -> {args.output}')
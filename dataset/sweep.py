@@ -0,0 +1,176 @@
+"""
+Hyperparameter sweep for the hall classifier.
+
+Trials are sampled from a search space (JSON file mapping each parameter to a
+list of values; see DEFAULT_SPACE) and run in a pool of worker processes.
+Each worker gets a fixed torch thread budget so that workers x threads never
+exceeds the cores. After every epoch a trial reports its validation accuracy;
+from `--warmup` epochs on it is pruned when it falls below the median that
+other trials reached at the same epoch. The best weights of each trial are
+kept as <out>/trial_NNN.pth and all trials are ranked in leaderboard.csv/.json.
+
+Usage: python sweep.py --data-dir dataset_resized --trials 12 --epochs 8 --threads 2
+"""
+import argparse
+import copy
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from data_loading import build_dataloaders, build_datasets, get_transforms
+from train_model import build_model, run_epoch
+
+DEFAULT_SPACE = {
+    'lr': [1e-4, 3e-4, 1e-3, 3e-3],
+    'batch_size': [8, 16, 32],
+    'crop_scale_min': [0.08, 0.5, 0.8],  # Lower bound of RandomResizedCrop's scale
+    'saturation': [0.0, 0.2, 0.4],
+    'trainable_from': [None, 17, 14],  # First trainable feature block (None = only the head trains)
+}
+LEADERBOARD_FIELDS = ['rank', 'trial', 'status', 'best_val_acc', 'best_val_loss', 'epochs', 'seconds', 'artifact',
+                      'params']
+
+
+class MedianPruner:
+    """Shared (across processes) record of val accuracy per epoch; prunes trials below the median"""
+
+    def __init__(self, manager, warmup=2, min_trials=3):
+        self.reports = manager.dict()
+        self.lock = manager.Lock()
+        self.warmup = warmup
+        self.min_trials = min_trials
+
+    def report(self, epoch, val_acc):
+        """Record a trial's accuracy; returns True when the trial should stop"""
+        with self.lock:
+            others = list(self.reports.get(epoch, []))
+            self.reports[epoch] = others + [val_acc]
+        if epoch < self.warmup or len(others) < self.min_trials:
+            return False
+        return val_acc < statistics.median(others)
+
+
+def sample_trials(space, count, seed=0):
+    """Every combination when the grid has at most `count` points, otherwise `count` random distinct ones"""
+    keys = sorted(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+    if len(grid) <= count:
+        return grid
+    return random.Random(seed).sample(grid, count)
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+
+def run_trial(number, params, data_dir, out_dir, num_epochs, pretrained, pruner):
+    """Train one configuration; returns its leaderboard row"""
+    start = time.perf_counter()
+    torch.manual_seed(number)
+    device = torch.device('cpu')
+    transforms = get_transforms(crop_scale=(params['crop_scale_min'], 1.0), saturation=params['saturation'])
+    image_datasets = build_datasets(data_dir, transforms, splits=['train', 'val'])
+    dataloaders = build_dataloaders(image_datasets, params['batch_size'], num_workers=0)
+    model = build_model(device, params['trainable_from'], pretrained)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam([p for p in model.parameters() if p.requires_grad], lr=params['lr'])
+
+    best_acc, best_loss, best_state, status = -1.0, None, None, 'complete'
+    for epoch in range(1, num_epochs + 1):
+        run_epoch(model, criterion, optimizer, dataloaders['train'], device, train=True)
+        val_loss, val_acc, _, _ = run_epoch(model, criterion, optimizer, dataloaders['val'], device, train=False)
+        if val_acc > best_acc:
+            best_acc, best_loss, best_state = val_acc, val_loss, copy.deepcopy(model.state_dict())
+        if epoch < num_epochs and pruner.report(epoch, val_acc):
+            status = 'pruned'
+            break
+    artifact = os.path.join(out_dir, f'trial_{number:03d}.pth')
+    torch.save(best_state, artifact)
+    return {'trial': number, 'status': status, 'best_val_acc': best_acc, 'best_val_loss': best_loss,
+            'epochs': epoch, 'seconds': round(time.perf_counter() - start, 1), 'artifact': artifact,
+            'params': params}
+
+
+def write_leaderboard(out_dir, rows):
+    rows = sorted(rows, key=lambda r: (r['status'] == 'failed', -r['best_val_acc'], r['best_val_loss'] or 0))
+    for rank, row in enumerate(rows, 1):
+        row['rank'] = rank
+    with open(os.path.join(out_dir, 'leaderboard.json'), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2)
+    with open(os.path.join(out_dir, 'leaderboard.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'params': json.dumps(row['params'])})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default='dataset_resized', help="Folder with train/val splits")
+    parser.add_argument('--space', default=None, help="JSON search space (default: DEFAULT_SPACE)")
+    parser.add_argument('--trials', type=int, default=12)
+    parser.add_argument('--epochs', type=int, default=8, help="Maximum epochs per trial")
+    parser.add_argument('--threads', type=int, default=2, help="Torch threads per trial")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel trials (default: cores // threads)")
+    parser.add_argument('--warmup', type=int, default=2, help="Epochs before a trial can be pruned")
+    parser.add_argument('--no-pretrained', action='store_true', help="Start from random weights")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='sweep', help="Artifacts and leaderboard folder")
+    args = parser.parse_args()
+
+    space = DEFAULT_SPACE
+    if args.space:
+        with open(args.space, 'r', encoding='utf-8') as f:
+            space = json.load(f)
+    trials = sample_trials(space, args.trials, args.seed)
+    cores = os.cpu_count() or 1
+    workers = args.workers or max(1, cores // args.threads)
+    if workers * args.threads > cores:
+        print(f'Warning: {workers} workers x {args.threads} threads oversubscribes {cores} cores')
+    os.makedirs(args.out, exist_ok=True)
+    print(f'{len(trials)} trials, {workers} at a time, {args.threads} thread(s) each')
+
+    context = multiprocessing.get_context('spawn')  # Fresh interpreters: no inherited torch thread pools
+    rows = []
+    with context.Manager() as manager:
+        pruner = MedianPruner(manager, warmup=args.warmup)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(args.threads,)) as pool:
+            futures = {pool.submit(run_trial, number, params, args.data_dir, args.out, args.epochs,
+                                   not args.no_pretrained, pruner): (number, params)
+                       for number, params in enumerate(trials)}
+            for future in as_completed(futures):
+                number, params = futures[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    print(f'trial {number} failed: {e}')
+                    row = {'trial': number, 'status': 'failed', 'best_val_acc': -1.0, 'best_val_loss': None,
+                           'epochs': 0, 'seconds': None, 'artifact': None, 'params': params}
+                else:
+                    print(f"trial {number} {row['status']} after {row['epochs']} epoch(s): "
+                          f"val Acc {row['best_val_acc']:.4f} {params}")
+                rows.append(row)
+                write_leaderboard(args.out, list(rows))
+
+    rows = write_leaderboard(args.out, rows)
+    print()
+    print(f"{'rank':<6}{'trial':<7}{'status':<10}{'val acc':>9}  params")
+    for row in rows[:10]:
+        print(f"{row['rank']:<6}{row['trial']:<7}{row['status']:<10}{row['best_val_acc'] * 100:>8.2f}%  "
+              f"{json.dumps(row['params'])}")
+
+
+if __name__ == '__main__':
+    main()
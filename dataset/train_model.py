@@ -1,94 +1,179 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torchvision import datasets, models, transforms
-from torch.utils.data import DataLoader
+from torchvision import models
+import argparse
+import copy
 import os
+import time
+
+from checkpoints import EarlyStopping, load_checkpoint, save_best, save_checkpoint, write_metrics
+from data_loading import add_loader_arguments, dataloaders_from_args, get_transforms
+from feature_cache import load_or_build, train_head
 
-# Define augmentation transforms for training
-data_transforms = {
-    'train': transforms.Compose([
-        transforms.RandomResizedCrop(224, scale=(0.8, 1.0)),  # Random crop and resize to 224x224
-        transforms.RandomHorizontalFlip(p=0.5),  # 50% chance of horizontal flip
-        transforms.RandomRotation(10),  # Rotate up to ±10 degrees
-        transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2),  # Adjust color
-        transforms.ToTensor(),  # Convert to tensor
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])  # ImageNet normalization
-    ]),
-    'val': transforms.Compose([
-        transforms.Resize(256),  # Resize to 256, then crop to 224
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ]),
-    'test': transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ])
-}
-
-# Load datasets
-data_dir = 'dataset_resized'  # Path to resized images (from previous response)
-image_datasets = {x: datasets.ImageFolder(os.path.join(data_dir, x), data_transforms[x])
-                  for x in ['train', 'val', 'test']}
-dataloaders = {x: DataLoader(image_datasets[x], batch_size=8, shuffle=True, num_workers=0)
-               for x in ['train', 'val', 'test']}
-dataset_sizes = {x: len(image_datasets[x]) for x in ['train', 'val', 'test']}
 class_names = ['LT1 & 2', 'LT3 & 4']  # Your hall names
 
-# Load pre-trained model
-model = models.mobilenet_v2(pretrained=True)
-for param in model.parameters():
-    param.requires_grad = False  # Freeze feature layers
-model.classifier[1] = nn.Linear(model.classifier[1].in_features, 2)  # 2 classes
-device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
+# Define augmentation transforms for training
+data_transforms = get_transforms(crop_scale=(0.8, 1.0), saturation=0.2)
+
+
+def build_model(device, trainable_from=None, pretrained=True):
+    """MobileNetV2 with a new head; feature blocks before `trainable_from` stay frozen (None = all frozen)"""
+    # Load pre-trained model
+    model = models.mobilenet_v2(weights=models.MobileNet_V2_Weights.IMAGENET1K_V1 if pretrained else None)
+    for param in model.parameters():
+        param.requires_grad = False  # Freeze feature layers
+    if trainable_from is not None:
+        for param in model.features[trainable_from:].parameters():
+            param.requires_grad = True
+    model.classifier[1] = nn.Linear(model.classifier[1].in_features, len(class_names))
+    return model.to(device)
+
+
+def _sync(device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+
+
+def run_epoch(model, criterion, optimizer, dataloader, device, train):
+    """One pass over a split; returns (loss, acc, data seconds, compute seconds)"""
+    model.train() if train else model.eval()
+    running_loss = 0.0
+    running_corrects = 0
+    seen = 0
+    data_time = compute_time = 0.0
+    end = time.perf_counter()
+    for inputs, labels in dataloader:
+        inputs = inputs.to(device, non_blocking=True)
+        labels = labels.to(device, non_blocking=True)
+        start = time.perf_counter()
+        data_time += start - end  # Waiting on the loader (decode, augment, copy)
+        optimizer.zero_grad()
+        with torch.set_grad_enabled(train):
+            outputs = model(inputs)
+            _, preds = torch.max(outputs, 1)
+            loss = criterion(outputs, labels)
+            if train:
+                loss.backward()
+                optimizer.step()
+        running_loss += loss.item() * inputs.size(0)
+        running_corrects += torch.sum(preds == labels.data).item()
+        seen += inputs.size(0)
+        _sync(device)
+        end = time.perf_counter()
+        compute_time += end - start
+    return running_loss / max(seen, 1), running_corrects / max(seen, 1), data_time, compute_time
 
-# Loss and optimizer
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=0.001)
 
 # Train function
-def train_model(model, criterion, optimizer, num_epochs=10):
-    for epoch in range(num_epochs):
+def train_model(model, criterion, optimizer, dataloaders, device, num_epochs=10, checkpoint_dir=None,
+                checkpoint_every=1, resume=False, patience=None, min_delta=0.0, log_dir=None):
+    """
+    Train with early stopping on validation loss; returns the model with the best validation weights.
+    With `checkpoint_dir`, state is saved every `checkpoint_every` epochs (and when stopping) and
+    `resume` continues from the latest checkpoint. Per-epoch metrics go to `log_dir` (JSON + CSV).
+    """
+    stopper = EarlyStopping(patience, min_delta)
+    best_state, history, start_epoch = copy.deepcopy(model.state_dict()), [], 0
+    if resume and checkpoint_dir:
+        restored = load_checkpoint(checkpoint_dir, model, optimizer, stopper, device)
+        if restored is not None:
+            start_epoch, best_state, history = restored
+            print(f'Resumed from {checkpoint_dir} after epoch {start_epoch}')
+    log_dir = log_dir or checkpoint_dir
+    for epoch in range(start_epoch, num_epochs):
+        if stopper.should_stop:
+            break
         print(f'Epoch {epoch+1}/{num_epochs}')
-        for phase in ['train', 'val']:
-            model.train() if phase == 'train' else model.eval()
-            running_loss = 0.0
-            running_corrects = 0
-            for inputs, labels in dataloaders[phase]:
-                inputs, labels = inputs.to(device), labels.to(device)
-                optimizer.zero_grad()
-                with torch.set_grad_enabled(phase == 'train'):
-                    outputs = model(inputs)
-                    _, preds = torch.max(outputs, 1)
-                    loss = criterion(outputs, labels)
-                    if phase == 'train':
-                        loss.backward()
-                        optimizer.step()
-                running_loss += loss.item() * inputs.size(0)
-                running_corrects += torch.sum(preds == labels.data)
-            epoch_loss = running_loss / dataset_sizes[phase]
-            epoch_acc = running_corrects.double() / dataset_sizes[phase]
-            print(f'{phase} Loss: {epoch_loss:.4f} Acc: {epoch_acc:.4f}')
+        epoch_start = time.perf_counter()
+        train_loss, train_acc, data_time, compute_time = run_epoch(
+            model, criterion, optimizer, dataloaders['train'], device, train=True)
+        val_loss, val_acc, val_data, val_compute = run_epoch(
+            model, criterion, optimizer, dataloaders['val'], device, train=False)
+        print(f'train Loss: {train_loss:.4f} Acc: {train_acc:.4f}')
+        print(f'val Loss: {val_loss:.4f} Acc: {val_acc:.4f}')
+        history.append({
+            'epoch': epoch + 1, 'train_loss': train_loss, 'train_acc': train_acc,
+            'val_loss': val_loss, 'val_acc': val_acc,
+            'data_time': data_time + val_data, 'compute_time': compute_time + val_compute,
+            'epoch_time': time.perf_counter() - epoch_start, 'lr': optimizer.param_groups[0]['lr'],
+        })
+        if stopper.step(val_loss):
+            best_state = copy.deepcopy(model.state_dict())
+            if checkpoint_dir:
+                save_best(checkpoint_dir, best_state)
+        if stopper.should_stop:
+            print(f'Early stopping: val loss has not improved for {stopper.patience} epochs')
+        if checkpoint_dir and ((epoch + 1) % checkpoint_every == 0 or stopper.should_stop or epoch + 1 == num_epochs):
+            save_checkpoint(checkpoint_dir, model, optimizer, epoch + 1, stopper, best_state, history)
+        if log_dir:
+            write_metrics(log_dir, history)
+    model.load_state_dict(best_state)
     return model
 
-if __name__ == '__main__':
-    # Train and save
-    model = train_model(model, criterion, optimizer, num_epochs=10)
-    torch.save(model.state_dict(), 'hall_classifier.pth')
 
-    # Test
+def test_model(model, dataloader, device):
     model.eval()
     correct = 0
     total = 0
     with torch.no_grad():
-        for inputs, labels in dataloaders['test']:
+        for inputs, labels in dataloader:
             inputs, labels = inputs.to(device), labels.to(device)
             outputs = model(inputs)
             _, predicted = torch.max(outputs, 1)
             total += labels.size(0)
             correct += (predicted == labels).sum().item()
     print(f'Test Accuracy: {100 * correct / total:.2f}%')
+
+
+def main(data_dir='dataset_resized', output='hall_classifier.pth', transforms=data_transforms):
+    parser = argparse.ArgumentParser(description="Train the hall classifier head on a frozen MobileNetV2")
+    parser.add_argument('--data-dir', default=data_dir, help="Folder with train/val/test splits")
+    parser.add_argument('--output', default=output, help="Where the trained state dict is saved")
+    parser.add_argument('--cached-features', action='store_true',
+                        help="Extract backbone features once into a memmap store and train the head on them")
+    parser.add_argument('--views', type=int, default=10, help="Augmented views per training image when caching")
+    parser.add_argument('--cache-dir', default='feature_cache', help="Where cached features are kept")
+    parser.add_argument('--epochs', type=int, default=None, help="Epochs (default 10, or 30 with --cached-features)")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="Where last.pt, best.pth and the metric logs are written "
+                             "(default: checkpoints/<output name>; '' to disable)")
+    parser.add_argument('--checkpoint-every', type=int, default=1, help="Epochs between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="Continue from the latest checkpoint")
+    parser.add_argument('--patience', type=int, default=3,
+                        help="Stop after this many epochs without val loss improvement (0 = never)")
+    parser.add_argument('--min-delta', type=float, default=0.0, help="Smallest val loss decrease that counts")
+    parser.add_argument('--log-dir', default=None, help="Metric log folder (default: the checkpoint dir)")
+    add_loader_arguments(parser)
+    args = parser.parse_args()
+    if args.checkpoint_dir is None:
+        # One folder per output model, so --resume never picks up another script's (or model's) state
+        args.checkpoint_dir = os.path.join('checkpoints', os.path.splitext(os.path.basename(args.output))[0])
+
+    # Load datasets
+    image_datasets, dataloaders = dataloaders_from_args(args, args.data_dir, transforms)
+    device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
+    model = build_model(device)
+
+    # Train and save
+    if args.cached_features:
+        train_cache = load_or_build(model, image_datasets['train'], args.cache_dir, 'train', args.views,
+                                    64, device, args.workers)
+        val_cache = load_or_build(model, image_datasets['val'], args.cache_dir, 'val', 1, 64, device, args.workers)
+        model = train_head(model, train_cache, val_cache, num_epochs=args.epochs or 30, device=device)
+    else:
+        # Loss and optimizer
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=0.001)
+        model = train_model(model, criterion, optimizer, dataloaders, device, num_epochs=args.epochs or 10,
+                            checkpoint_dir=args.checkpoint_dir or None, checkpoint_every=args.checkpoint_every,
+                            resume=args.resume, patience=args.patience or None, min_delta=args.min_delta,
+                            log_dir=args.log_dir)
+    torch.save(model.state_dict(), args.output)
+
+    # Test
+    test_model(model, dataloaders['test'], device)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,94 +1,8 @@
-import torch
-import torch.nn as nn
-import torch.optim as optim
-from torchvision import datasets, models, transforms
-from torch.utils.data import DataLoader
-import os
+from data_loading import get_transforms
+from train_model import main
 
-# Define transforms
-data_transforms = {
-    'train': transforms.Compose([
-        transforms.RandomResizedCrop(224), # Random crop and resize to 224x224
-        transforms.RandomHorizontalFlip(),  # 50% chance of horizontal flip
-        transforms.RandomRotation(10),  # Rotate up to ±10 degrees
-        transforms.ColorJitter(brightness=0.2, contrast=0.2),  # Adjust color
-        transforms.ToTensor(),  # Convert to tensor
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])  # ImageNet normalization
-    ]),
-    'val': transforms.Compose([
-        transforms.Resize(256),  # Resize to 256, then crop to 224
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ]),
-    'test': transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ])
-}
-
-# Load datasets
-data_dir = ''  # Your folder path
-image_datasets = {x: datasets.ImageFolder(os.path.join(data_dir, x), data_transforms[x])
-                  for x in ['train', 'val', 'test']}
-dataloaders = {x: DataLoader(image_datasets[x], batch_size=8, shuffle=True, num_workers=0)
-               for x in ['train', 'val', 'test']}
-dataset_sizes = {x: len(image_datasets[x]) for x in ['train', 'val', 'test']}
-class_names = ['LT1 & 2', 'LT3 & 4']  # Update with your hall names
-
-# Load and modify pre-trained model
-model = models.mobilenet_v2(pretrained=True)
-for param in model.parameters():
-    param.requires_grad = False  # Freeze feature layers
-model.classifier[1] = nn.Linear(model.classifier[1].in_features, 2)  # 2 classes
-device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
-
-# Loss and optimizer
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=0.001)
-
-# Train function
-def train_model(model, criterion, optimizer, num_epochs=10):
-    for epoch in range(num_epochs):
-        print(f'Epoch {epoch+1}/{num_epochs}')
-        for phase in ['train', 'val']:
-            model.train() if phase == 'train' else model.eval()
-            running_loss = 0.0
-            running_corrects = 0
-            for inputs, labels in dataloaders[phase]:
-                inputs, labels = inputs.to(device), labels.to(device)
-                optimizer.zero_grad()
-                with torch.set_grad_enabled(phase == 'train'):
-                    outputs = model(inputs)
-                    _, preds = torch.max(outputs, 1)
-                    loss = criterion(outputs, labels)
-                    if phase == 'train':
-                        loss.backward()
-                        optimizer.step()
-                running_loss += loss.item() * inputs.size(0)
-                running_corrects += torch.sum(preds == labels.data)
-            epoch_loss = running_loss / dataset_sizes[phase]
-            epoch_acc = running_corrects.double() / dataset_sizes[phase]
-            print(f'{phase} Loss: {epoch_loss:.4f} Acc: {epoch_acc:.4f}')
-    return model
+# Define transforms (full-range random crops, no saturation jitter)
+data_transforms = get_transforms(crop_scale=(0.08, 1.0), saturation=0)
 
 if __name__ == '__main__':
-    # Train and save
-    model = train_model(model, criterion, optimizer, num_epochs=10)
-    torch.save(model.state_dict(), 'hall_classifier_raw.pth')
-
-    # Test
-    model.eval()
-    correct = 0
-    total = 0
-    with torch.no_grad():
-        for inputs, labels in dataloaders['test']:
-            inputs, labels = inputs.to(device), labels.to(device)
-            outputs = model(inputs)
-            _, predicted = torch.max(outputs, 1)
-            total += labels.size(0)
-            correct += (predicted == labels).sum().item()
-    print(f'Test Accuracy: {100 * correct / total:.2f}%')
+    main(data_dir='', output='hall_classifier_raw.pth', transforms=data_transforms)
@@ -2,9 +2,11 @@ import streamlit as st
 import requests
 from PIL import Image
 import io
-from lib.image_capture import process_uploaded_image
+from lib.image_capture import prepare_upload, process_uploaded_image
 import numpy as np
 from lib.navigation import compute_route, get_turn_by_turn, get_coordinates, HALL_LOCATIONS
+from lib.schedule_client import fetch_schedule, schedule_to_dataframe
+from lib import api_client
 import pandas as pd
 
 # ---------- Styling ----------
@@ -24,6 +26,7 @@ st.markdown(
 
 # ---------- Helpers ----------
 def parse_schedule(schedule_text: str) -> pd.DataFrame:
+    # Fallback for servers that only return the joined schedule string
     if not schedule_text or schedule_text == "No schedule found":
         return pd.DataFrame(columns=["Start-End", "Course"])
     entries = [seg.strip() for seg in schedule_text.split(";") if seg.strip()]
@@ -41,6 +44,7 @@ st.session_state.setdefault("uploaded_image_bytes", None)
 st.session_state.setdefault("processed_display_image", None)
 st.session_state.setdefault("recognition_result", None)
 st.session_state.setdefault("offline", False)
+st.session_state.setdefault("schedule_cache", {})
 
 # ---------- Header ----------
 st.markdown("<h1 class='title'>HallNav: Hall Recognition</h1>", unsafe_allow_html=True)
@@ -85,19 +89,19 @@ with scan_col:
             st.markdown("<div class='alert-error'>No image selected. Please upload an image.</div>", unsafe_allow_html=True)
         else:
             try:
-                st.session_state.offline = False
-                buf = io.BytesIO(st.session_state.uploaded_image_bytes)
-                
-                # Ensure we have a proper filename with extension
-                filename = uploaded_file.name if uploaded_file.name else "uploaded_image.jpg"
-                if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff')):
-                    filename += ".jpg"  # Default to .jpg if no extension
-                
-                files = {"file": (filename, buf, "image/jpeg")}
+                # Downscaled, metadata-free copy; filename and MIME type match the format actually sent
+                data, filename, mime = prepare_upload(
+                    st.session_state.uploaded_image_bytes,
+                    uploaded_file.name if uploaded_file is not None else "uploaded_image",
+                )
+                files = {"file": (filename, io.BytesIO(data), mime)}
+                # Approximate device position (?lat=&lon= in the URL) lets the backend rule out distant halls
+                location = {key: st.query_params[key] for key in ("lat", "lon") if key in st.query_params}
                 with st.spinner("Recognizing..."):
-                    response = requests.post(
-                        "http://127.0.0.1:8000/api/recognize_hall/",
+                    response = api_client.post(
+                        "api/recognize_hall/",
                         files=files,
+                        data=location if len(location) == 2 else None,
                         timeout=30,
                     )
                 if response.status_code == 200:
@@ -123,11 +127,13 @@ with scan_col:
                             st.markdown(f"<div class='alert-error'>{error_message}</div>", unsafe_allow_html=True)
                     except:
                         st.markdown("<div class='alert-error'>Recognition failed. Please try another image.</div>", unsafe_allow_html=True)
-            except Exception as e:
-                # Mark offline if API cannot be reached
-                st.session_state.offline = True
+            except requests.RequestException as e:
+                # api_client has marked the session offline (request failed or circuit open)
                 st.session_state.recognition_result = None
                 st.markdown(f"<div class='alert-error'>Error contacting recognition service: {e}</div>", unsafe_allow_html=True)
+            except Exception as e:
+                st.session_state.recognition_result = None
+                st.markdown(f"<div class='alert-error'>Recognition failed: {e}</div>", unsafe_allow_html=True)
 
 # ---------- 2. Results Screen ----------
 st.header("2. Results Screen")
@@ -145,8 +151,16 @@ if st.session_state.recognition_result:
         unsafe_allow_html=True,
     )
 
-    # Schedule table or text
-    df_schedule = parse_schedule(schedule_text)
+    # Schedule table or text (structured endpoint, revalidated by ETag)
+    df_schedule = None
+    schedule_url = st.session_state.recognition_result.get("schedule_url")
+    if schedule_url:
+        try:
+            df_schedule = schedule_to_dataframe(fetch_schedule(schedule_url, st.session_state.schedule_cache, get=api_client.get))
+        except requests.RequestException:
+            df_schedule = None
+    if df_schedule is None:
+        df_schedule = parse_schedule(schedule_text)
     if not df_schedule.empty:
         st.dataframe(df_schedule, use_container_width=True, height=300)
     else:
@@ -175,13 +189,14 @@ with col2:
     # If we have a recognized hall, preselect as destination when available
     default_dest = hall_names.index(st.session_state.recognition_result["hall_id"]) if st.session_state.get("recognition_result") and st.session_state.recognition_result.get("hall_id") in hall_names else 0
     end_hall = st.selectbox("Destination Hall", hall_names, index=default_dest, key="end")
+step_free = st.checkbox("Step-free route (avoid stairs)", key="step_free")
 
 if st.button("Show Route"):
     if start_hall == end_hall:
         st.info("You are already at your destination.")
     else:
         try:
-            route = compute_route(start_hall, end_hall)
+            route = compute_route(start_hall, end_hall, accessible=step_free)
             directions = get_turn_by_turn(route)
             coords = get_coordinates(route)
 
@@ -201,4 +216,8 @@ if st.button("Show Route"):
 
 st.caption("Accessibility: All controls are keyboard and screen reader friendly.")
 
+# Per-call API latencies and circuit state (?debug=1 in the URL)
+if st.query_params.get("debug") == "1":
+    api_client.render_debug_panel()
+
 st.markdown("</div>", unsafe_allow_html=True)
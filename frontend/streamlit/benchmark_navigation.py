@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark precomputed route-table walks against on-demand search.
+
+Builds a synthetic campus (a jittered grid of corridors with named halls),
+then times:
+  - route queries: table walk vs ALT A* vs plain Dijkstra
+  - one edge change: incremental table update vs full rebuild
+and checks that every strategy returns the same distances.
+
+Usage: python benchmark_navigation.py [--grid 60] [--halls 200] [--queries 500]
+"""
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from lib.campus_graph import CampusGraph
+from lib.route_table import RouteTable
+
+
+def build_campus(grid, halls, seed=0):
+    rng = random.Random(seed)
+    graph = CampusGraph()
+    for i in range(grid):
+        for j in range(grid):
+            graph.add_node(f"J{i}_{j}", (i + rng.random() * 0.4, j + rng.random() * 0.4))
+    for i in range(grid):
+        for j in range(grid):
+            if i + 1 < grid and rng.random() < 0.85:
+                graph.add_edge(f"J{i}_{j}", f"J{i + 1}_{j}")
+            if j + 1 < grid and rng.random() < 0.85:
+                graph.add_edge(f"J{i}_{j}", f"J{i}_{j + 1}", kind="path")
+    for h in range(halls):
+        i, j = rng.randrange(grid), rng.randrange(grid)
+        graph.add_node(f"Hall_{h}", (i + 0.5, j + 0.5), "hall")
+        graph.add_edge(f"Hall_{h}", f"J{i}_{j}")
+    return graph.freeze()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid", type=int, default=60, help="Junction grid side length")
+    parser.add_argument("--halls", type=int, default=200, help="Number of named halls")
+    parser.add_argument("--queries", type=int, default=500, help="Random hall-to-hall queries")
+    parser.add_argument("--updates", type=int, default=20, help="Random single-edge updates")
+    args = parser.parse_args()
+
+    graph = build_campus(args.grid, args.halls)
+    halls = list(graph.named_locations())
+    print(f"Campus: {len(graph)} nodes, {len(graph.edges)} edges, {len(halls)} named locations")
+
+    table, build_time = timed(RouteTable, graph, halls)
+    size_kb = (table.dist.nbytes + table.pred.nbytes) / 1024
+    print(f"Route table build: {build_time * 1000:.1f} ms ({size_kb:.0f} KiB, pred {table.pred.dtype})")
+
+    rng = random.Random(1)
+    pairs = [tuple(rng.sample(halls, 2)) for _ in range(args.queries)]
+    timings = {"table walk": 0.0, "ALT A*": 0.0, "Dijkstra": 0.0}
+    for start, end in pairs:
+        s, t = graph.index[start], graph.index[end]
+        (_route, walk), dt = timed(table.route, start, end)
+        timings["table walk"] += dt
+        (_path, astar), dt = timed(graph.astar, s, t)
+        timings["ALT A*"] += dt
+        (dist, _pred), dt = timed(graph.dijkstra, s)
+        timings["Dijkstra"] += dt
+        assert math.isclose(walk, astar, rel_tol=1e-5) and math.isclose(astar, dist[t], rel_tol=1e-9)
+    print(f"\n{'query strategy':<16}{'mean (us)':>12}")
+    for name, total in timings.items():
+        print(f"{name:<16}{total / len(pairs) * 1e6:>12.1f}")
+
+    edges = list(graph.edges)
+    incremental = rebuild = 0.0
+    entries = 0
+    for _ in range(args.updates):
+        u, v = edges[rng.randrange(len(edges))]
+        a, b = graph.names[u], graph.names[v]
+        old = graph.edges[(u, v)][0]
+        new = old * rng.choice([0.3, 3.0])
+        graph.set_edge_weight(a, b, new)
+        n, dt = timed(table.update_edge, a, b, old, new)
+        incremental += dt
+        entries += n
+        fresh, dt = timed(RouteTable, graph, halls)
+        rebuild += dt
+        assert np.allclose(table.dist, fresh.dist, rtol=1e-5, equal_nan=True)
+    print(f"\n{'edge update':<16}{'mean (ms)':>12}")
+    print(f"{'incremental':<16}{incremental / args.updates * 1000:>12.2f}   ({entries / args.updates:.0f} of {table.dist.size} entries)")
+    print(f"{'full rebuild':<16}{rebuild / args.updates * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Measure what client-side downscaling saves per recognition request.
+
+For each image (synthetic 12 MP phone-style JPEGs with EXIF when none are
+given) compares the upload as picked against prepare_upload()'s copy:
+  - bytes on the wire and client-side preparation time
+  - decode time of the server's Image.open(...).convert("RGB") step
+  - with --url: end-to-end request latency and the server's own decode /
+    inference times (Server-Timing header of /api/recognize_hall/)
+
+Usage: python benchmark_upload.py [IMAGE ...] [--runs 10] [--url http://127.0.0.1:8000/api/recognize_hall/]
+"""
+import argparse
+import io
+import os
+import re
+import statistics
+import time
+
+import numpy as np
+import requests
+from PIL import Image
+
+from lib.image_capture import prepare_upload
+
+
+def synthetic_photo(width, height, seed):
+    """Smooth gradients plus sensor-like noise, saved as a high-quality JPEG with EXIF"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        128 + 100 * np.sin(x / (width / (3 + c)) + y / (height / (2 + c)) + c) for c in range(3)
+    ], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    exif = Image.Exif()
+    exif[0x010F] = "HallNav benchmark"  # Make
+    exif[0x0112] = 1  # Orientation
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def server_decode(data):
+    start = time.perf_counter()
+    Image.open(io.BytesIO(data)).convert("RGB")
+    return (time.perf_counter() - start) * 1000
+
+
+def server_timing(response):
+    """{metric: ms} from a Server-Timing header"""
+    header = response.headers.get("Server-Timing", "")
+    return {name: float(ms) for name, ms in re.findall(r"(\w+);dur=([\d.]+)", header)}
+
+
+def post(url, filename, data, mime):
+    start = time.perf_counter()
+    response = requests.post(url, files={"file": (filename, io.BytesIO(data), mime)}, timeout=60)
+    return response, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="Image files (default: synthetic 4032x3024 JPEGs)")
+    parser.add_argument("--synthetic", type=int, default=3, help="Synthetic images when none are given")
+    parser.add_argument("--runs", type=int, default=10, help="Repetitions per image and variant")
+    parser.add_argument("--url", default=None, help="recognize_hall endpoint for end-to-end timings")
+    args = parser.parse_args()
+
+    if args.images:
+        uploads = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                uploads.append((os.path.basename(path), f.read()))
+    else:
+        uploads = [(f"synthetic_{i}.jpg", synthetic_photo(4032, 3024, i)) for i in range(args.synthetic)]
+
+    rows = {"as picked": [], "prepared": []}
+    for name, raw in uploads:
+        prepared, elapsed = None, []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            prepared = prepare_upload(raw, name)
+            elapsed.append((time.perf_counter() - start) * 1000)
+        mime = Image.MIME.get(Image.open(io.BytesIO(raw)).format, "application/octet-stream")
+        variants = {"as picked": ((raw, name, mime), 0.0), "prepared": (prepared, statistics.median(elapsed))}
+        for label, ((data, filename, mime), prepare_ms) in variants.items():
+            row = {
+                "kb": len(data) / 1024,
+                "prepare_ms": prepare_ms,
+                "decode_ms": statistics.median(server_decode(data) for _ in range(args.runs)),
+            }
+            if args.url:
+                latencies, decodes = [], []
+                for _ in range(args.runs):
+                    response, latency = post(args.url, filename, data, mime)
+                    latencies.append(latency + prepare_ms)
+                    decodes.append(server_timing(response).get("decode", float("nan")))
+                row["latency_ms"] = statistics.median(latencies)
+                row["server_decode_ms"] = statistics.median(decodes)
+                row["status"] = response.status_code
+            rows[label].append(row)
+        print(f"{name}: {Image.open(io.BytesIO(raw)).size} {len(raw) / 1024:.0f} KiB -> "
+              f"{Image.open(io.BytesIO(prepared[0])).size} {len(prepared[0]) / 1024:.0f} KiB "
+              f"({prepared[2]})")
+
+    columns = ["kb", "prepare_ms", "decode_ms"] + (["latency_ms", "server_decode_ms"] if args.url else [])
+    print(f"\n{'median per image':<18}" + "".join(f"{c:>18}" for c in columns))
+    for label, measured in rows.items():
+        print(f"{label:<18}" + "".join(f"{statistics.median(r[c] for r in measured):>18.1f}" for c in columns))
+    before, after = rows["as picked"], rows["prepared"]
+    saved = [f"{1 - sum(r['kb'] for r in after) / sum(r['kb'] for r in before):.1%} of upload bytes"]
+    for column, label in (("decode_ms", "decode time"), ("latency_ms", "end-to-end latency")):
+        if column in columns:
+            saved.append(f"{1 - sum(r[column] for r in after) / sum(r[column] for r in before):.1%} of {label}")
+    print("\nSaved: " + ", ".join(saved))
+    if args.url and any(r["status"] != 200 for r in before + after):
+        print("Note: some requests were rejected (non-200); latencies include the error path")
+
+
+if __name__ == "__main__":
+    main()
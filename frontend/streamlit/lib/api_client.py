@@ -0,0 +1,230 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import pandas as pd
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+API_BASE_URL = os.environ.get("HALLNAV_API_URL", "http://127.0.0.1:8000").rstrip("/") + "/"
+CONNECT_TIMEOUT = float(os.environ.get("HALLNAV_API_CONNECT_TIMEOUT", "2"))  # Unreachable server -> fail fast
+POOL_SIZE = 10  # Keep-alive connections per host, shared by every browser session of this process
+RETRIES = 2  # Extra attempts for idempotent calls
+BACKOFF_SECONDS = 0.25  # Base of the exponential backoff; each wait is drawn uniformly from [0, base * 2^n]
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+BREAKER_FAILURES = 3  # Consecutive failed calls that open the circuit
+BREAKER_RESET_SECONDS = 15.0  # Open circuit lets one trial call through after this long
+LOG_SIZE = 50  # Calls kept per browser session for the debug panel
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without contacting the server while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After BREAKER_FAILURES consecutive failures it opens and calls
+    fail immediately; once `reset_after` seconds have passed one trial call is let through
+    (half-open), which closes the circuit on success and re-opens it on failure.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failures
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in the half-open state only one at a time"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_after or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            self._trial = False
+            if success:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ApiClient:
+    """
+    HallNav API client: one pooled keep-alive session, retries with jittered exponential
+    backoff for idempotent calls (connection errors, timeouts, 502/503/504) and a circuit
+    breaker so an unreachable server is reported at once instead of after every timeout.
+    """
+
+    def __init__(self, base_url: str = API_BASE_URL, pool_size: int = POOL_SIZE, retries: int = RETRIES,
+                 backoff: float = BACKOFF_SECONDS, connect_timeout: float = CONNECT_TIMEOUT,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.retries = retries
+        self.backoff = backoff
+        self.connect_timeout = connect_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        """Absolute URL for an API path ("api/halls/nearest/"); absolute URLs are kept as they are"""
+        return urljoin(self.base_url, path.lstrip("/")) if not urlsplit(path).scheme else path
+
+    def request(self, method: str, path: str, timeout: float = 10, idempotent: Optional[bool] = None,
+                log: Optional[Deque[dict]] = None, **kwargs) -> requests.Response:
+        """
+        Sends one API call.
+        Args:
+            method (str): HTTP method.
+            path (str): API path relative to the base URL, or an absolute URL.
+            timeout (float): Read timeout in seconds (the connect timeout is always `connect_timeout`).
+            idempotent (bool): Whether the call may be retried; defaults to True for GET/HEAD/OPTIONS/PUT/DELETE.
+            log (deque): Receives a record of the call (method, path, status, attempts, ms, error).
+            **kwargs: Passed to requests (params, data, files, headers...).
+        Returns:
+            requests.Response: The last response, whatever its status.
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            requests.RequestException: If every attempt failed to get a response.
+        """
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if idempotent else 0)
+        record = {"time": time.strftime("%H:%M:%S"), "method": method, "path": urlsplit(self.url(path)).path,
+                  "status": None, "attempts": 0, "ms": 0.0, "error": None}
+        start = time.perf_counter()
+        try:
+            for attempt in range(attempts):
+                if not self.breaker.allow():
+                    raise CircuitOpenError(
+                        f"API unavailable (circuit open, next try within {self.breaker.reset_after:.0f}s)")
+                if attempt:
+                    time.sleep(random.uniform(0, self.backoff * 2 ** attempt))  # Full jitter
+                    for f in (kwargs.get("files") or {}).values():  # Rewind uploads for the next attempt
+                        stream = f[1] if isinstance(f, tuple) else f
+                        if hasattr(stream, "seek"):
+                            stream.seek(0)
+                record["attempts"] = attempt + 1
+                success = False
+                try:
+                    response = self.session.request(method, self.url(path), timeout=(self.connect_timeout, timeout),
+                                                    **kwargs)
+                    success = response.status_code not in RETRY_STATUSES
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt + 1 == attempts:
+                        raise
+                    continue
+                finally:
+                    # Whatever happened (other errors included) ends a half-open trial
+                    self.breaker.record(success)
+                record["status"] = response.status_code
+                if response.status_code not in RETRY_STATUSES or attempt + 1 == attempts:
+                    return response
+        except requests.RequestException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            if log is not None:
+                log.append(record)
+
+
+def latency_summary(calls: List[dict]) -> Dict[str, Tuple[int, float, float]]:
+    """
+    Summarises logged calls per endpoint.
+    Args:
+        calls (List[dict]): Records as appended by ApiClient.request.
+    Returns:
+        Dict[str, Tuple[int, float, float]]: "METHOD path" -> (calls, median ms, p95 ms).
+    """
+    by_endpoint: Dict[str, List[float]] = {}
+    for entry in calls:
+        by_endpoint.setdefault(f"{entry['method']} {entry['path']}", []).append(entry["ms"])
+    summary = {}
+    for endpoint, timings in by_endpoint.items():
+        timings.sort()
+        summary[endpoint] = (len(timings), timings[len(timings) // 2],
+                             timings[min(len(timings) - 1, int(len(timings) * 0.95))])
+    return summary
+
+
+# ---------- Streamlit glue ----------
+@st.cache_resource
+def _shared_client(base_url: str) -> ApiClient:
+    return ApiClient(base_url)
+
+
+def get_client() -> ApiClient:
+    """The process-wide client (one connection pool and breaker for all browser sessions)"""
+    return _shared_client(API_BASE_URL)
+
+
+def call(method: str, path: str, **kwargs) -> requests.Response:
+    """
+    ApiClient.request with the shared client that also logs the call in this session and keeps
+    st.session_state.offline in step with the server's reachability.
+    """
+    client = get_client()
+    log = st.session_state.setdefault("api_calls", deque(maxlen=LOG_SIZE))
+    try:
+        response = client.request(method, path, log=log, **kwargs)
+    except requests.RequestException:
+        st.session_state.offline = True
+        raise
+    st.session_state.offline = client.breaker.is_open
+    return response
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return call("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return call("POST", path, **kwargs)
+
+
+def render_debug_panel() -> None:
+    """Expander with the API base URL, breaker state and this session's recent call latencies"""
+    client = get_client()
+    calls = list(st.session_state.get("api_calls", []))
+    with st.expander("API debug"):
+        st.write(f"Base URL: `{client.base_url}` · circuit: **{client.breaker.state}** "
+                 f"({client.breaker.failures} consecutive failures)")
+        if not calls:
+            st.write("No API calls yet.")
+            return
+        summary = latency_summary(calls)
+        st.dataframe(pd.DataFrame(
+            [{"Endpoint": endpoint, "Calls": n, "Median ms": median, "p95 ms": p95}
+             for endpoint, (n, median, p95) in summary.items()]
+        ), use_container_width=True)
+        st.dataframe(pd.DataFrame(reversed(calls)), use_container_width=True, height=240)
@@ -0,0 +1,206 @@
+import heapq
+import math
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .campus_graph import CampusGraph, TRANSITION_KINDS
+except ImportError:  # imported as a top-level module
+    from campus_graph import CampusGraph, TRANSITION_KINDS
+
+# Edge kinds each routing profile refuses to use
+PROFILES: Dict[str, FrozenSet[str]] = {
+    "default": frozenset(),
+    "accessible": frozenset({"stairs"}),
+}
+
+Layer = Tuple[Optional[str], int]
+
+
+class _LayerTable:
+    """Distances and predecessors from each portal of one (building, floor) layer to every node in it."""
+
+    def __init__(self, nodes: List[int], portals: List[int], adjacency: List[List[Tuple[int, float]]]):
+        self.nodes = nodes
+        self.local = {node: i for i, node in enumerate(nodes)}
+        self.portals = portals
+        self.portal_row = {portal: i for i, portal in enumerate(portals)}
+        self.dist = np.full((len(portals), len(nodes)), np.inf)
+        self.pred = np.full((len(portals), len(nodes)), -1, dtype=np.int32)
+        for row, portal in enumerate(portals):
+            dist, pred = _dijkstra_local(adjacency, portal, self.local)
+            self.dist[row] = dist
+            self.pred[row] = pred
+
+    def path_from_portal(self, portal: int, node: int) -> List[int]:
+        """Global node ids from `portal` to `node` inside the layer."""
+        pred = self.pred[self.portal_row[portal]]
+        path = [node]
+        while path[-1] != portal:
+            prev = pred[self.local[path[-1]]]
+            if prev < 0:
+                return []
+            path.append(self.nodes[prev])
+        return path[::-1]
+
+
+def _dijkstra_local(adjacency, source, local):
+    """Dijkstra over a layer; returns distances and predecessors indexed by local position."""
+    dist = np.full(len(local), np.inf)
+    pred = np.full(len(local), -1, dtype=np.int32)
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > best[u]:
+            continue
+        dist[local[u]] = d
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < best.get(v, math.inf):
+                best[v] = nd
+                pred[local[v]] = local[u]
+                heapq.heappush(heap, (nd, v))
+    return dist, pred
+
+
+class LayeredRouter:
+    """
+    Floor-aware router over a CampusGraph.
+
+    Nodes are grouped into (building, floor) layers. Corridor/path edges inside a
+    layer are searched directly; stairs/elevator/ramp edges and edges that leave a
+    layer become transitions between "portal" nodes. For every layer the
+    portal-to-node distance matrix is precomputed once, and for every profile the
+    portal-to-portal table over the whole campus, so a multi-floor or
+    multi-building route is assembled from cached pieces with one vectorized
+    lookup instead of a campus-wide search.
+    """
+
+    def __init__(self, graph: CampusGraph):
+        self.graph = graph
+        layer_of = [graph.layer(node) for node in range(len(graph))]
+        self.layer_of = layer_of
+
+        # Split edges into in-layer adjacency and transitions
+        self.layer_adjacency: List[List[Tuple[int, float]]] = [[] for _ in range(len(graph))]
+        self.transitions: List[Tuple[int, int, float, str]] = []
+        for (u, v), (weight, kind) in graph.edges.items():
+            if kind in TRANSITION_KINDS or layer_of[u] != layer_of[v]:
+                self.transitions.append((u, v, weight, kind))
+            else:
+                self.layer_adjacency[u].append((v, weight))
+                self.layer_adjacency[v].append((u, weight))
+
+        members: Dict[Layer, List[int]] = {}
+        for node, layer in enumerate(layer_of):
+            members.setdefault(layer, []).append(node)
+        portal_set = {node for u, v, _w, _k in self.transitions for node in (u, v)}
+        self.layers: Dict[Layer, _LayerTable] = {
+            layer: _LayerTable(nodes, [n for n in nodes if n in portal_set], self.layer_adjacency)
+            for layer, nodes in members.items()
+        }
+        self.portals = sorted(portal_set)
+        self.portal_index = {portal: i for i, portal in enumerate(self.portals)}
+        self._overlays: Dict[str, Tuple[np.ndarray, np.ndarray, Dict[Tuple[int, int], str]]] = {}
+
+    # ---------- Portal overlay ----------
+    def _overlay(self, profile: str):
+        """All-pairs portal distances/predecessors for a profile, computed on first use."""
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown routing profile '{profile}'. Expected one of: {', '.join(PROFILES)}")
+        if profile in self._overlays:
+            return self._overlays[profile]
+        excluded = PROFILES[profile]
+        n = len(self.portals)
+        adjacency: List[Dict[int, Tuple[float, str]]] = [{} for _ in range(n)]
+
+        def link(a, b, weight, via):
+            if weight < adjacency[a].get(b, (math.inf, None))[0]:
+                adjacency[a][b] = (weight, via)
+                adjacency[b][a] = (weight, via)
+
+        for table in self.layers.values():
+            for i, p in enumerate(table.portals):
+                for q in table.portals[i + 1:]:
+                    weight = table.dist[i, table.local[q]]
+                    if np.isfinite(weight):
+                        link(self.portal_index[p], self.portal_index[q], float(weight), "layer")
+        for u, v, weight, kind in self.transitions:
+            if kind not in excluded:
+                link(self.portal_index[u], self.portal_index[v], weight, kind)
+
+        dist = np.full((n, n), np.inf)
+        pred = np.full((n, n), -1, dtype=np.int32)
+        for source in range(n):
+            dist[source, source] = 0.0
+            heap = [(0.0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[source, u]:
+                    continue
+                for v, (w, _via) in adjacency[u].items():
+                    nd = d + w
+                    if nd < dist[source, v]:
+                        dist[source, v] = nd
+                        pred[source, v] = u
+                        heapq.heappush(heap, (nd, v))
+        hops = {(a, b): via for a in range(n) for b, (_w, via) in adjacency[a].items()}
+        self._overlays[profile] = (dist, pred, hops)
+        return self._overlays[profile]
+
+    def _expand_portals(self, profile: str, first: int, last: int) -> List[int]:
+        """Global node path between two portals, expanding in-layer hops from the layer tables."""
+        dist, pred, hops = self._overlay(profile)
+        a, b = self.portal_index[first], self.portal_index[last]
+        chain = [b]
+        while chain[-1] != a:
+            chain.append(int(pred[a, chain[-1]]))
+        chain = [self.portals[i] for i in reversed(chain)]
+        path = [chain[0]]
+        for p, q in zip(chain, chain[1:]):
+            if hops[(self.portal_index[p], self.portal_index[q])] == "layer":
+                path.extend(self.layers[self.layer_of[p]].path_from_portal(p, q)[1:])
+            else:
+                path.append(q)
+        return path
+
+    # ---------- Queries ----------
+    def shortest_path(self, start: str, end: str, profile: str = "default") -> Tuple[List[str], float]:
+        """
+        Shortest path between two named nodes under a routing profile.
+        Returns:
+            (route, distance): node names from start to end and the total weight.
+        Raises:
+            ValueError: If either node or the profile is unknown, or no path exists.
+        """
+        graph = self.graph
+        if start not in graph.index or end not in graph.index:
+            raise ValueError("Invalid start or end location.")
+        s, t = graph.index[start], graph.index[end]
+        best_path, best = [], math.inf
+
+        # Staying inside one layer never needs a transition
+        if self.layer_of[s] == self.layer_of[t]:
+            best_path, best = graph.astar(s, t, self.layer_adjacency)
+
+        source_table, target_table = self.layers[self.layer_of[s]], self.layers[self.layer_of[t]]
+        if source_table.portals and target_table.portals:
+            dist, _pred, _hops = self._overlay(profile)
+            to_source = source_table.dist[:, source_table.local[s]]
+            to_target = target_table.dist[:, target_table.local[t]]
+            rows = [self.portal_index[p] for p in source_table.portals]
+            cols = [self.portal_index[p] for p in target_table.portals]
+            total = to_source[:, None] + dist[np.ix_(rows, cols)] + to_target[None, :]
+            i, j = np.unravel_index(np.argmin(total), total.shape)
+            if total[i, j] < best:
+                p, q = source_table.portals[i], target_table.portals[j]
+                best = float(total[i, j])
+                best_path = (source_table.path_from_portal(p, s)[::-1]
+                             + self._expand_portals(profile, p, q)[1:]
+                             + target_table.path_from_portal(q, t)[1:])
+
+        if not best_path:
+            raise ValueError(f"No route between {start} and {end}.")
+        return [graph.names[i] for i in best_path], best
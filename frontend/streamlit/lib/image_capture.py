@@ -1,5 +1,13 @@
+import io
+import os
+
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps
+
+UPLOAD_SHORT_SIDE = 256  # The server scales to a 256 px short side before its 224 px crop
+UPLOAD_JPEG_QUALITY = 85
+LOSSLESS_FORMATS = {'PNG'}  # Kept lossless; every other format is sent as JPEG
+MIN_UPLOAD_BYTES = 1024  # The server rejects smaller files; such results are replaced by the original
 
 
 def process_uploaded_image(uploaded_file):
@@ -20,3 +28,50 @@ def process_uploaded_image(uploaded_file):
         return image_array
     except Exception as e:
         raise ValueError(f"Invalid image file: {e}")
+
+
+def prepare_upload(data, filename="uploaded_image", short_side=UPLOAD_SHORT_SIDE, quality=UPLOAD_JPEG_QUALITY):
+    """
+    Shrinks an image for the recognition API: applies the EXIF orientation, downscales so the
+    short side is `short_side` (never upscales), drops all metadata and re-encodes it. When the
+    result would be under MIN_UPLOAD_BYTES the original bytes are returned unchanged.
+    Args:
+        data: Encoded image bytes as uploaded
+        filename: Original filename; its stem is kept, the extension follows the encoded format
+        short_side: Target length of the shorter side in pixels
+        quality: JPEG quality (1-95)
+    Returns:
+        tuple: (bytes, filename, MIME type) ready for a multipart `files` entry
+    Raises:
+        ValueError: If the data is not a valid image.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        if source_format == 'JPEG':
+            image.draft('RGB', (short_side, short_side))  # Decode at a reduced scale, still >= short_side
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        raise ValueError(f"Invalid image file: {e}")
+
+    scale = short_side / min(image.size)
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    out = io.BytesIO()
+    stem = os.path.splitext(os.path.basename(filename or ""))[0] or "uploaded_image"
+    # A fresh save without exif/icc_profile/pnginfo arguments carries no metadata over
+    if source_format in LOSSLESS_FORMATS:
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        image.save(out, format='PNG', optimize=True)
+        prepared = out.getvalue(), f"{stem}.png", "image/png"
+    else:
+        image.convert('RGB').save(out, format='JPEG', quality=quality, optimize=True)
+        prepared = out.getvalue(), f"{stem}.jpg", "image/jpeg"
+    if len(prepared[0]) < MIN_UPLOAD_BYTES:
+        # Small, flat images compress below the server's size floor; send them as picked
+        name = filename if os.path.splitext(filename or "")[1] else f"{stem}.{source_format.lower()}"
+        return data, name, Image.MIME.get(source_format, "application/octet-stream")
+    return prepared
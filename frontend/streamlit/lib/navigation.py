@@ -1,56 +1,237 @@
-from typing import List, Tuple, Union
-
-# Static hall locations for now (will be updated to use database later)
-HALL_LOCATIONS = {
-    "Entrance": (0, 0),
-    "Hall_A101": (1, 2),
-    "Hall_B202": (3, 5),
-    "Library": (5, 1),
-}
-
-def get_hall_locations_from_db():
-    """Get hall locations from Django database (for future use)"""
-    # This function can be called explicitly when needed
-    # rather than at import time
-    try:
-        import sys
-        import os
-        sys.path.append(os.path.join(os.path.dirname(__file__), 'hallnav_backend'))
-        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hallnav_backend.settings')
-        
-        import django
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from .campus_graph import CampusGraph, HALL_LOCATIONS, TRANSITION_KINDS, build_default_campus
+    from .floor_routing import LayeredRouter, PROFILES
+    from .route_table import RouteTable, to_sparse
+except ImportError:  # imported as a top-level module (pages/ put lib/ on sys.path)
+    from campus_graph import CampusGraph, HALL_LOCATIONS, TRANSITION_KINDS, build_default_campus
+    from floor_routing import LayeredRouter, PROFILES
+    from route_table import RouteTable, to_sparse
+
+# Optional JSON campus graph (see CampusGraph.from_dict); the built-in demo campus is used otherwise
+CAMPUS_GRAPH_PATH = os.environ.get("HALLNAV_CAMPUS_GRAPH")
+
+# Where precomputed route tables are persisted between runs
+ROUTE_CACHE_DIR = os.environ.get("HALLNAV_ROUTE_CACHE", os.path.join(os.path.dirname(__file__), ".route_cache"))
+
+# Walking speed in graph units per second (metres per second for haversine campuses)
+WALKING_SPEED = float(os.environ.get("HALLNAV_WALKING_SPEED", 1.4))
+
+# Django project used by get_hall_locations_from_db
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend", "hallnav_backend"))
+
+# Heading change (degrees) below which a step counts as going straight on
+STRAIGHT_TOLERANCE_DEG = 30
+
+_campus_graph: Optional[CampusGraph] = None
+_router: Optional[LayeredRouter] = None
+_route_tables: Dict[str, RouteTable] = {}
+_db_locations: Optional[Dict[str, Tuple[float, float]]] = None
+
+
+def get_campus_graph() -> CampusGraph:
+    """Returns the campus graph, loading it once per process."""
+    global _campus_graph
+    if _campus_graph is None:
+        _campus_graph = CampusGraph.load(CAMPUS_GRAPH_PATH) if CAMPUS_GRAPH_PATH else build_default_campus()
+    return _campus_graph
+
+
+def set_campus_graph(graph: CampusGraph) -> None:
+    """Replaces the campus graph used by the routing functions."""
+    global _campus_graph, _router
+    _campus_graph = graph.freeze()
+    _router = None
+    _route_tables.clear()
+
+
+def get_router() -> LayeredRouter:
+    """Returns the floor-aware router, precomputing its per-floor tables once per process."""
+    global _router
+    if _router is None:
+        _router = LayeredRouter(get_campus_graph())
+    return _router
+
+def _setup_django() -> None:
+    """Makes the backend importable and configures Django, once per process."""
+    import sys
+    if BACKEND_DIR not in sys.path:
+        sys.path.append(BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hallnav_backend.settings')
+
+    import django
+    from django.apps import apps
+    if not apps.ready:
         django.setup()
-        
-        from hallnav_backend.recognition.models import Hall
-        
-        halls = Hall.objects.all()
-        locations = {}
-        for hall in halls:
-            locations[hall.name] = (hall.latitude, hall.longitude)
+
+
+def get_hall_locations_from_db(refresh: bool = False) -> Dict[str, Tuple[float, float]]:
+    """
+    Get hall locations from the Django database, loaded once per process.
+    Args:
+        refresh (bool): Re-query the database instead of returning the cached locations.
+    Returns:
+        Dict[str, Tuple[float, float]]: Hall name -> (latitude, longitude); HALL_LOCATIONS if the database is unavailable.
+    """
+    global _db_locations
+    if _db_locations is not None and not refresh:
+        return _db_locations
+    try:
+        _setup_django()
+        from recognition.models import Hall
+
+        locations = {name: (lat, lon) for name, lat, lon in Hall.objects.values_list('name', 'latitude', 'longitude')}
         # Add entrance as default if not in database
-        if "Entrance" not in locations:
-            locations["Entrance"] = (0, 0)
+        locations.setdefault("Entrance", (0, 0))
+        _db_locations = locations
         return locations
     except Exception as e:
         print(f"Could not load from database: {e}")
         return HALL_LOCATIONS
 
 
-def compute_route(start: str, end: str) -> List[str]:
+def nearest_location(coord: Tuple[float, float], names: Optional[Sequence[str]] = None) -> Optional[str]:
     """
-    Computes a simple route from start to end using static hall names.
+    Named campus location closest (straight line) to a point in the graph's coordinates.
+    Args:
+        coord (Tuple[float, float]): The point, e.g. the device position.
+        names (Optional[Sequence[str]]): Candidate locations; defaults to halls and entrances.
+    Returns:
+        Optional[str]: The closest candidate, or None when there are none.
+    """
+    graph = get_campus_graph()
+    candidates = [name for name in (names if names is not None else graph.named_locations()) if name in graph]
+    if not candidates:
+        return None
+    points = np.array([graph.coords[graph.index[name]] for name in candidates])
+    if graph.metric == "haversine":
+        lat, lon = np.radians(points[:, 0]), np.radians(points[:, 1])
+        lat0, lon0 = np.radians(coord[0]), np.radians(coord[1])
+        # Haversine term; monotonic in the great-circle distance, which is all argmin needs
+        distances = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+    else:
+        distances = np.hypot(points[:, 0] - coord[0], points[:, 1] - coord[1])
+    return candidates[int(np.argmin(distances))]
+
+
+def _route_table_path(profile: str) -> str:
+    return os.path.join(ROUTE_CACHE_DIR, f"routes-{profile}.npz")
+
+
+def get_route_table(profile: str = "default") -> RouteTable:
+    """
+    Returns the all-pairs route table for the named locations, loading it from the
+    on-disk cache when it matches the current graph and building (and saving) it otherwise.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown routing profile '{profile}'.")
+    if profile not in _route_tables:
+        graph = get_campus_graph()
+        path = _route_table_path(profile)
+        table = RouteTable.load(path, graph, PROFILES[profile])
+        if table is None:
+            table = RouteTable(graph, list(graph.named_locations()), PROFILES[profile])
+            try:
+                table.save(path)
+            except OSError as e:
+                print(f"Could not cache route table: {e}")
+        _route_tables[profile] = table
+    return _route_tables[profile]
+
+
+def update_edge(a: str, b: str, weight: float) -> None:
+    """
+    Changes the weight of one corridor/path (e.g. a closure or detour) and refreshes
+    cached routes incrementally: only route-table rows that use or can use the edge are recomputed.
+    Args:
+        a (str), b (str): Edge endpoints.
+        weight (float): New weight; use a large value to effectively close the edge.
+    """
+    global _router
+    old = get_campus_graph().set_edge_weight(a, b, weight)
+    _router = None
+    for profile, table in _route_tables.items():
+        if table.update_edge(a, b, old, weight):
+            try:
+                table.save(_route_table_path(profile))
+            except OSError as e:
+                print(f"Could not cache route table: {e}")
+
+
+def compute_route(start: str, end: str, accessible: bool = False) -> List[str]:
+    """
+    Computes the shortest walking route between two named campus locations.
     Args:
         start (str): Starting hall name.
         end (str): Destination hall name.
+        accessible (bool): Avoid stairs (use elevators and ramps only).
     Returns:
-        List[str]: List of hall names representing the route.
+        List[str]: Node names from start to end, including intermediate junctions.
     Raises:
-        ValueError: If start or end is not in the map.
+        ValueError: If start or end is not in the map, or no path joins them.
+    """
+    profile = "accessible" if accessible else "default"
+    table = get_route_table(profile)
+    if start in table or end in table:
+        route, _distance = table.route(start, end)
+    else:
+        route, _distance = get_router().shortest_path(start, end, profile)
+    return route
+
+
+def route_distance(route: List[str]) -> float:
     """
-    if start not in HALL_LOCATIONS or end not in HALL_LOCATIONS:
-        raise ValueError("Invalid start or end location.")
-    # For MVP, just return [start, end] (no real pathfinding)
-    return [start, end]
+    Sums the edge weights along a route.
+    Args:
+        route (List[str]): Node names as returned by compute_route.
+    Returns:
+        float: Total route length in graph units.
+    """
+    graph = get_campus_graph()
+    return sum(graph.edge_between(a, b)[0] for a, b in zip(route, route[1:]))
+
+
+def distance_matrix(origins: Sequence[str], destinations: Sequence[str], accessible: bool = False) -> np.ndarray:
+    """
+    Computes shortest walking distances between every origin and every destination in bulk.
+    Repeated names are resolved once; rows/columns for named locations are sliced straight
+    out of the precomputed route table, and only other origins fall back to a graph search.
+    Args:
+        origins (Sequence[str]): Start location names (duplicates allowed).
+        destinations (Sequence[str]): End location names (duplicates allowed).
+        accessible (bool): Avoid stairs.
+    Returns:
+        np.ndarray: float32 matrix of shape (len(origins), len(destinations)); inf when unreachable.
+    Raises:
+        ValueError: If any location is unknown.
+    """
+    return get_route_table("accessible" if accessible else "default").matrix(origins, destinations)
+
+
+def _heading(a: Tuple[float, float], b: Tuple[float, float], metric: str) -> float:
+    """Counter-clockwise angle (radians) of the step a -> b; (lat, lon) on haversine graphs, (x, y) otherwise"""
+    if metric == "haversine":
+        # Local east/north offsets: a degree of longitude shrinks with cos(latitude)
+        east = (b[1] - a[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+        return math.atan2(b[0] - a[0], east)
+    return math.atan2(b[1] - a[1], b[0] - a[0])
+
+
+def _turn(prev: Tuple[float, float], here: Tuple[float, float], nxt: Tuple[float, float],
+          metric: str = "euclidean") -> str:
+    heading_in = _heading(prev, here, metric)
+    heading_out = _heading(here, nxt, metric)
+    change = math.degrees((heading_out - heading_in + math.pi) % (2 * math.pi) - math.pi)
+    if abs(change) < STRAIGHT_TOLERANCE_DEG:
+        return "Continue straight"
+    if abs(change) > 180 - STRAIGHT_TOLERANCE_DEG:
+        return "Turn around"
+    return "Turn left" if change > 0 else "Turn right"
 
 
 def get_turn_by_turn(route: List[str]) -> List[str]:
@@ -63,22 +244,37 @@ def get_turn_by_turn(route: List[str]) -> List[str]:
     """
     if len(route) < 2:
         return ["You are already at your destination."]
+    graph = get_campus_graph()
+    nodes = [graph.index[name] for name in route]
+    coords = [graph.coords[node] for node in nodes]
     directions = [f"Start at {route[0]}."]
+    unit = "m" if graph.metric == "haversine" else "units"
+    heading_known = False
     for i in range(1, len(route)):
-        directions.append(f"Proceed to {route[i]}.")
+        weight, kind = graph.edge_between(route[i - 1], route[i])
+        if kind in TRANSITION_KINDS:
+            floor_from, floor_to = graph.floors[nodes[i - 1]], graph.floors[nodes[i]]
+            direction = "up" if floor_to > floor_from else "down" if floor_to < floor_from else "across"
+            directions.append(f"Take the {kind} {direction} to floor {floor_to} ({route[i]}).")
+            heading_known = False
+            continue
+        action = _turn(coords[i - 2], coords[i - 1], coords[i], graph.metric) if heading_known else "Head"
+        directions.append(f"{action} along the {kind} to {route[i]} ({weight:.1f} {unit}).")
+        heading_known = coords[i] != coords[i - 1]
     directions.append("You have arrived at your destination.")
     return directions
 
 
-def get_coordinates(route: List[str]) -> List[Tuple[int, int]]:
+def get_coordinates(route: List[str]) -> List[Tuple[float, float]]:
     """
-    Returns coordinates for each hall in the route for mapping.
+    Returns coordinates for each node in the route for mapping.
     Args:
         route (List[str]): List of hall names.
     Returns:
-        List[Tuple[int, int]]: List of (x, y) coordinates.
+        List[Tuple[float, float]]: List of (x, y) coordinates.
     """
-    return [HALL_LOCATIONS[hall] for hall in route if hall in HALL_LOCATIONS]
+    graph = get_campus_graph()
+    return [graph.coords[graph.index[name]] for name in route if name in graph]
 
 # Note: AR overlays and voice guidance are not implemented in this MVP.
 # Future work: Integrate with AR frameworks and TTS engines for full navigation experience.
@@ -0,0 +1,260 @@
+import heapq
+import math
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .campus_graph import CampusGraph
+except ImportError:  # imported as a top-level module
+    from campus_graph import CampusGraph
+
+# Relative slack when deciding whether a shorter edge improves a stored (float32) distance
+_IMPROVEMENT_EPS = 1e-6
+
+
+class RouteTable:
+    """
+    Precomputed shortest paths from every named location (halls, entrances)
+    to every node of a CampusGraph.
+
+    Row i of `dist` holds float32 distances from sources[i]; row i of `pred` the
+    predecessor of each node on that shortest-path tree (int16 when the graph is
+    small enough, -1 for none). A route query is a walk up one row of `pred`,
+    and a single edge change only rewrites the entries whose paths it affects.
+    """
+
+    def __init__(self, graph: CampusGraph, sources: Sequence[str], excluded_kinds: Iterable[str] = (),
+                 dist: Optional[np.ndarray] = None, pred: Optional[np.ndarray] = None):
+        self.graph = graph
+        self.excluded_kinds = frozenset(excluded_kinds)
+        self.sources = list(sources)
+        self.source_ids = np.array([graph.index[name] for name in self.sources], dtype=np.int32)
+        self.row = {name: i for i, name in enumerate(self.sources)}
+        self.pred_dtype = np.int16 if len(graph) < np.iinfo(np.int16).max else np.int32
+        if dist is None or pred is None:
+            dist = np.empty((len(self.sources), len(graph)), dtype=np.float32)
+            pred = np.empty((len(self.sources), len(graph)), dtype=self.pred_dtype)
+            self._adjacency = graph.filtered_adjacency(self.excluded_kinds)
+            for i in range(len(self.sources)):
+                self._fill_row(i, dist, pred)
+        else:
+            self._adjacency = None
+        self.dist = dist
+        self.pred = pred
+
+    @property
+    def adjacency(self):
+        if self._adjacency is None:
+            self._adjacency = self.graph.filtered_adjacency(self.excluded_kinds)
+        return self._adjacency
+
+    def _fill_row(self, i: int, dist: np.ndarray, pred: np.ndarray) -> None:
+        row_dist, row_pred = self.graph.dijkstra(int(self.source_ids[i]), self.adjacency)
+        dist[i] = row_dist
+        pred[i] = row_pred
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.row
+
+    # ---------- Queries ----------
+    def distance(self, start: str, end: str) -> float:
+        """Shortest distance when either endpoint is a table source (inf if unreachable)."""
+        if start in self.row:
+            return float(self.dist[self.row[start], self.graph.index[end]])
+        return float(self.dist[self.row[end], self.graph.index[start]])
+
+    def route(self, start: str, end: str) -> Tuple[List[str], float]:
+        """
+        Shortest route by walking the predecessor table; either endpoint must be a table source.
+        Raises:
+            ValueError: If neither endpoint is a source, a node is unknown, or no path exists.
+        """
+        graph = self.graph
+        if start not in graph.index or end not in graph.index:
+            raise ValueError("Invalid start or end location.")
+        if start in self.row:
+            row, target, reverse = self.row[start], graph.index[end], True
+        elif end in self.row:
+            # Edges are undirected, so walk the destination's tree and flip the result
+            row, target, reverse = self.row[end], graph.index[start], False
+        else:
+            raise ValueError(f"Neither {start} nor {end} is a precomputed location.")
+        if not np.isfinite(self.dist[row, target]):
+            raise ValueError(f"No route between {start} and {end}.")
+        pred = self.pred[row]
+        path = [target]
+        while pred[path[-1]] >= 0:
+            path.append(int(pred[path[-1]]))
+        if reverse:
+            path.reverse()
+        return [graph.names[i] for i in path], float(self.dist[row, target])
+
+    def matrix(self, origins: Sequence[str], destinations: Sequence[str]) -> np.ndarray:
+        """
+        Shortest distances between every origin and every destination in bulk.
+        Repeated names are resolved once; rows/columns for table sources are sliced straight
+        out of the table, and only other origins fall back to a graph search.
+        Returns:
+            np.ndarray: float32 matrix of shape (len(origins), len(destinations)); inf when unreachable.
+        Raises:
+            ValueError: If any location is unknown.
+        """
+        graph, table = self.graph, self
+        unknown = sorted({name for name in list(origins) + list(destinations) if name not in graph})
+        if unknown:
+            raise ValueError(f"Unknown locations: {', '.join(unknown)}")
+        if len(origins) == 0 or len(destinations) == 0:
+            return np.zeros((len(origins), len(destinations)), dtype=np.float32)
+
+        unique_origins, origin_inverse = np.unique(np.asarray(origins, dtype=str), return_inverse=True)
+        unique_dests, dest_inverse = np.unique(np.asarray(destinations, dtype=str), return_inverse=True)
+        origin_ids = np.array([graph.index[name] for name in unique_origins])
+        dest_ids = np.array([graph.index[name] for name in unique_dests])
+        origin_rows = np.array([table.row.get(name, -1) for name in unique_origins])
+        dest_rows = np.array([table.row.get(name, -1) for name in unique_dests])
+
+        block = np.empty((len(unique_origins), len(unique_dests)), dtype=np.float32)
+        in_table = origin_rows >= 0
+        block[in_table] = table.dist[np.ix_(origin_rows[in_table], dest_ids)]
+        rest = np.flatnonzero(~in_table)
+        if rest.size and (dest_rows >= 0).all():
+            # Undirected graph: read the destinations' rows instead
+            block[rest] = table.dist[np.ix_(dest_rows, origin_ids[rest])].T
+        else:
+            for i in rest:
+                dist, _pred = graph.dijkstra(int(origin_ids[i]), table.adjacency)
+                block[i] = dist[dest_ids]
+        return block[np.ix_(origin_inverse, dest_inverse)]
+
+    # ---------- Incremental maintenance ----------
+    def update_edge(self, a: str, b: str, old_weight: float, new_weight: float) -> int:
+        """
+        Refreshes the table after the graph edge a-b changed from old_weight to new_weight
+        (call CampusGraph.set_edge_weight first). Only entries whose shortest path changes
+        are touched: a cheaper edge is propagated outwards from its endpoints, a dearer
+        one re-settles just the subtree that hung off it.
+        Returns:
+            int: Number of table entries (source, node) rewritten.
+        """
+        u, v = self.graph.index[a], self.graph.index[b]
+        kind = self.graph.edges[tuple(sorted((u, v)))][1]
+        if kind in self.excluded_kinds or new_weight == old_weight:
+            return 0
+        self._adjacency = None
+        du, dv = self.dist[:, u].astype(np.float64), self.dist[:, v].astype(np.float64)
+        if new_weight < old_weight:
+            # Sources for which the cheaper edge shortcuts either endpoint
+            slack = _IMPROVEMENT_EPS * np.maximum(1.0, np.minimum(du, dv))
+            rows = np.flatnonzero((du + new_weight < dv - slack) | (dv + new_weight < du - slack))
+            repair = self._propagate_decrease
+        else:
+            # Sources whose shortest-path tree uses the edge
+            rows = np.flatnonzero((self.pred[:, v] == u) | (self.pred[:, u] == v))
+            repair = self._resettle_subtree
+        changed = 0
+        for i in rows:
+            dist, pred = self.dist[i].astype(np.float64).tolist(), self.pred[i].tolist()
+            touched = repair(dist, pred, u, v, new_weight)
+            idx = list(touched)
+            self.dist[i, idx] = [dist[j] for j in idx]
+            self.pred[i, idx] = [pred[j] for j in idx]
+            changed += len(touched)
+        return changed
+
+    def _propagate_decrease(self, dist, pred, u, v, weight):
+        """Dijkstra seeded at whichever endpoint improved, relaxing only strict improvements."""
+        adjacency = self.adjacency
+        heap = []
+        for x, y in ((u, v), (v, u)):
+            if dist[x] + weight < dist[y]:
+                dist[y] = dist[x] + weight
+                pred[y] = x
+                heap.append((dist[y], y))
+        touched = {y for _d, y in heap}
+        heapq.heapify(heap)
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            for y, w in adjacency[x]:
+                nd = d + w
+                if nd < dist[y] - _IMPROVEMENT_EPS * max(1.0, nd):
+                    dist[y] = nd
+                    pred[y] = x
+                    touched.add(y)
+                    heapq.heappush(heap, (nd, y))
+        return touched
+
+    def _resettle_subtree(self, dist, pred, u, v, _weight):
+        """Invalidate the subtree below the edge and re-settle it from its surviving neighbours."""
+        child = v if pred[v] == u else u
+        parents = np.array(pred)
+        in_subtree = np.zeros(len(pred), dtype=bool)
+        in_subtree[child] = True
+        frontier = np.array([child])
+        while frontier.size:
+            frontier = np.flatnonzero(np.isin(parents, frontier) & ~in_subtree)
+            in_subtree[frontier] = True
+        subtree = set(np.flatnonzero(in_subtree).tolist())
+
+        adjacency = self.adjacency
+        heap = []
+        for node in subtree:
+            dist[node], pred[node] = math.inf, -1
+        for node in subtree:
+            for y, w in adjacency[node]:
+                if y not in subtree and dist[y] + w < dist[node]:
+                    dist[node], pred[node] = dist[y] + w, y
+            if pred[node] >= 0:
+                heap.append((dist[node], node))
+        heapq.heapify(heap)
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            for y, w in adjacency[x]:
+                if y in subtree and d + w < dist[y]:
+                    dist[y], pred[y] = d + w, x
+                    heapq.heappush(heap, (d + w, y))
+        return subtree
+
+    # ---------- Persistence ----------
+    def save(self, path: str) -> None:
+        """Writes the table to an .npz file (atomically) keyed by the graph fingerprint."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, sources=np.array(self.sources), dist=self.dist, pred=self.pred,
+                 excluded=np.array(sorted(self.excluded_kinds), dtype=str),
+                 fingerprint=np.array(self.graph.fingerprint()))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, graph: CampusGraph, excluded_kinds: Iterable[str] = ()) -> Optional["RouteTable"]:
+        """Loads a saved table, or returns None if it is missing or was built for a different graph/profile."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if (str(data["fingerprint"]) != graph.fingerprint()
+                        or set(data["excluded"].tolist()) != set(excluded_kinds)):
+                    return None
+                sources = data["sources"].tolist()
+                if any(name not in graph.index for name in sources):
+                    return None
+                return cls(graph, sources, excluded_kinds, dist=data["dist"], pred=data["pred"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+def to_sparse(matrix: np.ndarray, max_value: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Converts a distance/time matrix to COO triplets, dropping unreachable entries
+    and (optionally) entries above max_value.
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (rows, cols, values).
+    """
+    keep = np.isfinite(matrix)
+    if max_value is not None:
+        keep &= matrix <= max_value
+    rows, cols = np.nonzero(keep)
+    return rows, cols, matrix[rows, cols]
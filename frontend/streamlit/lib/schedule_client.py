@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import pandas as pd
+import requests
+
+
+def fetch_schedule(schedule_url: str, cache: Dict[str, dict], timeout: float = 10,
+                   get: Callable[..., requests.Response] = requests.get) -> List[dict]:
+    """
+    Fetches a hall's structured schedule, revalidating any cached copy with its ETag
+    so an unchanged schedule costs a 304 instead of a full download.
+    Args:
+        schedule_url (str): The `schedule_url` returned by the recognition API.
+        cache (dict): Mutable mapping of url -> {"etag": str, "schedule": list}
+            (e.g. st.session_state["schedule_cache"]); updated in place.
+        timeout (float): Request timeout in seconds.
+        get (callable): Issues the GET (e.g. api_client.get for the pooled, logged client).
+    Returns:
+        List[dict]: Entries with course_name, start_time and end_time (ISO 8601).
+    Raises:
+        requests.RequestException: If the request fails and nothing is cached.
+    """
+    cached = cache.get(schedule_url)
+    headers = {"If-None-Match": cached["etag"]} if cached and cached.get("etag") else {}
+    try:
+        response = get(schedule_url, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        if cached:
+            return cached["schedule"]
+        raise
+    if response.status_code == 304 and cached:
+        return cached["schedule"]
+    response.raise_for_status()
+    schedule = response.json().get("schedule", [])
+    cache[schedule_url] = {"etag": response.headers.get("ETag"), "schedule": schedule}
+    return schedule
+
+
+def schedule_to_dataframe(entries: List[dict]) -> pd.DataFrame:
+    """
+    Converts structured schedule entries into the table shown on the results screen.
+    Args:
+        entries (List[dict]): Entries as returned by fetch_schedule.
+    Returns:
+        pd.DataFrame: Columns Date, Start-End and Course.
+    """
+    rows = []
+    for entry in entries:
+        start = datetime.fromisoformat(entry["start_time"])
+        end = datetime.fromisoformat(entry["end_time"])
+        rows.append({
+            "Date": start.strftime("%a %d %b"),
+            "Start-End": f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}",
+            "Course": entry["course_name"],
+        })
+    return pd.DataFrame(rows, columns=["Date", "Start-End", "Course"])
@@ -0,0 +1,82 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+import requests
+
+try:
+    import streamlit  # noqa: F401
+except ImportError:  # The client itself does not need Streamlit, only the decorator used at import
+    streamlit = types.ModuleType("streamlit")
+    streamlit.cache_resource = lambda function: function
+    sys.modules["streamlit"] = streamlit
+
+from lib.api_client import ApiClient, CircuitBreaker, CircuitOpenError, latency_summary
+
+
+def response(status):
+    result = requests.Response()
+    result.status_code = status
+    return result
+
+
+class ApiClientTests(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failures=2, reset_after=0.0)
+        self.client = ApiClient("http://hallnav.test", retries=2, backoff=0.0, breaker=self.breaker)
+
+    def send(self, *outcomes):
+        """Patch the session so successive calls return or raise `outcomes`"""
+        patcher = mock.patch.object(self.client.session, "request", side_effect=list(outcomes))
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_idempotent_calls_retry_transient_failures(self):
+        send = self.send(requests.ConnectionError(), response(503), response(200))
+        self.assertEqual(self.client.request("GET", "api/halls/nearest/").status_code, 200)
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_posts_are_not_retried(self):
+        send = self.send(response(503))
+        self.assertEqual(self.client.request("POST", "api/recognize_hall/").status_code, 503)
+        self.assertEqual(send.call_count, 1)
+
+    def test_breaker_opens_and_closes_after_successful_trial(self):
+        self.breaker.reset_after = 60.0
+        self.send(requests.Timeout(), requests.Timeout())
+        with self.assertRaises(requests.Timeout):
+            self.client.request("POST", "api/recognize_hall/")
+        with self.assertRaises(requests.Timeout):
+            self.client.request("POST", "api/recognize_hall/")
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.client.request("GET", "api/halls/nearest/")
+        self.breaker.reset_after = 0.0
+        self.send(response(200))
+        self.client.request("GET", "api/halls/nearest/")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_unexpected_error_during_trial_does_not_wedge_breaker(self):
+        self.breaker.opened_at, self.breaker.failures = 0.0, 2
+        self.send(requests.exceptions.ChunkedEncodingError(), RuntimeError("decoder crashed"), response(200))
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            self.client.request("GET", "api/halls/nearest/")
+        with self.assertRaises(RuntimeError):
+            self.client.request("GET", "api/halls/nearest/")
+        self.assertEqual(self.client.request("GET", "api/halls/nearest/").status_code, 200)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_calls_are_logged(self):
+        log = []
+        self.send(response(200))
+        self.client.request("GET", "/api/halls/LT1/schedule/", log=log)
+        self.assertEqual((log[0]["method"], log[0]["path"], log[0]["status"], log[0]["attempts"]),
+                         ("GET", "/api/halls/LT1/schedule/", 200, 1))
+        summary = latency_summary(log + [{**log[0], "ms": 5.0}])
+        self.assertEqual(summary["GET /api/halls/LT1/schedule/"][0], 2)
+
+    def test_absolute_urls_are_kept(self):
+        self.assertEqual(self.client.url("api/halls/"), "http://hallnav.test/api/halls/")
+        self.assertEqual(self.client.url("https://other.test/x"), "https://other.test/x")
@@ -0,0 +1,124 @@
+import math
+import random
+import unittest
+
+from lib.campus_graph import CampusGraph
+from lib.floor_routing import LayeredRouter, PROFILES
+from lib.navigation import build_default_campus
+
+
+def build_multi_floor_campus(seed=0):
+    """
+    Outdoor grid with two buildings of three floors, each floor a small corridor grid with halls.
+    Block A has stairs and a lift between every floor; Block B only stairs, plus a ramp to floor 1.
+    """
+    rng = random.Random(seed)
+    graph = CampusGraph()
+    for i in range(4):
+        for j in range(4):
+            graph.add_node(f"O{i}_{j}", (i * 4 + rng.random(), j * 4 + rng.random()))
+            if i:
+                graph.add_edge(f"O{i - 1}_{j}", f"O{i}_{j}", kind="path")
+            if j:
+                graph.add_edge(f"O{i}_{j - 1}", f"O{i}_{j}", kind="path")
+    for building, (x0, y0), lift in (("A", (2, 14), True), ("B", (14, 2), False)):
+        for floor in range(3):
+            for i in range(3):
+                for j in range(3):
+                    name = f"{building}{floor}_{i}_{j}"
+                    graph.add_node(name, (x0 + i + rng.random() * 0.3, y0 + j + rng.random() * 0.3),
+                                   floor=floor, building=f"Block {building}")
+                    if i:
+                        graph.add_edge(f"{building}{floor}_{i - 1}_{j}", name)
+                    if j:
+                        graph.add_edge(f"{building}{floor}_{i}_{j - 1}", name)
+            hall = f"Hall_{building}{floor}"
+            graph.add_node(hall, (x0 + 2.5, y0 + 2.5), "hall", floor=floor, building=f"Block {building}")
+            graph.add_edge(f"{building}{floor}_2_2", hall)
+            if floor:
+                graph.add_edge(f"{building}{floor - 1}_0_0", f"{building}{floor}_0_0", 2.0 + rng.random(), kind="stairs")
+                graph.add_edge(f"{building}{floor - 1}_2_0", f"{building}{floor}_2_0", 1.0 + rng.random(), kind="stairs")
+                if lift:
+                    graph.add_edge(f"{building}{floor - 1}_1_2", f"{building}{floor}_1_2", 3.0, kind="elevator")
+        graph.add_node(f"{building} Entrance", (x0 - 0.5, y0 - 0.5), "entrance", floor=0, building=f"Block {building}")
+        graph.add_edge(f"{building} Entrance", f"{building}0_0_0")
+    graph.add_edge("A Entrance", "O0_3", kind="path")
+    graph.add_edge("B Entrance", "O3_0", kind="path")
+    graph.add_edge("O3_0", "B1_1_0", 4.0, kind="ramp")
+    return graph.freeze()
+
+
+class LayeredRouterTests(unittest.TestCase):
+    def setUp(self):
+        self.graph = build_multi_floor_campus()
+        self.router = LayeredRouter(self.graph)
+
+    def dijkstra(self, start, end, profile):
+        """Plain campus-wide Dijkstra distance under a profile's excluded edge kinds"""
+        adjacency = self.graph.filtered_adjacency(PROFILES[profile])
+        dist, _pred = self.graph.dijkstra(self.graph.index[start], adjacency)
+        return dist[self.graph.index[end]]
+
+    def assert_matches_dijkstra(self, start, end, profile):
+        expected = self.dijkstra(start, end, profile)
+        if math.isinf(expected):
+            with self.assertRaises(ValueError):
+                self.router.shortest_path(start, end, profile)
+            return
+        route, distance = self.router.shortest_path(start, end, profile)
+        self.assertTrue(math.isclose(distance, expected, rel_tol=1e-9), (start, end, profile, distance, expected))
+        self.assertEqual((route[0], route[-1]), (start, end))
+        steps = [self.graph.edge_between(a, b) for a, b in zip(route, route[1:])]
+        self.assertTrue(math.isclose(sum(weight for weight, _kind in steps), distance, rel_tol=1e-9))
+        self.assertFalse({kind for _weight, kind in steps} & PROFILES[profile])
+
+    def test_routes_and_costs_match_dijkstra(self):
+        rng = random.Random(0)
+        names = self.graph.names
+        for profile in PROFILES:
+            for _ in range(150):
+                start, end = rng.sample(names, 2)
+                with self.subTest(profile=profile, start=start, end=end):
+                    self.assert_matches_dijkstra(start, end, profile)
+
+    def test_every_hall_pair_matches_dijkstra(self):
+        halls = list(self.graph.named_locations())
+        for profile in PROFILES:
+            for start in halls:
+                for end in halls:
+                    if start != end:
+                        with self.subTest(profile=profile, start=start, end=end):
+                            self.assert_matches_dijkstra(start, end, profile)
+
+    def test_step_free_routes_take_the_lift_or_ramp(self):
+        route, distance = self.router.shortest_path("A Entrance", "Hall_A2", "accessible")
+        kinds = {self.graph.edge_between(a, b)[1] for a, b in zip(route, route[1:])}
+        self.assertIn("elevator", kinds)
+        self.assertGreaterEqual(distance, self.router.shortest_path("A Entrance", "Hall_A2")[1])
+        # Block B floor 2 is only reachable by stairs
+        self.assertTrue(math.isinf(self.dijkstra("B Entrance", "Hall_B2", "accessible")))
+        with self.assertRaises(ValueError):
+            self.router.shortest_path("B Entrance", "Hall_B2", "accessible")
+        route, _distance = self.router.shortest_path("B Entrance", "Hall_B1", "accessible")
+        self.assertIn("ramp", {self.graph.edge_between(a, b)[1] for a, b in zip(route, route[1:])})
+
+    def test_same_floor_route_stays_on_the_floor(self):
+        route, distance = self.router.shortest_path("A1_0_2", "Hall_A1")
+        self.assertEqual({self.graph.layer(self.graph.index[name]) for name in route}, {("Block A", 1)})
+        self.assertTrue(math.isclose(distance, self.dijkstra("A1_0_2", "Hall_A1", "default"), rel_tol=1e-9))
+
+
+class FloorRoutingTests(unittest.TestCase):
+    def test_accessible_profile_avoids_stairs(self):
+        graph = build_default_campus()
+        router = LayeredRouter(graph)
+        route, _ = router.shortest_path("Entrance", "Hall_B202", "accessible")
+        kinds = {graph.edge_between(a, b)[1] for a, b in zip(route, route[1:])}
+        self.assertNotIn("stairs", kinds)
+        self.assertIn("elevator", kinds)
+        default, _ = router.shortest_path("Entrance", "Hall_B202")
+        self.assertIn("stairs", {graph.edge_between(a, b)[1] for a, b in zip(default, default[1:])})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import io
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from lib.image_capture import MIN_UPLOAD_BYTES, prepare_upload
+
+
+def encode(image, format, **params):
+    out = io.BytesIO()
+    image.save(out, format=format, **params)
+    return out.getvalue()
+
+
+class PrepareUploadTests(unittest.TestCase):
+    def test_downscales_and_strips_metadata(self):
+        pixels = np.random.default_rng(0).integers(0, 256, (900, 1200, 3), dtype=np.uint8)
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        data = encode(Image.fromarray(pixels), "JPEG", quality=95, exif=exif)
+        prepared, filename, mime = prepare_upload(data, "photo.jpeg")
+        image = Image.open(io.BytesIO(prepared))
+        self.assertEqual((filename, mime), ("photo.jpg", "image/jpeg"))
+        self.assertEqual(image.size, (256, 341))
+        self.assertNotIn(0x0112, image.getexif())
+        self.assertLess(len(prepared), len(data))
+
+    def test_png_stays_lossless(self):
+        pixels = np.random.default_rng(1).integers(0, 256, (300, 300, 3), dtype=np.uint8)
+        prepared, filename, mime = prepare_upload(encode(Image.fromarray(pixels), "PNG"), "scan.png")
+        self.assertEqual((filename, mime), ("scan.png", "image/png"))
+        self.assertEqual(Image.open(io.BytesIO(prepared)).format, "PNG")
+
+    def test_tiny_result_falls_back_to_original_bytes(self):
+        data = encode(Image.new("RGB", (2000, 1500), (120, 130, 140)), "JPEG", quality=100)
+        self.assertGreaterEqual(len(data), MIN_UPLOAD_BYTES)
+        self.assertEqual(prepare_upload(data, "wall.jpg"), (data, "wall.jpg", "image/jpeg"))
+        self.assertEqual(prepare_upload(data, "camera")[1], "camera.jpeg")
+
+    def test_invalid_image(self):
+        with self.assertRaises(ValueError):
+            prepare_upload(b"not an image", "x.jpg")
@@ -0,0 +1,59 @@
+import unittest
+
+from lib import navigation
+from lib.campus_graph import CampusGraph
+from lib.navigation import _turn, get_turn_by_turn, set_campus_graph
+
+
+def corner_campus(metric, coords):
+    """Three halls: walk A -> B, then B -> C"""
+    graph = CampusGraph(metric=metric)
+    for name, coord in zip("ABC", coords):
+        graph.add_node(name, coord, "hall")
+    graph.add_edge("A", "B")
+    graph.add_edge("B", "C")
+    return graph.freeze()
+
+
+class TurnTests(unittest.TestCase):
+    def test_planar_turns(self):
+        # (x, y) with y pointing north: north then east is a right turn
+        self.assertEqual(_turn((0, 0), (0, 1), (1, 1)), "Turn right")
+        self.assertEqual(_turn((0, 0), (0, 1), (-1, 1)), "Turn left")
+        self.assertEqual(_turn((0, 0), (0, 1), (0.1, 2)), "Continue straight")
+        self.assertEqual(_turn((0, 0), (0, 1), (0, 0)), "Turn around")
+
+    def test_geographic_turns_use_lat_lon_order(self):
+        # (lat, lon): north then east is a right turn too
+        self.assertEqual(_turn((6.0, -0.2), (6.001, -0.2), (6.001, -0.199), "haversine"), "Turn right")
+        self.assertEqual(_turn((6.0, -0.2), (6.001, -0.2), (6.001, -0.201), "haversine"), "Turn left")
+
+    def test_geographic_heading_accounts_for_latitude(self):
+        # At 60 deg a degree of longitude is half as long: 0.002 deg east ~ 0.001 deg north, a 45 deg bend
+        self.assertEqual(_turn((60.0, 10.0), (60.001, 10.0), (60.002, 10.002), "haversine"), "Turn right")
+        self.assertEqual(_turn((60.0, 10.0), (60.001, 10.0), (60.002, 10.0005), "haversine"), "Continue straight")
+
+
+class DirectionTests(unittest.TestCase):
+    def tearDown(self):
+        # Back to the default campus for other tests
+        navigation._campus_graph, navigation._router = None, None
+        navigation._route_tables.clear()
+
+    def test_steps_carry_units(self):
+        set_campus_graph(corner_campus("haversine", [(6.0, -0.2), (6.001, -0.2), (6.001, -0.199)]))
+        steps = get_turn_by_turn(["A", "B", "C"])
+        self.assertEqual(steps[0], "Start at A.")
+        self.assertTrue(steps[1].startswith("Head along the corridor to B (111.2 m)"), steps[1])
+        self.assertTrue(steps[2].startswith("Turn right along the corridor to C"), steps[2])
+
+        set_campus_graph(corner_campus("euclidean", [(0, 0), (0, 3), (4, 3)]))
+        self.assertEqual(get_turn_by_turn(["A", "B", "C"])[1:], [
+            "Head along the corridor to B (3.0 units).",
+            "Turn right along the corridor to C (4.0 units).",
+            "You have arrived at your destination.",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import math
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from benchmark_navigation import build_campus
+from lib.route_table import RouteTable
+
+
+class RouteTableTests(unittest.TestCase):
+    def setUp(self):
+        self.graph = build_campus(12, 20, seed=3)
+        self.halls = list(self.graph.named_locations())
+        self.table = RouteTable(self.graph, self.halls)
+
+    def test_routes_match_dijkstra(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            start, end = rng.sample(self.halls, 2)
+            route, distance = self.table.route(start, end)
+            dist, _pred = self.graph.dijkstra(self.graph.index[start])
+            self.assertTrue(math.isclose(distance, dist[self.graph.index[end]], rel_tol=1e-5))
+            self.assertEqual((route[0], route[-1]), (start, end))
+            walked = sum(self.graph.edge_between(a, b)[0] for a, b in zip(route, route[1:]))
+            self.assertTrue(math.isclose(walked, distance, rel_tol=1e-5))
+
+    def test_route_from_junction_to_hall_walks_the_halls_tree(self):
+        route, distance = self.table.route("J0_0", self.halls[0])
+        reverse, reverse_distance = self.table.route(self.halls[0], "J0_0")
+        self.assertEqual(route, reverse[::-1])
+        self.assertAlmostEqual(distance, reverse_distance, places=4)
+
+    def test_incremental_update_matches_rebuild(self):
+        rng = random.Random(1)
+        edges = list(self.graph.edges)
+        for _ in range(15):
+            u, v = edges[rng.randrange(len(edges))]
+            a, b = self.graph.names[u], self.graph.names[v]
+            old = self.graph.edges[(u, v)][0]
+            new = old * rng.choice([0.2, 5.0])
+            self.graph.set_edge_weight(a, b, new)
+            self.table.update_edge(a, b, old, new)
+            fresh = RouteTable(self.graph, self.halls)
+            np.testing.assert_allclose(self.table.dist, fresh.dist, rtol=1e-5)
+
+    def test_save_and_load_checks_the_graph(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = os.path.join(tmp, "routes.npz")
+        self.table.save(path)
+        loaded = RouteTable.load(path, self.graph)
+        np.testing.assert_array_equal(loaded.dist, self.table.dist)
+        self.assertIsNone(RouteTable.load(path, build_campus(12, 20, seed=4)))
+        self.assertIsNone(RouteTable.load(path, self.graph, ("stairs",)))
+
+
+if __name__ == "__main__":
+    unittest.main()
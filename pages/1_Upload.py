@@ -3,7 +3,8 @@ import requests
 from PIL import Image
 import io
 import numpy as np
-from image_capture import process_uploaded_image
+from image_capture import prepare_upload, process_uploaded_image
+import api_client
 from components.ui import inject_css, render_header
 
 st.set_page_config(page_title="HallNav • Upload", layout="centered")
@@ -47,14 +48,20 @@ with scan_col:
 			st.markdown("<div class='alert-error'>No image selected. Please upload an image.</div>", unsafe_allow_html=True)
 		else:
 			try:
-				st.session_state.offline = False
-				buf = io.BytesIO(st.session_state.uploaded_image_bytes)
-				files = {"file": buf}
+				# Downscaled, metadata-free copy; filename and MIME type match the format actually sent
+				data, filename, mime = prepare_upload(
+					st.session_state.uploaded_image_bytes,
+					uploaded_file.name if uploaded_file is not None else "uploaded_image",
+				)
+				files = {"file": (filename, io.BytesIO(data), mime)}
+				# Approximate device position (?lat=&lon= in the URL) lets the backend rule out distant halls
+				location = {key: st.query_params[key] for key in ("lat", "lon") if key in st.query_params}
 				with st.spinner("Recognizing..."):
-					response = requests.post(
-						"http://localhost:8000/api/recognize_hall/",
+					response = api_client.post(
+						"api/recognize_hall/",
 						files=files,
-						timeout=4,
+						data=location if len(location) == 2 else None,
+						timeout=30,
 					)
 				if response.status_code == 200:
 					st.session_state.recognition_result = response.json()
@@ -62,9 +69,16 @@ with scan_col:
 				else:
 					st.session_state.recognition_result = None
 					st.markdown("<div class='alert-error'>Recognition failed. Please try another image.</div>", unsafe_allow_html=True)
-			except Exception as e:
-				st.session_state.offline = True
+			except requests.RequestException as e:
+				# api_client has marked the session offline (request failed or circuit open)
 				st.session_state.recognition_result = None
 				st.markdown(f"<div class='alert-error'>Error contacting recognition service: {e}</div>", unsafe_allow_html=True)
+			except Exception as e:
+				st.session_state.recognition_result = None
+				st.markdown(f"<div class='alert-error'>Recognition failed: {e}</div>", unsafe_allow_html=True)
+
+# Per-call API latencies and circuit state (?debug=1 in the URL)
+if st.query_params.get("debug") == "1":
+	api_client.render_debug_panel()
 
 st.markdown("</div>", unsafe_allow_html=True)
@@ -1,5 +1,8 @@
 import streamlit as st
 import pandas as pd
+import requests
+from schedule_client import fetch_schedule, schedule_to_dataframe
+import api_client
 from components.ui import inject_css, render_header
 
 st.set_page_config(page_title="HallNav • Results", layout="centered")
@@ -8,6 +11,8 @@ render_header("Hall Recognition Results", "Details for the identified lecture ha
 
 st.markdown("<div class='container'>", unsafe_allow_html=True)
 
+st.session_state.setdefault("schedule_cache", {})
+
 if st.session_state.get("offline"):
 	st.markdown("<span class='badge-offline'>Offline Mode Active</span>", unsafe_allow_html=True)
 
@@ -22,9 +27,20 @@ schedule_text = result.get("schedule", "No schedule found")
 st.markdown("<div class='card'>", unsafe_allow_html=True)
 st.markdown(f"<h3 style='text-align:center; color:#424242; font-weight:700;'>Recognized Hall: {hall_id}</h3>", unsafe_allow_html=True)
 
-# Parse schedule into table
-rows = []
-if schedule_text and schedule_text != "No schedule found":
+# Structured schedule, revalidated by ETag; fall back to parsing the joined string
+df = None
+if result.get("schedule_url"):
+	try:
+		df = schedule_to_dataframe(fetch_schedule(result["schedule_url"], st.session_state.schedule_cache, get=api_client.get))
+	except requests.RequestException:
+		df = None
+if df is not None:
+	if not df.empty:
+		st.dataframe(df, use_container_width=True, height=300)
+	else:
+		st.write("No schedule found")
+elif schedule_text and schedule_text != "No schedule found":
+	rows = []
 	entries = [seg.strip() for seg in schedule_text.split(";") if seg.strip()]
 	for e in entries:
 		parts = e.split(" ", 1)
@@ -46,4 +62,8 @@ with left:
 with right:
 	st.button("Navigate to Hall", key="navigate_button", help="Open the Navigation page from the sidebar")
 
+# Per-call API latencies and circuit state (?debug=1 in the URL)
+if st.query_params.get("debug") == "1":
+	api_client.render_debug_panel()
+
 st.markdown("</div>", unsafe_allow_html=True)
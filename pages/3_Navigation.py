@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
-from navigation import compute_route, get_turn_by_turn, get_coordinates, HALL_LOCATIONS
+import requests
+from navigation import compute_route, get_turn_by_turn, get_coordinates, get_campus_graph, nearest_location, HALL_LOCATIONS
+import api_client
 from components.ui import inject_css, render_header
 
 st.set_page_config(page_title="HallNav • Navigation", layout="centered")
@@ -9,22 +11,48 @@ render_header("Navigate Between Halls", "Select a start and destination hall")
 
 st.markdown("<div class='container'>", unsafe_allow_html=True)
 
+
+def default_start(hall_names):
+	"""Index of the location nearest the device (?lat=&lon= in the URL), else 0"""
+	try:
+		lat, lon = float(st.query_params["lat"]), float(st.query_params["lon"])
+	except (KeyError, ValueError):
+		return 0
+	nearest = None
+	try:
+		response = api_client.get("api/halls/nearest/", params={"lat": lat, "lon": lon, "k": 5}, timeout=2)
+		if response.status_code == 200:
+			# Database halls name their campus graph node explicitly; unmapped halls have none
+			nodes = [hall.get("node") for hall in response.json().get("halls", [])]
+			nearest = next((node for node in nodes if node in hall_names), None)
+	except requests.exceptions.RequestException:
+		pass
+	if nearest is None and get_campus_graph().metric == "haversine":
+		# Only a campus graph in latitude/longitude can be compared with the device position
+		nearest = nearest_location((lat, lon), hall_names)
+	return hall_names.index(nearest) if nearest in hall_names else 0
+
+
 hall_names = list(HALL_LOCATIONS.keys())
+# Looked up once per session; the selectbox keeps the user's choice afterwards
+if "default_start" not in st.session_state:
+	st.session_state.default_start = default_start(hall_names)
 col1, col2 = st.columns(2)
 with col1:
-	start_hall = st.selectbox("Start Location", hall_names, key="start")
+	start_hall = st.selectbox("Start Location", hall_names, index=st.session_state.default_start, key="start")
 with col2:
 	default_dest = 0
 	if st.session_state.get("recognition_result") and st.session_state.recognition_result.get("hall_id") in hall_names:
 		default_dest = hall_names.index(st.session_state.recognition_result["hall_id"])
 	end_hall = st.selectbox("Destination Hall", hall_names, index=default_dest, key="end")
+step_free = st.checkbox("Step-free route (avoid stairs)", key="step_free")
 
 if st.button("Show Route"):
 	if start_hall == end_hall:
 		st.info("You are already at your destination.")
 	else:
 		try:
-			route = compute_route(start_hall, end_hall)
+			route = compute_route(start_hall, end_hall, accessible=step_free)
 			directions = get_turn_by_turn(route)
 			coords = get_coordinates(route)
 
@@ -41,4 +69,8 @@ if st.button("Show Route"):
 		except ValueError as e:
 			st.error(f"Navigation error: {e}")
 
+# Per-call API latencies and circuit state (?debug=1 in the URL)
+if st.query_params.get("debug") == "1":
+	api_client.render_debug_panel()
+
 st.markdown("</div>", unsafe_allow_html=True)